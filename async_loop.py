@@ -0,0 +1,188 @@
+"""固定間隔のゲームループ
+asyncioのイベントループ上で，キー入力を待たずに `Parameters.tick_interval` ごとに
+1ターンずつゲームを進めるモジュール．
+キー入力は `Controller` の入力 (`InputBackend`) から読み，ファイルディスクリプタを
+持つ入力はイベントループの `add_reader` で読めるようになったときだけ読む．
+次のターンでは最後に押されたキーを使う．
+キーが押されていなくても敵は動き続ける．
+入力の終わりに達し (台本を読み切った場合など)，使っていないキーもなくなったら止まる．
+
+各ターンの予定時刻は開始時刻 + ターン数 * 間隔として決め，
+描画などにかかった時間を差し引いて待つため，ターンの間隔がずれていかない．
+処理が間に合わず予定時刻を過ぎた場合は遅れたターン (missed deadline) として数え，
+遅れを取り戻そうとまとめて進めることはせず，次の予定時刻から再開する．
+
+    python main.py --realtime
+"""
+from __future__ import annotations
+import asyncio
+import logging
+from controller import Controller
+from controller import InputBackend
+from profiler import INPUT, RENDER, UPDATE_FIELD
+from renderer import TerminalRenderer
+import typing
+if typing.TYPE_CHECKING:
+    from game import Game
+    from policy import Policy
+
+
+logger = logging.getLogger(__name__)
+
+
+class FixedTimestepLoop:
+    """一定間隔でゲームを進めるループ
+
+    Attributes:
+        game (Game): 進めるゲーム
+        interval (float): 1ターンの長さ (秒)
+        missed (int): 予定時刻に間に合わなかったターンの数
+        max_lateness (float): 最も遅れたときの遅れ (秒)
+
+    Examples:
+        >>> import io
+        >>> from config import Parameters
+        >>> from game import Game
+        >>> from policy import GreedyPolicy
+        >>> game = Game(Parameters(enemy_num=0, seed=0, tick_interval=0.001),
+        ...             headless=True)
+        >>> loop = FixedTimestepLoop(
+        ...     game, policy=GreedyPolicy(),
+        ...     renderer=TerminalRenderer(io.StringIO()))
+        >>> asyncio.run(loop.run())
+        'Game Clear!'
+    """
+
+    def __init__(
+            self,
+            game: Game,
+            policy: Policy | None = None,
+            backend: InputBackend | None = None,
+            renderer: TerminalRenderer | None = None) -> None:
+        """
+        Args:
+            game (Game): 進めるゲーム
+            policy (Policy | None): 指定した場合はキー入力の代わりに操作方針で動かす
+            backend (InputBackend | None): キー入力．Noneの場合は
+                `Controller.get_backend()` (標準入力)
+            renderer (TerminalRenderer | None): 描画に使うレンダラ．
+                Noneの場合は標準出力に描画する
+        """
+        self.game = game
+        self.interval = game.params.tick_interval
+        self.policy = policy
+        self.backend = backend
+        self.renderer = renderer if renderer is not None \
+            else TerminalRenderer()
+        self.missed = 0
+        self.max_lateness = 0.0
+        self._key = (0, 0)  # 前のターンから最後に押されたキーの方向
+        self._fd: int | None = None  # add_readerで待っているファイルディスクリプタ
+
+    def _on_readable(self) -> None:
+        """読めるようになったキー入力を全て読み，最後の移動キーを覚える"""
+        direction = self.backend.poll()
+        if direction is not None:
+            self._key = direction
+        if self.backend.exhausted and self._fd is not None:
+            # 入力が閉じられたのでこれ以上は読まない
+            asyncio.get_running_loop().remove_reader(self._fd)
+            self._fd = None
+
+    def _next_action(self) -> tuple[int, int] | None:
+        """このターンのプレイヤーの移動方向を返す
+
+        Returns:
+            tuple[int, int] | None: 移動方向．入力の終わりに達し，
+                使っていないキーもなければNone
+        """
+        if self.policy is not None:
+            return self.policy(self.game, self.game.players[0])
+        if self._fd is None:
+            self._on_readable()  # 待てない入力は毎ターン読む
+        key, self._key = self._key, (0, 0)
+        if self.backend.exhausted and key == (0, 0):
+            return None
+        return key
+
+    async def run(self) -> str | None:
+        """ゲームが終わるまで一定間隔で進める
+
+        Returns:
+            str | None: ゲーム終了時のメッセージ．
+                ゲームの途中で入力 (台本など) が終わった場合はNone
+        """
+        game = self.game
+        profiler = game.profiler  # Noneの場合は計測しない
+        loop = asyncio.get_running_loop()
+        if self.policy is not None:
+            self.policy.reset(game)
+        reading = self.policy is None
+        if reading and self.backend is None:
+            self.backend = Controller.get_backend()
+        logger.info(f"seed: {game.seed}")
+        result = None
+        try:
+            if reading:
+                self.backend.open()  # ゲームの間は端末のモードを切り替えたままにする
+                self._fd = self.backend.fileno()
+                if self._fd is not None:
+                    loop.add_reader(self._fd, self._on_readable)
+            try:
+                deadline = loop.time()
+                while True:
+                    if profiler is not None:
+                        t = profiler.clock()
+                    self.renderer.render(game.frame())
+                    if profiler is not None:
+                        t = profiler.lap(RENDER, t)
+                    action = self._next_action()
+                    if action is None:
+                        logger.info("input closed")
+                        break
+                    if profiler is not None:
+                        profiler.lap(INPUT, t)
+                    _, _, done, info = game.step(action)
+                    if profiler is not None:
+                        t = profiler.clock()
+                    game.field.update_field()
+                    if profiler is not None:
+                        profiler.lap(UPDATE_FIELD, t)
+                    if done:
+                        self.renderer.render(game.frame())
+                        result = info["result"]
+                        break
+
+                    # 処理にかかった時間を差し引いて次の予定時刻まで待つ
+                    deadline += self.interval
+                    delay = deadline - loop.time()
+                    if delay < 0:
+                        self.missed += 1
+                        self.max_lateness = max(self.max_lateness, -delay)
+                        logger.debug(
+                            f"tick {game.tick} missed deadline "
+                            f"by {-delay * 1e3:.1f} ms")
+                        deadline = loop.time()  # 遅れは取り戻さない
+                        delay = 0
+                    # 遅れた場合もイベントループに戻り，キー入力を読ませる
+                    await asyncio.sleep(delay)
+            finally:
+                if self._fd is not None:
+                    loop.remove_reader(self._fd)
+                self.renderer.close()
+        finally:
+            if reading:
+                self.backend.close()
+        if result is not None:
+            logger.info(result)
+        logger.info(
+            f"missed deadlines: {self.missed}/{game.tick} ticks "
+            f"(max {self.max_lateness * 1e3:.1f} ms late)")
+        if profiler is not None:
+            profiler.log_summary()
+        return result
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,233 @@
+"""複数ゲームの一括実行
+N個のゲームをNumPyの配列にまとめて保持し，同じターンを一斉に進めるモジュール．
+移動と衝突判定のルールは `Game.step` と同じで，
+同じシードで実行すると1つずつ `Game` で実行した場合と同じ結果になる．
+"""
+from collections.abc import Sequence
+import numpy as np
+from config import Parameters
+from enemy import Enemy
+from game_random import GOLDEN_GAMMA, MASK64, MIX_MULT1, MIX_MULT2
+
+
+# 結果コードとゲーム終了時のメッセージの対応
+RUNNING, GAME_OVER, GAME_CLEAR = 0, 1, 2
+RESULT_MESSAGES = (None, "Game Over!", "Game Clear!")
+
+_DIRECTIONS = np.array(Enemy.DIRECTIONS, dtype=np.int64)
+
+
+def mix64(z: np.ndarray) -> np.ndarray:
+    """splitmix64の出力関数 (`game_random.mix64` の配列版)
+
+    Args:
+        z (np.ndarray): uint64の状態の配列
+
+    Returns:
+        np.ndarray: uint64の乱数の配列
+
+    Examples:
+        >>> from game_random import mix64 as scalar_mix64
+        >>> z = np.array([1, 2, GOLDEN_GAMMA], dtype=np.uint64)
+        >>> mix64(z).tolist() == [scalar_mix64(int(v)) for v in z]
+        True
+    """
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(MIX_MULT1)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(MIX_MULT2)
+    return z ^ (z >> np.uint64(31))
+
+
+class BatchGame:
+    """N個のゲームを一括で進めるクラス
+    各ゲームの状態をstruct-of-arraysで保持する．プレイヤーは各ゲーム1人．
+
+    Attributes:
+        n_games (int): ゲームの数
+        f_size (int): フィールドのサイズ
+        players (np.ndarray): プレイヤーの座標 (N, 1, 2)
+        enemies (np.ndarray): 敵の座標 (N, enemy_num, 2)
+        foods (np.ndarray): 食べ物の座標 (N, food_num, 2)
+        food_alive (np.ndarray): 食べ物が残っているか (N, food_num)
+        walls (np.ndarray): 壁のあるマス [n, y, x] (N, f_size, f_size)
+        rng_state (np.ndarray): 各ゲームの乱数生成器の状態 (N,)
+        tick (np.ndarray): 各ゲームの経過ターン数 (N,)
+        food_eaten (np.ndarray): 各ゲームで食べた食べ物の数 (N,)
+        result (np.ndarray): 各ゲームの結果コード (N,)
+
+    Examples:
+        >>> batch = BatchGame(Parameters(), 3)
+        >>> batch.reset([0, 1, 2])
+        >>> rewards, done = batch.step(np.zeros((3, 2), dtype=np.int64))
+        >>> batch.tick.tolist()
+        [1, 1, 1]
+    """
+
+    def __init__(self, params: Parameters, n_games: int) -> None:
+        """
+        Args:
+            params (Parameters): configのパラメータのインスタンス
+            n_games (int): 一括で実行するゲームの数
+        """
+        if params.field_size < 4:
+            raise ValueError("field_size must be greater than 4")
+        if params.enemy_strategy != "random":
+            # 距離場を使う行動方針はGameでのみ対応する
+            raise ValueError(
+                "BatchGame supports only enemy_strategy='random'")
+        if params.map_path:
+            # 壁は周りだけの正方形のフィールドのみ対応する
+            raise ValueError("BatchGame does not support map_path")
+        if params.collision != "legacy":
+            # 移動の衝突の解決はGameでのみ対応する
+            raise ValueError("BatchGame supports only collision='legacy'")
+        self.params = params
+        self.n_games = n_games
+        self.f_size = params.field_size
+        n, f = n_games, params.field_size
+        self.players = np.ones((n, 1, 2), dtype=np.int64)
+        self.enemies = np.zeros((n, params.enemy_num, 2), dtype=np.int64)
+        self.foods = np.zeros((n, params.food_num, 2), dtype=np.int64)
+        self.food_alive = np.ones((n, params.food_num), dtype=bool)
+        # フィールドの周りを壁とする
+        self.walls = np.zeros((n, f, f), dtype=bool)
+        self.walls[:, [0, -1], :] = True
+        self.walls[:, :, [0, -1]] = True
+        self.rng_state = np.zeros(n, dtype=np.uint64)
+        self.tick = np.zeros(n, dtype=np.int64)
+        self.food_eaten = np.zeros(n, dtype=np.int64)
+        self.result = np.zeros(n, dtype=np.int8)
+        self._rows = np.arange(n)
+
+    def _draw(self, k: int, mask: np.ndarray | None = None) -> np.ndarray:
+        """各ゲームの乱数生成器からk個ずつ乱数を生成する
+
+        Args:
+            k (int): 1ゲームあたりの生成数
+            mask (np.ndarray | None): 状態を進めるゲーム．Noneなら全て
+
+        Returns:
+            np.ndarray: uint64の乱数 (N, k)
+        """
+        steps = np.arange(1, k + 1, dtype=np.uint64) * np.uint64(GOLDEN_GAMMA)
+        values = mix64(self.rng_state[:, None] + steps[None, :])
+        advance = np.uint64((k * GOLDEN_GAMMA) & MASK64)
+        if mask is None:
+            self.rng_state += advance
+        else:
+            self.rng_state[mask] += advance
+        return values
+
+    def reset(self, seeds: Sequence[int]) -> None:
+        """全てのゲームを初期状態に戻す
+        配置の乱数の使い方は `Game.setup` と同じ．
+
+        Args:
+            seeds (Sequence[int]): 各ゲームのシード (長さN)
+        """
+        if len(seeds) != self.n_games:
+            raise ValueError("len(seeds) must be equal to n_games")
+        self.rng_state[:] = np.array(
+            [seed & MASK64 for seed in seeds], dtype=np.uint64)
+        e_num = self.enemies.shape[1]
+        f_num = self.foods.shape[1]
+        # 敵，食べ物の順にx, yを交互に引く
+        values = self._draw(2 * (e_num + f_num))
+        coords = 1 + (values % np.uint64(self.f_size - 2)).astype(np.int64)
+        coords = coords.reshape(self.n_games, e_num + f_num, 2)
+        self.enemies[:] = coords[:, :e_num]
+        self.foods[:] = coords[:, e_num:]
+        self.players[:] = 1
+        self.food_alive[:] = True
+        self.tick[:] = 0
+        self.food_eaten[:] = 0
+        self.result[:] = RUNNING
+
+    def _move(self, pos: np.ndarray, next_pos: np.ndarray) -> np.ndarray:
+        """壁にぶつかる移動を取り消した座標を返す (`Item.update_pos(stuck=True)`)
+
+        Args:
+            pos (np.ndarray): 現在の座標 (N, k, 2)
+            next_pos (np.ndarray): 移動したい座標 (N, k, 2)
+
+        Returns:
+            np.ndarray: 移動後の座標 (N, k, 2)
+        """
+        stuck = self.walls[
+            self._rows[:, None], next_pos[..., 1], next_pos[..., 0]]
+        return np.where(stuck[..., None], pos, next_pos)
+
+    def step(self, actions: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """実行中の全てのゲームを1ターン進める
+        終了したゲームは変化しない．
+
+        Args:
+            actions (np.ndarray): 各ゲームのプレイヤーの移動方向 (N, 2)
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: 報酬 (N,) と終了したか (N,)
+        """
+        active = self.result == RUNNING
+        act = active[:, None, None]
+        e_num = self.enemies.shape[1]
+
+        # プレイヤーと敵の移動
+        actions = np.asarray(actions, dtype=np.int64)
+        next_players = self.players + actions[:, None, :]
+        dirs = self._draw(e_num, active) % np.uint64(len(_DIRECTIONS))
+        next_enemies = self.enemies + _DIRECTIONS[dirs.astype(np.int64)]
+        self.players[:] = np.where(
+            act, self._move(self.players, next_players), self.players)
+        self.enemies[:] = np.where(
+            act, self._move(self.enemies, next_enemies), self.enemies)
+        self.tick += active
+
+        # 敵との衝突判定
+        player = self.players[:, 0]
+        hit = (self.enemies == player[:, None, :]).all(axis=-1).any(axis=-1)
+        hit &= active
+        rewards = -hit.astype(np.float64)
+        self.result[hit] = GAME_OVER
+
+        # 食べ物との衝突判定 (同じマスの食べ物のうち先頭のものを食べる)
+        if self.foods.shape[1] > 0:
+            on_food = (self.foods == player[:, None, :]).all(axis=-1)
+            bumped = on_food.any(axis=-1) & active & ~hit
+            first = on_food.argmax(axis=-1)
+            eaten = bumped & self.food_alive[self._rows, first]
+            self.food_alive[self._rows[bumped], first[bumped]] = False
+            self.food_eaten += eaten
+            rewards += eaten
+            clear = bumped & ~self.food_alive.any(axis=-1)
+            self.result[clear] = GAME_CLEAR
+
+        return rewards, self.result != RUNNING
+
+    def get_state(self, i: int) -> dict[str, list]:
+        """i番目のゲームの状態を `Game.get_state` と同じ形式で返す
+
+        Args:
+            i (int): ゲームの番号
+
+        Returns:
+            dict[str, list]: プレイヤー，敵，残っている食べ物の座標のリスト
+        """
+        return {
+            "players": [tuple(p) for p in self.players[i].tolist()],
+            "enemies": [tuple(e) for e in self.enemies[i].tolist()],
+            "foods": [
+                tuple(f) for f, alive in zip(
+                    self.foods[i].tolist(), self.food_alive[i]) if alive],
+        }
+
+    def results(self) -> list[str | None]:
+        """各ゲームの終了時のメッセージを返す
+
+        Returns:
+            list[str | None]: "Game Over!", "Game Clear!", 実行中ならNone
+        """
+        return [RESULT_MESSAGES[code] for code in self.result.tolist()]
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,85 @@
+"""アイテムのメモリ使用量の計測
+`__slots__` 導入前と同じ構成 (インスタンスごとの `__dict__` とアイコン文字列) の
+クラスと現在のクラスについて，1インスタンスあたりのバイト数を計測する．
+
+    python bench_memory.py -n 100000
+"""
+import argparse
+import tracemalloc
+from block import Block
+from enemy import Enemy
+from food import Food
+from item import Item
+from player import Player
+
+
+class LegacyItem:
+    """`__slots__` 導入前のItemと同じ属性の持ち方をするクラス"""
+
+    def __init__(self, x, y) -> None:
+        self.now_x = x
+        self.now_y = y
+        self.next_x = x
+        self.next_y = y
+        self.status = True
+        self.icon = ""
+
+
+class LegacyEnemy(LegacyItem):
+    """`__slots__` 導入前のEnemyと同じ属性の持ち方をするクラス"""
+
+    def __init__(self, x, y) -> None:
+        super().__init__(x, y)
+        self.icon = "👻"
+
+
+def bytes_per_item(cls: type, n: int) -> float:
+    """クラスのインスタンスをn個作ったときの1個あたりのバイト数を返す
+
+    Args:
+        cls (type): 計測するクラス (引数x, yで生成できること)
+        n (int): 生成するインスタンスの数
+
+    Returns:
+        float: 1インスタンスあたりのバイト数 (保持するリストの分は除く)
+
+    Examples:
+        >>> bytes_per_item(Enemy, 1000) < bytes_per_item(LegacyEnemy, 1000)
+        True
+    """
+    # 座標のintはキャッシュされる小さい値にして，アイテム本体の大きさだけを測る
+    coords = [(i % 200, i % 100) for i in range(n)]
+    items = [None] * n
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for i, (x, y) in enumerate(coords):
+        items[i] = cls(x, y)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (after - before) / n
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "-n", "--num", type=int, default=100000,
+        help="クラスごとに生成するインスタンスの数")
+    args = parser.parse_args()
+
+    rows = [
+        ("before (dict)", LegacyItem),
+        ("before (dict)", LegacyEnemy),
+        ("after (slots)", Item),
+        ("after (slots)", Player),
+        ("after (slots)", Enemy),
+        ("after (slots)", Food),
+        ("after (slots)", Block),
+    ]
+    print(f"{'layout':<14} {'class':<12} {'bytes/item':>10}")
+    for layout, cls in rows:
+        size = bytes_per_item(cls, args.num)
+        print(f"{layout:<14} {cls.__name__:<12} {size:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
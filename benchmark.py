@@ -0,0 +1,404 @@
+"""性能の計測
+`field_size`, `enemy_num`, `food_num` の組み合わせごとに，
+ヘッドレス実行の1秒あたりのターン数，`Field.update_field` と描画 (`display_field`,
+`TerminalRenderer.render`) の1回あたりの時間，最大メモリ使用量を別々に計測する．
+自動操作 (`AutopilotPolicy`) の判断の最大時間と予算を超えた回数も記録する
+(ごくまれなGCなどで大きく揺れるため，基準値とは比べない)．
+結果は `result/<run_date>_<pid>/benchmark.json` に出力し，保存した基準値より
+許容範囲を超えて悪くなった項目があれば一覧を表示して終了コード1で終了する．
+基準値には計測したマシンの情報も保存し，別のマシンで作った基準値とは
+マシンの性能に依存しない項目 (最大メモリ使用量) だけを比べる．
+基準値にない条件や項目は比べずに一覧を表示する．
+
+    python benchmark.py --sizes 12 32 64 --enemies 10 100 --foods 2 20
+    python benchmark.py --save-baseline  # 現在の結果を基準値として保存する
+"""
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import logging
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from dataclasses import replace
+from config import Parameters
+from config import common_args
+from game import Game
+from policy import AutopilotPolicy
+from policy import RandomPolicy
+from renderer import TerminalRenderer
+from utils import dump_params
+from utils import make_result_dir
+from utils import set_logging
+from utils import setup_params
+
+
+logger = logging.getLogger(__name__)
+
+# 基準値はリポジトリに含め，実行したディレクトリによらず同じファイルと比較する
+DEFAULT_BASELINE = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+# 項目ごとの良い方向 (1: 大きいほど良い，-1: 小さいほど良い)
+METRICS = {
+    "ticks_per_sec": 1,
+    "update_field_us": -1,
+    "display_field_us": -1,
+    "render_us": -1,
+    "peak_memory_kb": -1,
+}
+# 計測したマシンの性能によって変わる項目 (同じマシンの基準値とだけ比べる)
+HOST_DEPENDENT = {
+    "ticks_per_sec", "update_field_us", "display_field_us", "render_us"}
+
+
+def machine_info() -> dict[str, str | int | None]:
+    """計測しているマシンの情報を返す (基準値と同じマシンかの判定に使う)
+
+    Returns:
+        dict: ホスト名，CPUのアーキテクチャと名前，CPUの数，Pythonのバージョン
+
+    Examples:
+        >>> sorted(machine_info())
+        ['cpu_count', 'machine', 'node', 'processor', 'python']
+    """
+    return {
+        "node": platform.node(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+    }
+
+
+def case_name(params: Parameters) -> str:
+    """計測条件の名前 (結果と基準値のキー) を返す
+
+    Args:
+        params (Parameters): 計測するパラメータ
+
+    Returns:
+        str: 計測条件の名前
+
+    Examples:
+        >>> case_name(Parameters(field_size=32, enemy_num=100, food_num=2))
+        'f32_e100_n2'
+    """
+    return f"f{params.field_size}_e{params.enemy_num}_n{params.food_num}"
+
+
+def bench_ticks(params: Parameters, ticks: int) -> float:
+    """ヘッドレス実行の1秒あたりのターン数を計測する
+    `Game.step` の時間だけを合計し，ゲームが終わったときのresetは含めない．
+
+    Args:
+        params (Parameters): 計測するパラメータ
+        ticks (int): 計測するターン数
+
+    Returns:
+        float: 1秒あたりのターン数
+    """
+    game = Game(params, headless=True)
+    game.reset(0)
+    policy = RandomPolicy(0)
+    seed = 0
+    elapsed = 0
+    for _ in range(ticks):
+        if game.result is not None:
+            seed += 1
+            game.reset(seed)
+        action = policy(game, game.players[0])
+        start = time.perf_counter_ns()
+        game.step(action)
+        elapsed += time.perf_counter_ns() - start
+    return ticks / (elapsed / 1e9) if elapsed else float("inf")
+
+
+def bench_render(params: Parameters, ticks: int) -> dict[str, float]:
+    """フィールドの更新と描画の1回あたりの時間を計測する
+    描画の出力はメモリ上のバッファに捨てるため，端末の速さは含まない．
+
+    Args:
+        params (Parameters): 計測するパラメータ
+        ticks (int): 計測するターン数
+
+    Returns:
+        dict[str, float]: update_field_us, display_field_us, render_us (マイクロ秒)
+    """
+    game = Game(params, headless=True)
+    game.reset(0)
+    policy = RandomPolicy(0)
+    sink = io.StringIO()
+    renderer = TerminalRenderer(out=sink)
+    update = display = render = 0
+    seed = 0
+    for _ in range(ticks):
+        if game.result is not None:
+            seed += 1
+            game.reset(seed)
+            renderer = TerminalRenderer(out=sink)  # Fieldが変わったので全体を描き直す
+        game.step(policy(game, game.players[0]))
+        t0 = time.perf_counter_ns()
+        game.field.update_field()
+        t1 = time.perf_counter_ns()
+        with contextlib.redirect_stdout(sink):
+            game.field.display_field()
+        t2 = time.perf_counter_ns()
+        renderer.render(game.frame())
+        t3 = time.perf_counter_ns()
+        update += t1 - t0
+        display += t2 - t1
+        render += t3 - t2
+        sink.seek(0)
+        sink.truncate()
+    n = max(1, ticks)
+    return {
+        "update_field_us": update / n / 1e3,
+        "display_field_us": display / n / 1e3,
+        "render_us": render / n / 1e3,
+    }
+
+
+def bench_memory(params: Parameters, ticks: int) -> float:
+    """ゲームの生成から指定したターン数を進めるまでの最大メモリ使用量を計測する
+    tracemalloc は処理を遅くするため，時間の計測とは別に実行する．
+
+    Args:
+        params (Parameters): 計測するパラメータ
+        ticks (int): 進めるターン数
+
+    Returns:
+        float: 最大メモリ使用量 (KiB)
+    """
+    tracemalloc.start()
+    try:
+        game = Game(params, headless=True)
+        game.reset(0)
+        policy = RandomPolicy(0)
+        seed = 0
+        for _ in range(ticks):
+            if game.result is not None:
+                seed += 1
+                game.reset(seed)
+            game.step(policy(game, game.players[0]))
+            game.field.update_field()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return peak / 1024
+
+
+def bench_autopilot(params: Parameters, ticks: int) -> dict[str, float]:
+    """自動操作の判断の時間を計測する
+    ゲームが終わったらシードを変えて続け，合計でticks回判断させる．
+    1回目の判断は距離の表を作る `reset` の後に行うため，表を作る時間は含まない．
+
+    Args:
+        params (Parameters): 計測するパラメータ
+        ticks (int): 判断させる回数
+
+    Returns:
+        dict[str, float]: autopilot_max_us (最も時間のかかった判断，マイクロ秒) と
+            autopilot_overruns (予算 `AutopilotPolicy.budget_ns` を超えた判断の回数)
+
+    Examples:
+        >>> import distance
+        >>> distance.oracle_cache_dir = None  # 距離の表をディスクに保存しない
+        >>> result = bench_autopilot(Parameters(field_size=8, enemy_num=2), 20)
+        >>> sorted(result)
+        ['autopilot_max_us', 'autopilot_overruns']
+    """
+    game = Game(params, headless=True)
+    policy = AutopilotPolicy()
+    seed = 0
+    while policy.decisions < ticks:
+        game.reset(seed)
+        seed += 1
+        game.play(policy, max_ticks=ticks - policy.decisions)
+    return {
+        "autopilot_max_us": policy.max_latency_ns / 1e3,
+        "autopilot_overruns": policy.overruns,
+    }
+
+
+def run_case(
+        params: Parameters,
+        ticks: int,
+        repeat: int = 3) -> dict[str, float]:
+    """1つの条件について全ての項目を計測する
+    時間は他の処理の影響を減らすため，`repeat` 回計測して最も良い値を使う．
+
+    Args:
+        params (Parameters): 計測するパラメータ
+        ticks (int): 計測するターン数
+        repeat (int): 時間を計測する回数
+
+    Returns:
+        dict[str, float]: `METRICS` の項目ごとの計測値と，自動操作の判断の時間
+
+    Examples:
+        >>> import distance
+        >>> distance.oracle_cache_dir = None  # 距離の表をディスクに保存しない
+        >>> result = run_case(Parameters(field_size=8, enemy_num=2), 20, 1)
+        >>> sorted(METRICS) == sorted(set(result) & set(METRICS))
+        True
+    """
+    result = {"ticks_per_sec": max(
+        bench_ticks(params, ticks) for _ in range(repeat))}
+    renders = [bench_render(params, ticks) for _ in range(repeat)]
+    for name in renders[0]:
+        result[name] = min(r[name] for r in renders)
+    result["peak_memory_kb"] = bench_memory(params, min(ticks, 100))
+    result.update(bench_autopilot(params, ticks))
+    return result
+
+
+def compare(
+        results: dict[str, dict[str, float]],
+        baseline: dict[str, dict[str, float]],
+        tolerance: float,
+        same_host: bool = True) -> tuple[list[str], list[str]]:
+    """基準値と比べて悪くなった項目と，基準値がなく比べられなかった項目を返す
+
+    Args:
+        results (dict): 条件ごとの計測値
+        baseline (dict): 条件ごとの基準値
+        tolerance (float): 許容する悪化の割合 (0.2なら20%まで)
+        same_host (bool): 基準値を同じマシンで計測したか．
+            Falseの場合は `HOST_DEPENDENT` の項目を比べない
+
+    Returns:
+        tuple[list[str], list[str]]: (許容範囲を超えて悪くなった項目の説明,
+            基準値がない条件や項目)
+
+    Examples:
+        >>> base = {"f12_e10_n2": {"ticks_per_sec": 1000, "render_us": 10}}
+        >>> now = {"f12_e10_n2": {"ticks_per_sec": 700, "render_us": 11},
+        ...        "f64_e10_n2": {"ticks_per_sec": 300}}
+        >>> regressions, missing = compare(now, base, 0.2)
+        >>> regressions
+        ['f12_e10_n2 ticks_per_sec: 700 (baseline 1000, -30.0%)']
+        >>> missing
+        ['f64_e10_n2']
+        >>> compare(now, base, 0.2, same_host=False)[0]
+        []
+    """
+    regressions, missing = [], []
+    for case, metrics in results.items():
+        if case not in baseline:
+            missing.append(case)
+            continue
+        for name, value in metrics.items():
+            if name not in METRICS:
+                continue
+            if not same_host and name in HOST_DEPENDENT:
+                continue
+            base = baseline[case].get(name)
+            if not base:
+                missing.append(f"{case} {name}")
+                continue
+            change = (value - base) / base
+            if METRICS[name] * change < -tolerance:
+                regressions.append(
+                    f"{case} {name}: {value:.4g} "
+                    f"(baseline {base:.4g}, {change:+.1%})")
+    return regressions, missing
+
+
+def main() -> None:
+    # コマンドライン引数の設定
+    parser = argparse.ArgumentParser()
+    parser = common_args(parser)  # コマンドライン引数引数を読み込み
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[12, 32, 64],
+        help="計測するfield_size")
+    parser.add_argument(
+        "--enemies", type=int, nargs="+", default=[10, 100],
+        help="計測するenemy_num")
+    parser.add_argument(
+        "--foods", type=int, nargs="+", default=[2, 20],
+        help="計測するfood_num")
+    parser.add_argument(
+        "--ticks", type=int, default=2000, help="条件ごとに計測するターン数")
+    parser.add_argument(
+        "--repeat", type=int, default=3, help="時間を計測する回数 (最も良い値を使う)")
+    parser.add_argument(
+        "--baseline", type=str, default=DEFAULT_BASELINE,
+        help="比較する基準値のファイル")
+    parser.add_argument(
+        "--tolerance", type=float, default=0.2,
+        help="許容する悪化の割合")
+    parser.add_argument(
+        "--save-baseline", action="store_true",
+        help="今回の結果を基準値として保存する")
+    args = parser.parse_args()
+    if not args.save_baseline and not os.path.exists(args.baseline):
+        # 基準値がなければ比較できないので，計測する前にエラーで終了する
+        parser.error(
+            f"{args.baseline} not found. run with --save-baseline first")
+    params = Parameters(**setup_params(vars(args), args.parameters))
+
+    # 結果出力用ファイルの作成
+    # 実行日時とプロセスIDを名前とするディレクトリを作成
+    result_dir = make_result_dir(params.run_date)  # 結果出力ディレクトリ
+    dump_params(params, f'{result_dir}')  # パラメータを出力
+    set_logging(result_dir)  # ログを標準出力とファイルに出力するよう設定
+
+    results = {}
+    for size, enemies, foods in itertools.product(
+            args.sizes, args.enemies, args.foods):
+        case = replace(
+            params, field_size=size, enemy_num=enemies, food_num=foods)
+        results[case_name(case)] = run_case(case, args.ticks, args.repeat)
+        logger.info(f"{case_name(case)}: {results[case_name(case)]}")
+        if results[case_name(case)]["autopilot_overruns"]:
+            logger.warning(
+                f"{case_name(case)}: autopilot exceeded its budget "
+                f"{results[case_name(case)]['autopilot_overruns']} times "
+                f"in {args.ticks} decisions")
+    with open(f"{result_dir}/benchmark.json", "w") as f:
+        json.dump({
+            "git_revision": params.git_revision.strip(),
+            "ticks": args.ticks,
+            "repeat": args.repeat,
+            "results": results,
+        }, f, indent=4)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump({"machine": machine_info(), "results": results},
+                      f, indent=4)
+        logger.info(f"baseline saved to {args.baseline}")
+        return
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    same_host = baseline.get("machine") == machine_info()
+    if not same_host:
+        # 性能の違うマシンの時間と比べても意味がないので，メモリ使用量だけを比べる
+        logger.warning(
+            f"baseline was measured on {baseline.get('machine')}, "
+            f"not on this machine ({machine_info()}). "
+            f"comparing only {sorted(set(METRICS) - HOST_DEPENDENT)}. "
+            "run with --save-baseline --baseline <file> to compare timings")
+    base_results = baseline.get("results", {})
+    regressions, missing = compare(
+        results, base_results, args.tolerance, same_host)
+    for item in missing:
+        logger.warning(f"NO BASELINE {item}")
+    if regressions:
+        for regression in regressions:
+            logger.error(f"REGRESSION {regression}")
+        sys.exit(1)
+    if not any(case in base_results for case in results):
+        logger.error("nothing was compared with the baseline")
+        sys.exit(1)
+    logger.info(
+        f"no regressions (tolerance {args.tolerance:.0%}, "
+        f"{len(missing)} items without baseline)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,4 @@
 from item import Item
-import doctest
 
 
 class Block(Item):
@@ -24,10 +23,10 @@ class Block(Item):
         True
     """
 
-    def __init__(self, x, y) -> None:
-        super().__init__(x, y)
-        self.icon = "🌴"
+    __slots__ = ()
+    ICON = "🌴"
 
 
 if __name__ == "__main__":
+    import doctest
     doctest.testmod()
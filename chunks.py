@@ -0,0 +1,274 @@
+"""チャンクに分けた疎なマップ
+フィールドを `chunk_size` 四方のチャンクに分け，既定値以外の値を持つマスを含む
+チャンクだけを確保するモジュール．
+何もないチャンクはメモリを使わないため，field_sizeが数千の広いマップでも
+使用量は壁などのあるチャンクの数に比例する．
+マップファイルから読み込んだ壁のように既に密なバイト列がある場合は，
+同じ操作をそのバイト列の上で行う `DenseGrid` を使う．
+"""
+from __future__ import annotations
+from array import array
+
+
+class ChunkedGrid:
+    """チャンクに分けて値を保持する2次元の格子
+
+    Attributes:
+        size (int): 格子の1辺のマス数
+        chunk_size (int): チャンクの1辺のマス数 (2のべき乗)
+        default (int): 確保していないマスの値
+
+    Examples:
+        >>> grid = ChunkedGrid(1000, chunk_size=16)
+        >>> grid.set(3, 999, 1)
+        >>> grid.get(3, 999), grid.get(4, 999), grid.chunk_count
+        (1, 0, 1)
+        >>> grid.set(3, 999, 0)  # 既定値だけになったチャンクは解放する
+        >>> grid.chunk_count
+        0
+    """
+
+    def __init__(
+            self,
+            size: int,
+            chunk_size: int = 32,
+            default: int = 0,
+            typecode: str = "B") -> None:
+        """
+        Args:
+            size (int): 格子の1辺のマス数
+            chunk_size (int): チャンクの1辺のマス数 (2のべき乗)
+            default (int): 確保していないマスの値
+            typecode (str): チャンクの `array` の型
+        """
+        if chunk_size & (chunk_size - 1):
+            raise ValueError("chunk_size must be a power of 2")
+        self.size = size
+        self.chunk_size = chunk_size
+        self.default = default
+        self.typecode = typecode
+        self._shift = chunk_size.bit_length() - 1
+        self._mask = chunk_size - 1
+        self._stride = (size + chunk_size - 1) >> self._shift  # 1行のチャンク数
+        # チャンクの番号 -> (値の配列, 既定値でないマスの数)
+        self._chunks: dict[int, array] = {}
+        self._counts: dict[int, int] = {}
+        self._empty = array(typecode, [default]) * (chunk_size * chunk_size)
+
+    @property
+    def chunk_count(self) -> int:
+        """確保しているチャンクの数"""
+        return len(self._chunks)
+
+    @property
+    def nbytes(self) -> int:
+        """確保しているチャンクの値の合計バイト数"""
+        return len(self._chunks) * self._empty.itemsize * len(self._empty)
+
+    def get(self, x: int, y: int) -> int:
+        """マスの値を返す (格子の外は既定値)
+
+        Args:
+            x (int): x座標
+            y (int): y座標
+
+        Returns:
+            int: マスの値
+        """
+        if not (0 <= x < self.size and 0 <= y < self.size):
+            return self.default
+        chunk = self._chunks.get(
+            (y >> self._shift) * self._stride + (x >> self._shift))
+        if chunk is None:
+            return self.default
+        return chunk[((y & self._mask) << self._shift) | (x & self._mask)]
+
+    def set(self, x: int, y: int, value: int) -> None:
+        """マスの値を設定する
+
+        Args:
+            x (int): x座標
+            y (int): y座標
+            value (int): 値
+        """
+        if not (0 <= x < self.size and 0 <= y < self.size):
+            raise IndexError(f"({x}, {y}) is out of the grid")
+        key = (y >> self._shift) * self._stride + (x >> self._shift)
+        chunk = self._chunks.get(key)
+        if chunk is None:
+            if value == self.default:
+                return
+            chunk = array(self.typecode, self._empty)
+            self._chunks[key] = chunk
+            self._counts[key] = 0
+        i = ((y & self._mask) << self._shift) | (x & self._mask)
+        old = chunk[i]
+        chunk[i] = value
+        count = self._counts[key] + (old == self.default) \
+            - (value == self.default)
+        if count:
+            self._counts[key] = count
+        else:
+            del self._chunks[key], self._counts[key]
+
+    def cells(self) -> list[tuple[int, int]]:
+        """既定値でないマスの座標を返す
+
+        Returns:
+            list[tuple[int, int]]: (x, y) のリスト
+
+        Examples:
+            >>> grid = ChunkedGrid(100, chunk_size=8)
+            >>> grid.set(70, 2, 1); grid.set(1, 2, 1)
+            >>> sorted(grid.cells())
+            [(1, 2), (70, 2)]
+        """
+        result = []
+        c, default = self.chunk_size, self.default
+        for key, chunk in self._chunks.items():
+            x0 = (key % self._stride) * c
+            y0 = (key // self._stride) * c
+            for i, value in enumerate(chunk):
+                if value != default:
+                    result.append(
+                        (x0 + (i & self._mask), y0 + (i >> self._shift)))
+        return result
+
+    def cells_in(
+            self, x0: int, y0: int,
+            x1: int, y1: int) -> list[tuple[int, int]]:
+        """範囲 [x0, x1) * [y0, y1) 内の既定値でないマスの座標を返す
+        範囲と重なる確保済みのチャンクだけを調べる．
+
+        Args:
+            x0 (int): 左上のx座標
+            y0 (int): 左上のy座標
+            x1 (int): 右下のx座標 (含まない)
+            y1 (int): 右下のy座標 (含まない)
+
+        Returns:
+            list[tuple[int, int]]: (x, y) のリスト
+
+        Examples:
+            >>> grid = ChunkedGrid(100, chunk_size=8)
+            >>> for x, y in [(5, 5), (9, 6), (30, 30)]:
+            ...     grid.set(x, y, 1)
+            >>> sorted(grid.cells_in(4, 4, 12, 12))
+            [(5, 5), (9, 6)]
+        """
+        x0, y0 = max(x0, 0), max(y0, 0)
+        x1, y1 = min(x1, self.size), min(y1, self.size)
+        result = []
+        shift, mask, c = self._shift, self._mask, self.chunk_size
+        default = self.default
+        cy1 = ((y1 - 1) >> shift) + 1 if y1 > y0 else 0
+        cx1 = ((x1 - 1) >> shift) + 1 if x1 > x0 else 0
+        for cy in range(y0 >> shift, cy1):
+            for cx in range(x0 >> shift, cx1):
+                chunk = self._chunks.get(cy * self._stride + cx)
+                if chunk is None:
+                    continue
+                bx, by = cx * c, cy * c
+                lx0, lx1 = max(x0 - bx, 0), min(x1 - bx, c)
+                for ly in range(max(y0 - by, 0), min(y1 - by, c)):
+                    row = ly << shift
+                    for lx, value in enumerate(
+                            chunk[row + lx0:row + lx1], lx0):
+                        if value != default:
+                            result.append((bx + lx, by + ly))
+        return result
+
+    def to_bytes(self) -> bytearray:
+        """格子全体を密なバイト列 [y * size + x] にする
+        マップ全体を調べる処理 (最短距離など) に渡すためのもので，size^2 バイトを使う．
+
+        Returns:
+            bytearray: 各マスの値
+        """
+        size = self.size
+        dense = bytearray(size * size)
+        if self.default:
+            dense[:] = bytes([self.default]) * (size * size)
+        for x, y in self.cells():
+            dense[y * size + x] = self.get(x, y)
+        return dense
+
+
+class DenseGrid:
+    """密なバイト列 [y * size + x] をそのまま使う格子
+    `ChunkedGrid` と同じ操作を持ち，mmapしたファイルの一部なども複製せずに扱える．
+
+    Attributes:
+        size (int): 格子の1辺のマス数
+        data (bytes | bytearray | memoryview): 各マスの値
+        default (int): 格子の外の値
+
+    Examples:
+        >>> grid = DenseGrid(3, bytes([1, 0, 0,
+        ...                            0, 0, 1,
+        ...                            0, 0, 0]))
+        >>> grid.get(2, 1), grid.get(5, 5)
+        (1, 0)
+        >>> grid.cells(), grid.cells_in(1, 0, 3, 3)
+        ([(0, 0), (2, 1)], [(2, 1)])
+    """
+
+    default = 0
+
+    def __init__(
+            self,
+            size: int,
+            data: bytes | bytearray | memoryview) -> None:
+        """
+        Args:
+            size (int): 格子の1辺のマス数
+            data (bytes | bytearray | memoryview): 各マスの値 (size^2 バイト)
+        """
+        if len(data) != size * size:
+            raise ValueError(f"expected {size * size} bytes, got {len(data)}")
+        self.size = size
+        self.data = data
+
+    @property
+    def nbytes(self) -> int:
+        """値のバイト数"""
+        return len(self.data)
+
+    def get(self, x: int, y: int) -> int:
+        """マスの値を返す (格子の外は0)"""
+        if not (0 <= x < self.size and 0 <= y < self.size):
+            return 0
+        return self.data[y * self.size + x]
+
+    def set(self, x: int, y: int, value: int) -> None:
+        """マスの値を設定する (書き込めるバイト列の場合のみ)"""
+        if not (0 <= x < self.size and 0 <= y < self.size):
+            raise IndexError(f"({x}, {y}) is out of the grid")
+        self.data[y * self.size + x] = value
+
+    def cells_in(
+            self, x0: int, y0: int,
+            x1: int, y1: int) -> list[tuple[int, int]]:
+        """範囲 [x0, x1) * [y0, y1) 内の0でないマスの座標を返す"""
+        x0, y0 = max(x0, 0), max(y0, 0)
+        x1, y1 = min(x1, self.size), min(y1, self.size)
+        result = []
+        for y in range(y0, y1):
+            row = y * self.size
+            for x, value in enumerate(self.data[row + x0:row + x1], x0):
+                if value:
+                    result.append((x, y))
+        return result
+
+    def cells(self) -> list[tuple[int, int]]:
+        """0でないマスの座標を返す"""
+        return self.cells_in(0, 0, self.size, self.size)
+
+    def to_bytes(self) -> bytes | bytearray | memoryview:
+        """格子全体のバイト列を返す (複製しない)"""
+        return self.data
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
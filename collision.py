@@ -0,0 +1,148 @@
+"""同時移動の衝突解決
+1ターン分の全てのプレイヤーと敵の移動先 (壁で止まった分は反映済み) をまとめて受け取り，
+同じマスへの移動，入れ替わり (すれ違い)，止まったアイテムに続く移動の連鎖を
+辞書を引くだけで判定する．計算量は動くアイテムの数に比例する．
+
+`Parameters.collision` で衝突の扱いを選択する．
+    legacy: 衝突を解決しない (従来通り，移動後の位置でのみ敵との衝突を判定する)
+    block : 敵同士・プレイヤー同士はふさぎ合う (重ならず，すれ違えない)．
+            プレイヤーと敵が同じマスに入るか，すれ違うとゲームオーバー
+    kill  : blockと同じくふさぎ合い，プレイヤーと敵がすれ違うとゲームオーバー
+    stack : 重なってもよいが，プレイヤーと敵がすれ違うとゲームオーバー
+"""
+from __future__ import annotations
+
+
+LEGACY = "legacy"
+POLICIES = (LEGACY, "block", "kill", "stack")
+
+
+def collision_groups(
+        policy: str,
+        n_players: int,
+        n_enemies: int) -> list[int | None]:
+    """プレイヤー，敵の順に，互いにふさぎ合うグループを返す
+
+    Args:
+        policy (str): 衝突の扱い (`POLICIES`)
+        n_players (int): プレイヤーの数
+        n_enemies (int): 敵の数
+
+    Returns:
+        list[int | None]: アイテムごとのグループ．同じグループのアイテム同士だけが
+            ふさぎ合い，Noneのアイテムは何もふさがない
+
+    Raises:
+        ValueError: 未知の衝突の扱いを指定した場合
+
+    Examples:
+        >>> collision_groups("block", 1, 2)
+        [0, 1, 1]
+        >>> collision_groups("kill", 1, 2)
+        [0, 1, 1]
+        >>> collision_groups("stack", 1, 2)
+        [None, None, None]
+    """
+    if policy not in POLICIES:
+        raise ValueError(
+            f"unknown collision: {policy} (choose from {list(POLICIES)})")
+    if policy in ("block", "kill"):
+        return [0] * n_players + [1] * n_enemies
+    return [None] * (n_players + n_enemies)
+
+
+def resolve_moves(
+        starts: list[tuple[int, int]],
+        targets: list[tuple[int, int]],
+        groups: list[int | None]
+        ) -> tuple[list[bool], list[tuple[int, int]]]:
+    """全てのアイテムの移動をまとめて判定する
+    同じグループの中で，次の移動は止める (止まったアイテムは現在のマスに残る)．
+        - 同じマスへの移動 (移動しようとした全員を止める)
+        - 入れ替わり
+        - 止まっているアイテムのマスへの移動 (止まったことで連鎖的に止まる)
+    3つ以上のアイテムが輪になって1マスずつ進む移動は，どのマスも空くので止めない．
+    止めなかった移動のうち，異なるグループのアイテムの入れ替わりを返す．
+
+    Args:
+        starts (list[tuple[int, int]]): アイテムごとの現在のマス
+        targets (list[tuple[int, int]]): アイテムごとの移動先 (動かない場合は現在のマス)
+        groups (list[int | None]): アイテムごとのグループ (`collision_groups`)
+
+    Returns:
+        tuple[list[bool], list[tuple[int, int]]]:
+            (アイテムごとに移動を止めたか, 入れ替わったアイテムの番号の組 (i < j))
+
+    Examples:
+        入れ替わりは同じグループなら止め，異なるグループなら返す
+        >>> resolve_moves([(1, 1), (2, 1)], [(2, 1), (1, 1)], [0, 0])
+        ([True, True], [])
+        >>> resolve_moves([(1, 1), (2, 1)], [(2, 1), (1, 1)], [0, 1])
+        ([False, False], [(0, 1)])
+
+        同じマスへの移動と，止まったアイテムに続く移動の連鎖
+        >>> starts = [(1, 1), (3, 1), (0, 1), (4, 1)]
+        >>> targets = [(2, 1), (2, 1), (1, 1), (3, 1)]
+        >>> resolve_moves(starts, targets, [0, 0, 0, 0])
+        ([True, True, True, True], [])
+
+        前のアイテムが動けば続いて動ける．輪になった移動も止めない
+        >>> resolve_moves([(1, 1), (2, 1)], [(2, 1), (3, 1)], [0, 0])
+        ([False, False], [])
+        >>> resolve_moves([(1, 1), (2, 1), (2, 2), (1, 2)],
+        ...               [(2, 1), (2, 2), (1, 2), (1, 1)], [0, 0, 0, 0])
+        ([False, False, False, False], [])
+    """
+    n = len(starts)
+    stuck = [False] * n
+    claims: dict[tuple, list[int]] = {}  # (グループ, 移動先) -> 移動するアイテム
+    edges: dict[tuple, list[int]] = {}  # (現在のマス, 移動先) -> 移動するアイテム
+    queue = []  # 現在のマスに残るアイテム
+    for i in range(n):
+        start, target = starts[i], targets[i]
+        group = groups[i]
+        if start == target:
+            if group is not None:
+                queue.append(i)
+            continue
+        if group is not None:
+            claims.setdefault((group, target), []).append(i)
+        edges.setdefault((start, target), []).append(i)
+
+    # 同じマスへの移動と入れ替わり
+    crossings = []
+    for i in range(n):
+        start, target = starts[i], targets[i]
+        if start == target:
+            continue
+        group = groups[i]
+        if group is not None and len(claims[(group, target)]) > 1 \
+                and not stuck[i]:
+            stuck[i] = True
+            queue.append(i)
+        for j in edges.get((target, start), ()):
+            if j < i:
+                continue  # 組ごとに1回だけ調べる
+            if group is not None and groups[j] == group:
+                for k in (i, j):
+                    if not stuck[k]:
+                        stuck[k] = True
+                        queue.append(k)
+            else:
+                crossings.append((i, j))
+
+    # 現在のマスに残るアイテムのマスへの移動を連鎖的に止める
+    while queue:
+        k = queue.pop()
+        for i in claims.get((groups[k], starts[k]), ()):
+            if not stuck[i]:
+                stuck[i] = True
+                queue.append(i)
+
+    swaps = [(i, j) for i, j in crossings if not stuck[i] and not stuck[j]]
+    return stuck, swaps
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -30,8 +30,20 @@ class Parameters:
     git_revision: str = ''  # 実行時のプログラムのGitのバージョン
 
     field_size: int = 12  # フィールドサイズ フィールドの1辺の長さ
+    # マップファイルのパス．指定した場合は壁と出現位置をマップから読み込み，field_sizeは使わない
+    map_path: str = ''
     enemy_num: int = 10  # 敵の数
     food_num: int = 2  # 食べ物の数
+    seed: int | None = None  # 乱数のシード．Noneの場合は実行ごとに異なるゲームになる
+    enemy_strategy: str = "random"  # 敵の行動 (random, chase, ambush, scatter)
+    # プレイヤーと敵の移動の衝突の扱い (legacy, block, kill, stack)．collision.pyを参照
+    collision: str = "legacy"
+    tick_interval: float = 0.3  # 1ターンの長さ (秒)
+    profile: bool = False  # Trueの場合は処理ごとの時間を計測してlog.logに出力する
+    # ターンごとの計測値の出力形式 ('': 出力しない, 'columns', 'jsonl')
+    telemetry: str = ''
+    # 表示する範囲の1辺のマス数．0の場合はフィールド全体 (広いマップではfield.VIEW_SIZE)
+    viewport_size: int = 0
     # param2: dict = field(default_factory=lambda: {'k1': 'v1', 'k2': 'v2'})
     # リストや辞書で与える例
 
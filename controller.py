@@ -1,9 +1,363 @@
+import contextlib
+import os
+import select
 import sys
 import termios
+from collections import deque
+from collections.abc import Iterator
+from typing import IO
+
+
+# キーとx, y座標の差分の対応
+KEY_DIRECTIONS = {
+    "w": (0, -1),
+    "a": (-1, 0),
+    "s": (0, 1),
+    "d": (1, 0),
+}
+# 矢印キーのエスケープシーケンス (ESC [ A など) の最後の文字とキーの対応
+ARROW_KEYS = {"A": "w", "B": "s", "C": "d", "D": "a"}
+
+
+@contextlib.contextmanager
+def cbreak(fd: int) -> Iterator[None]:
+    """端末をエンターキーなしで1文字ずつ読めるモードにする
+    終了時に元のモードに戻す．fdが端末でない (パイプなど) 場合は何もしない．
+
+    Args:
+        fd (int): 入力のファイルディスクリプタ
+    """
+    if not os.isatty(fd):
+        yield
+        return
+    old = termios.tcgetattr(fd)
+    new = termios.tcgetattr(fd)
+    new[3] &= ~(termios.ICANON | termios.ECHO)
+    new[6][termios.VMIN] = 0  # 読めるバイトがなければすぐに戻る
+    new[6][termios.VTIME] = 0
+    termios.tcsetattr(fd, termios.TCSANOW, new)
+    try:
+        yield
+    finally:
+        termios.tcsetattr(fd, termios.TCSANOW, old)
+
+
+class InputBackend:
+    """キー入力の読み込み方の親クラス
+    `read_key` は次のキーを待って返し，`poll` は待たずにたまっている入力を全て読む．
+    `with` で使うと，終了時に `close` が呼ばれる．
+
+    Attributes:
+        exhausted (bool): 入力の終わりに達したか
+    """
+
+    exhausted = False
+
+    def open(self) -> None:
+        """読み始める準備をする (端末のモードの切り替えなど)．
+        `read_key` と `poll` からも呼ばれるため，明示的に呼ばなくてもよい
+        """
+
+    def fileno(self) -> int | None:
+        """イベントループで読めるようになるのを待つファイルディスクリプタを返す
+
+        Returns:
+            int | None: ファイルディスクリプタ．待てない場合はNone (毎ターン `poll` する)
+        """
+        return None
+
+    def read_key(self) -> tuple[int, int]:
+        """次のキー入力を待ち，その移動方向を返す
+
+        Returns:
+            tuple[int, int]: x, y座標の差分
+        """
+        raise NotImplementedError
+
+    def poll(self) -> tuple[int, int] | None:
+        """待たずにたまっている入力を全て読み，最後の移動キーの方向を返す
+
+        Returns:
+            tuple[int, int] | None: x, y座標の差分．移動キーがなければNone
+        """
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """入力を閉じる (端末のモードを元に戻すなど)"""
+
+    def __enter__(self) -> 'InputBackend':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class RawTerminalInput(InputBackend):
+    """端末からのキー入力
+    最初に読むときに一度だけエンターキーなしで読めるモードにし，`close` まで維持する．
+    読むときはたまっているバイトを全てまとめて読み，連打は最後のキーにまとめる．
+    矢印キーはw, a, s, dと同じ方向になる．
+
+    Examples:
+        >>> r, w = os.pipe()
+        >>> backend = RawTerminalInput(r)
+        >>> _ = os.write(w, b"wwx\\x1b[B\\x1b[")
+        >>> backend.poll()  # 最後の移動キーは下矢印．途中のエスケープは次回に回す
+        (0, 1)
+        >>> _ = os.write(w, b"D")
+        >>> backend.read_key()
+        (-1, 0)
+        >>> backend.poll() is None
+        True
+        >>> _ = os.write(w, b"x")  # 移動キー以外のキーはその場に留まる
+        >>> backend.read_key()
+        (0, 0)
+        >>> _ = os.write(w, b"\x1b")  # 単独のエスケープは読み捨てる
+        >>> backend.read_key(), backend._pending
+        ((0, 0), '')
+        >>> _ = os.write(w, b"\x1bd")
+        >>> backend.read_key()
+        (1, 0)
+        >>> backend.close()
+    """
+
+    def __init__(self, fd: int | None = None) -> None:
+        """
+        Args:
+            fd (int | None): 入力のファイルディスクリプタ．Noneの場合は標準入力
+        """
+        self.fd = fd if fd is not None else sys.stdin.fileno()
+        self.exhausted = False
+        self._session: contextlib.ExitStack | None = None
+        self._pending = ""  # 途中までしか読めていないエスケープシーケンス
+
+    def fileno(self) -> int:
+        return self.fd
+
+    def open(self) -> None:
+        """端末のモードを変える (`close` までに一度だけ)"""
+        if self._session is None:
+            self._session = contextlib.ExitStack()
+            self._session.enter_context(cbreak(self.fd))
+
+    def _decode(self, text: str) -> tuple[int, int] | None:
+        """読んだ文字列を方向に変換し，最後の移動キーの方向を返す"""
+        text = self._pending + text
+        self._pending = ""
+        direction = None
+        i = 0
+        while i < len(text):
+            ch = text[i]
+            if ch == "\x1b":
+                if i + 1 == len(text):
+                    break  # 後ろに何も続かないエスケープは読み捨てる
+                if text[i + 1] in "[O":
+                    if i + 2 == len(text):
+                        self._pending = text[i:]  # 続きは次に読む
+                        break
+                    ch = ARROW_KEYS.get(text[i + 2], "")
+                    i += 2
+            if ch in KEY_DIRECTIONS:
+                direction = KEY_DIRECTIONS[ch]
+            i += 1
+        return direction
+
+    def _drain(self) -> tuple[int, int] | None:
+        """読めるバイトがなくなるまで読む"""
+        chunks = []
+        while select.select([self.fd], [], [], 0)[0]:
+            data = os.read(self.fd, 4096)
+            if not data:
+                self.exhausted = True
+                break
+            chunks.append(data)
+        return self._decode(b"".join(chunks).decode(errors="ignore"))
+
+    def read_key(self) -> tuple[int, int]:
+        self.open()
+        while not self.exhausted:
+            select.select([self.fd], [], [])
+            direction = self._drain()
+            if direction is not None:
+                return direction
+            if not self._pending:
+                return (0, 0)  # 移動キー以外のキーはその場に留まる
+        return (0, 0)
+
+    def poll(self) -> tuple[int, int] | None:
+        self.open()
+        return self._drain()
+
+    def close(self) -> None:
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+
+class ScriptedInput(InputBackend):
+    """ファイルやパイプに書かれたキーの列を1ターンに1文字ずつ読む入力
+    改行は読み飛ばし，移動キー以外の文字はその場に留まる．
+    入力の終わりに達した後は (0, 0) を返し，`exhausted` をTrueにする．
+    ファイルのパスを渡した場合は最初に読むときに開き，終わりに達したら閉じる．
+    ファイルディスクリプタを持つ入力 (パイプなど) は，書き込まれている分だけを
+    `os.read` で読むため，1ターンずつキーを送るプロセスとも使える．
+
+    Examples:
+        >>> import io
+        >>> backend = ScriptedInput(io.StringIO("dd\\ns."))
+        >>> [backend.read_key() for _ in range(5)]
+        [(1, 0), (1, 0), (0, 1), (0, 0), (0, 0)]
+        >>> backend.exhausted
+        True
+        >>> r, w = os.pipe()
+        >>> backend = ScriptedInput(os.fdopen(r))
+        >>> _ = os.write(w, b"a")  # 書き込まれた分だけ読んで返す
+        >>> backend.read_key(), backend.poll()
+        ((-1, 0), None)
+        >>> os.close(w)
+        >>> backend.read_key(), backend.exhausted
+        ((0, 0), True)
+        >>> backend.stream.close()
+    """
+
+    def __init__(self, stream: IO[str] | str | None = None) -> None:
+        """
+        Args:
+            stream (IO[str] | str | None): キーの列，またはキーの列を書いたファイルのパス．
+                Noneの場合は標準入力
+        """
+        self.path = stream if isinstance(stream, str) else None
+        if stream is None:
+            stream = sys.stdin
+        self.stream = None if isinstance(stream, str) else stream
+        self.exhausted = False
+        self._buf = ""
+        self._pos = 0
+
+    def _stream_fd(self) -> int | None:
+        """入力のファイルディスクリプタを返す．メモリ上の入力ならNone"""
+        if self.stream is None and self.path is not None:
+            self.stream = open(self.path)
+        try:
+            return self.stream.fileno()
+        except (AttributeError, OSError, ValueError):
+            return None
+
+    def _fill(self, wait: bool = True) -> bool:
+        """バッファを読み切っていれば次の入力を読む
+
+        Args:
+            wait (bool): Falseの場合は，読めるバイトがなければ待たずに戻る
+
+        Returns:
+            bool: 読んでいない文字があるか
+        """
+        while self._pos >= len(self._buf):
+            if self.exhausted:
+                return False
+            fd = self._stream_fd()
+            if fd is None:
+                chunk = self.stream.read(65536)
+            else:
+                if not wait and not select.select([fd], [], [], 0)[0]:
+                    return False
+                # 読めるようになった分だけを読む (64KiBたまるまで待たない)
+                chunk = os.read(fd, 65536).decode(errors="ignore")
+            self.exhausted = not chunk
+            if self.exhausted:
+                self.close()
+            self._buf = chunk.replace("\n", "")
+            self._pos = 0
+        return True
+
+    def _next(self) -> tuple[int, int]:
+        """バッファの次の文字の方向を返す"""
+        ch = self._buf[self._pos]
+        self._pos += 1
+        return KEY_DIRECTIONS.get(ch, (0, 0))
+
+    def read_key(self) -> tuple[int, int]:
+        if not self._fill():
+            return (0, 0)
+        return self._next()
+
+    def poll(self) -> tuple[int, int] | None:
+        # 台本は1ターンに1文字ずつ進める．まだ書かれていなければ待たない
+        if not self._fill(wait=False):
+            return None
+        return self._next()
+
+    def close(self) -> None:
+        """パスから開いたファイルを閉じる (閉じた後は入力の終わりとして扱う)"""
+        if self.path is not None and self.stream is not None:
+            self.stream.close()
+            self.stream = None
+            self.exhausted = True
+
+
+class QueueInput(InputBackend):
+    """メモリ上のキューからキーを読む入力 (テスト用)
+
+    Examples:
+        >>> backend = QueueInput("wd")
+        >>> backend.read_key(), backend.read_key(), backend.read_key()
+        ((0, -1), (1, 0), (0, 0))
+        >>> backend.put("a")
+        >>> backend.put("s")
+        >>> backend.poll(), backend.poll()
+        ((0, 1), None)
+    """
+
+    def __init__(self, keys: str = "") -> None:
+        """
+        Args:
+            keys (str): 最初からキューに入れておくキー
+        """
+        self.queue: deque[str] = deque(keys)
+
+    def put(self, key: str) -> None:
+        """キーをキューに入れる
+
+        Args:
+            key (str): 入力するキー
+        """
+        self.queue.append(key)
+
+    def read_key(self) -> tuple[int, int]:
+        if not self.queue:
+            return (0, 0)
+        return KEY_DIRECTIONS.get(self.queue.popleft(), (0, 0))
+
+    def poll(self) -> tuple[int, int] | None:
+        direction = None
+        while self.queue:
+            direction = KEY_DIRECTIONS.get(self.queue.popleft(), direction)
+        return direction
+
+
+def default_backend() -> InputBackend:
+    """標準入力に合った入力を返す
+    標準入力がファイルディスクリプタを持てば (端末やパイプ) `RawTerminalInput`
+    として，イベントループで待たずに読めるようにする．
+    持たない場合 (メモリ上に置き換えた標準入力) だけ `ScriptedInput` で毎ターン読む．
+
+    Returns:
+        InputBackend: 入力
+    """
+    try:
+        fd = sys.stdin.fileno()
+    except (AttributeError, OSError, ValueError):
+        return ScriptedInput(sys.stdin)
+    return RawTerminalInput(fd)
 
 
 class Controller:
-    """ユーザーの入力を受け取るクラス"""
+    """ユーザーの入力を受け取るクラス
+    入力の読み込み方は `Controller.backend` で切り替えられる．
+    設定されていない場合は最初の入力時に `default_backend` で決める．
+    """
+
+    backend: InputBackend | None = None
 
     @staticmethod
     def get_user_input() -> tuple[int, int]:
@@ -11,23 +365,49 @@ class Controller:
         Returns:
             tuple[int, int]: x, y座標の差分 (例: (1, 0)、(-1, 0)、(0, 1)、(0, -1))など)
         """
-        # キー入力を受け取る
-        key = Controller.input_without_enter()
         # 入力されたキーに対応する座標の差分を返す
-        if key == "w":
-            return (0, -1)
-        elif key == "a":
-            return (-1, 0)
-        elif key == "s":
-            return (0, 1)
-        elif key == "d":
-            return (1, 0)
-        else:
-            return (0, 0)
+        return Controller.get_backend().read_key()
+
+    @staticmethod
+    def get_backend() -> InputBackend:
+        """現在の入力を返す (設定されていなければ標準入力に合わせて作る)
+
+        Returns:
+            InputBackend: 入力
+        """
+        if Controller.backend is None:
+            Controller.backend = default_backend()
+        return Controller.backend
+
+    @staticmethod
+    def close() -> None:
+        """入力を閉じる (端末のモードを元に戻す)．次の入力時にまた開く"""
+        if Controller.backend is not None:
+            Controller.backend.close()
+
+    @staticmethod
+    def key_to_direction(key: str) -> tuple[int, int]:
+        """キーをx, y座標の差分に変換する
+
+        Args:
+            key (str): 入力された文字
+
+        Returns:
+            tuple[int, int]: x, y座標の差分．移動のキーでなければ(0, 0)
+
+        Examples:
+            >>> Controller.key_to_direction("a")
+            (-1, 0)
+            >>> Controller.key_to_direction("q")
+            (0, 0)
+        """
+        return KEY_DIRECTIONS.get(key, (0, 0))
 
     @staticmethod
     def input_without_enter() -> str:
         '''エンターキーを押さずに入力を受け取る
+        1文字ごとに端末のモードを切り替えるため，ゲーム中は `RawTerminalInput` を使う．
+
         Returns:
             str: 入力された文字
         '''
@@ -60,4 +440,9 @@ class Controller:
             # 具体的にはICANONとECHOが元に戻る
             termios.tcsetattr(fd, termios.TCSANOW, old)
 
-        return ch
\ No newline at end of file
+        return ch
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
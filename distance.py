@@ -0,0 +1,379 @@
+"""マス間の最短距離
+壁が変化しないマップについて，全てのマスの組の最短距離 (歩数) を一度だけ計算して
+uint16の表にし，壁の配置のハッシュをキーとしてディスクにキャッシュするモジュール．
+2回目以降はキャッシュをmmapで読み込むため，距離の問い合わせは定数時間で済む．
+敵の行動方針と自動操作は `distance_oracle` で表を取得し，表を作れない広いマップでは
+幅優先探索 (`bfs_distances`) で距離場を求める．
+"""
+from __future__ import annotations
+import hashlib
+import os
+import tempfile
+from array import array
+from collections import deque
+import typing
+if typing.TYPE_CHECKING:
+    import numpy as np
+    from field import Field
+
+
+UNREACHABLE = 0xFFFF  # 到達できないマスの距離
+# 表のキャッシュの保存先 (実行したディレクトリによらずリポジトリの下に置く)
+DEFAULT_CACHE_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "cache", "distance")
+# 表を作るマップの最大のマス数 (64x64マスで表は最大32MiB)
+MAX_ORACLE_CELLS = 64 * 64
+# プロセス内で使い回す表の数
+MAX_LOADED_ORACLES = 4
+# 上下左右の方向 (x, y)
+NEIGHBORS = ((1, 0), (-1, 0), (0, 1), (0, -1))
+
+
+def neighbor_table(
+        wall_map: bytes | bytearray,
+        f_size: int) -> list[tuple[int, ...]]:
+    """各マスから移動できる上下左右のマスの表を作る
+
+    Args:
+        wall_map (bytes | bytearray): 壁のマスを1とするビットマップ [y * f_size + x]
+        f_size (int): フィールドのサイズ
+
+    Returns:
+        list[tuple[int, ...]]: マス [y * f_size + x] ごとの移動できるマスの番号．
+            並びは `NEIGHBORS` の順で，壁のマスは空
+
+    Examples:
+        >>> neighbor_table(bytes([0, 0, 1, 0]), 2)
+        [(1,), (0, 3), (), (1,)]
+    """
+    table: list[tuple[int, ...]] = []
+    for cell in range(f_size * f_size):
+        if wall_map[cell]:
+            table.append(())
+            continue
+        x, y = cell % f_size, cell // f_size
+        table.append(tuple(
+            (y + dy) * f_size + x + dx for dx, dy in NEIGHBORS
+            if 0 <= x + dx < f_size and 0 <= y + dy < f_size
+            and not wall_map[(y + dy) * f_size + x + dx]))
+    return table
+
+
+def bfs_distances(
+        wall_map: bytes | bytearray,
+        f_size: int,
+        *sources: tuple[int, int],
+        neighbors: list[tuple[int, ...]] | None = None) -> array:
+    """始点から全てのマスへの最短距離を幅優先探索で求める
+    始点が複数の場合は最も近い始点までの距離になる．
+
+    Args:
+        wall_map (bytes | bytearray): 壁のマスを1とするビットマップ [y * f_size + x]
+        f_size (int): フィールドのサイズ
+        *sources (tuple[int, int]): 始点の座標 (x, y)
+        neighbors (list[tuple[int, ...]] | None): `neighbor_table` の結果．
+            同じ壁で何度も探索する場合に渡すと速くなる
+
+    Returns:
+        array: 各マスへの距離 [y * f_size + x]．到達できないマスはUNREACHABLE
+
+    Examples:
+        >>> walls = bytes([0, 0, 0,
+        ...                1, 1, 0,
+        ...                0, 0, 0])
+        >>> list(bfs_distances(walls, 3, (0, 2)))
+        [6, 5, 4, 65535, 65535, 3, 0, 1, 2]
+        >>> list(bfs_distances(walls, 3, (0, 2), (0, 0)))
+        [0, 1, 2, 65535, 65535, 3, 0, 1, 2]
+    """
+    if neighbors is None:
+        neighbors = neighbor_table(wall_map, f_size)
+    dist = array("H", [UNREACHABLE]) * (f_size * f_size)
+    queue: deque[int] = deque()
+    for x, y in sources:
+        if 0 <= x < f_size and 0 <= y < f_size \
+                and not wall_map[y * f_size + x]:
+            dist[y * f_size + x] = 0
+            queue.append(y * f_size + x)
+    while queue:
+        cell = queue.popleft()
+        d = dist[cell] + 1
+        for nxt in neighbors[cell]:
+            if dist[nxt] == UNREACHABLE:
+                dist[nxt] = d
+                queue.append(nxt)
+    return dist
+
+
+def wall_hash(wall_map: bytes | bytearray, f_size: int) -> str:
+    """壁の配置のハッシュを返す (キャッシュのキー)
+
+    Args:
+        wall_map (bytes | bytearray): 壁のビットマップ
+        f_size (int): フィールドのサイズ
+
+    Returns:
+        str: 16進数のハッシュ
+    """
+    h = hashlib.sha256(f_size.to_bytes(4, "little"))
+    h.update(bytes(wall_map))
+    return h.hexdigest()[:32]
+
+
+def all_pairs_distances(
+        open_cells: np.ndarray,
+        f_size: int,
+        block: int = 256) -> np.ndarray:
+    """壁でない全てのマスの組の最短距離を求める
+    複数の始点の幅優先探索を，到達済みのマスを表すbool配列のシフトで同時に進める．
+
+    Args:
+        open_cells (np.ndarray): 壁でないマスをTrueとする配列 (f_size, f_size)
+        f_size (int): フィールドのサイズ
+        block (int): 一度に探索する始点の数 (メモリ使用量の上限を決める)
+
+    Returns:
+        np.ndarray: 距離の表 (m, m)．mは壁でないマスの数で，
+            行と列は壁でないマスを y * f_size + x の昇順に並べたもの
+    """
+    import numpy as np  # numpyは全マス間の表を作るときまで読み込まない
+    cells = np.flatnonzero(open_cells.ravel())
+    m = len(cells)
+    table = np.full((m, m), UNREACHABLE, dtype=np.uint16)
+    for start in range(0, m, block):
+        sources = cells[start:start + block]
+        s = len(sources)
+        reached = np.zeros((s, f_size, f_size), dtype=bool)
+        reached.reshape(s, -1)[np.arange(s), sources] = True
+        frontier = reached.copy()
+        dist = np.full((s, f_size, f_size), UNREACHABLE, dtype=np.uint16)
+        dist[reached] = 0
+        d = 0
+        while frontier.any():
+            d += 1
+            grown = np.zeros_like(frontier)
+            grown[:, 1:, :] |= frontier[:, :-1, :]
+            grown[:, :-1, :] |= frontier[:, 1:, :]
+            grown[:, :, 1:] |= frontier[:, :, :-1]
+            grown[:, :, :-1] |= frontier[:, :, 1:]
+            frontier = grown & open_cells & ~reached
+            reached |= frontier
+            dist[frontier] = d
+        table[start:start + s] = dist.reshape(s, -1)[:, cells]
+    return table
+
+
+class DistanceOracle:
+    """壁が変化しないマップの最短距離を定数時間で返すクラス
+
+    Attributes:
+        f_size (int): フィールドのサイズ
+        key (str): 壁の配置のハッシュ
+        table (np.ndarray): 距離の表 (uint16, mmapの場合あり)
+
+    Examples:
+        >>> import tempfile
+        >>> from field import Field
+        >>> from block import Block
+        >>> blocks = [Block(x, y) for x in range(5) for y in range(5)
+        ...           if x in (0, 4) or y in (0, 4) or (x, y) == (2, 2)]
+        >>> field = Field([], [], [], blocks, 5)
+        >>> cache_dir = tempfile.mkdtemp()
+        >>> oracle = DistanceOracle.from_field(field, cache_dir)
+        >>> oracle.distance((1, 1), (3, 3)), oracle.distance((1, 2), (3, 2))
+        (4, 4)
+        >>> oracle.distance((1, 1), (2, 2)) == UNREACHABLE
+        True
+        >>> oracle.path((1, 2), (3, 2))
+        [(1, 2), (1, 3), (2, 3), (3, 3), (3, 2)]
+        >>> oracle.field((1, 1)) == bfs_distances(field.wall_map, 5, (1, 1))
+        True
+        >>> DistanceOracle.from_field(field, cache_dir).loaded_from_cache
+        True
+    """
+
+    def __init__(
+            self,
+            wall_map: bytes | bytearray,
+            f_size: int,
+            cache_dir: str | None = DEFAULT_CACHE_DIR) -> None:
+        """
+        Args:
+            wall_map (bytes | bytearray): 壁のビットマップ [y * f_size + x]
+            f_size (int): フィールドのサイズ
+            cache_dir (str | None): キャッシュの保存先．Noneの場合は保存しない
+        """
+        import numpy as np
+        self.f_size = f_size
+        self.key = wall_hash(wall_map, f_size)
+        walls = np.frombuffer(bytes(wall_map), dtype=np.uint8)
+        open_cells = (walls == 0).reshape(f_size, f_size)
+        # マス -> 表の行番号 (壁は-1)
+        self._index = np.full(f_size * f_size, -1, dtype=np.int64)
+        self._index[np.flatnonzero(open_cells.ravel())] = np.arange(
+            int(open_cells.sum()))
+        self._index_list = self._index.tolist()
+        self._open = np.flatnonzero(open_cells.ravel())
+        self.loaded_from_cache = False
+        path = os.path.join(cache_dir, f"{self.key}.npy") \
+            if cache_dir is not None else None
+        if path is not None and os.path.exists(path):
+            self.table = np.load(path, mmap_mode="r")
+            self.loaded_from_cache = True
+        else:
+            self.table = all_pairs_distances(open_cells, f_size)
+            if path is not None:
+                self._save(path)
+
+    @classmethod
+    def from_field(
+            cls,
+            field: Field,
+            cache_dir: str | None = DEFAULT_CACHE_DIR) -> DistanceOracle:
+        """Fieldの壁から作る
+
+        Args:
+            field (Field): フィールド
+            cache_dir (str | None): キャッシュの保存先
+
+        Returns:
+            DistanceOracle: 距離の表
+        """
+        return cls(field.wall_map, field.f_size, cache_dir)
+
+    def _save(self, path: str) -> None:
+        """表をキャッシュに保存する (一時ファイルに書いてから置き換える)
+
+        Args:
+            path (str): 保存先
+        """
+        import numpy as np
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            np.save(f, self.table)
+        os.replace(tmp, path)
+
+    def distance(self, a: tuple[int, int], b: tuple[int, int]) -> int:
+        """2マス間の最短距離を返す
+
+        Args:
+            a (tuple[int, int]): 始点 (x, y)
+            b (tuple[int, int]): 終点 (x, y)
+
+        Returns:
+            int: 歩数．どちらかが壁か到達できない場合はUNREACHABLE
+        """
+        f = self.f_size
+        if not (0 <= a[0] < f and 0 <= a[1] < f
+                and 0 <= b[0] < f and 0 <= b[1] < f):
+            return UNREACHABLE
+        i = self._index_list[a[1] * f + a[0]]
+        j = self._index_list[b[1] * f + b[0]]
+        if i < 0 or j < 0:
+            return UNREACHABLE
+        return int(self.table[i, j])
+
+    def field(self, *sources: tuple[int, int]) -> array:
+        """始点から全てのマスへの最短距離を表から求める
+        `bfs_distances` と同じ結果を，始点の行の最小値を取るだけで返す．
+
+        Args:
+            *sources (tuple[int, int]): 始点の座標 (x, y)
+
+        Returns:
+            array: 各マスへの距離 [y * f_size + x]．到達できないマスはUNREACHABLE
+        """
+        import numpy as np
+        f = self.f_size
+        rows = [self._index_list[y * f + x] for x, y in sources
+                if 0 <= x < f and 0 <= y < f]
+        rows = [row for row in rows if row >= 0]
+        dist = np.full(f * f, UNREACHABLE, dtype=np.uint16)
+        if rows:
+            dist[self._open] = self.table[rows].min(axis=0)
+        result = array("H")
+        result.frombytes(dist.tobytes())
+        return result
+
+    def next_step(
+            self,
+            a: tuple[int, int],
+            b: tuple[int, int]) -> tuple[int, int]:
+        """aからbへ最短で向かうときの最初の移動方向を返す
+
+        Args:
+            a (tuple[int, int]): 始点 (x, y)
+            b (tuple[int, int]): 終点 (x, y)
+
+        Returns:
+            tuple[int, int]: 移動方向．到達済みか到達できない場合は(0, 0)
+        """
+        d = self.distance(a, b)
+        if d == 0 or d == UNREACHABLE:
+            return (0, 0)
+        for dx, dy in NEIGHBORS:
+            if self.distance((a[0] + dx, a[1] + dy), b) == d - 1:
+                return (dx, dy)
+        return (0, 0)
+
+    def path(
+            self,
+            a: tuple[int, int],
+            b: tuple[int, int]) -> list[tuple[int, int]]:
+        """aからbまでの最短経路を返す
+
+        Args:
+            a (tuple[int, int]): 始点 (x, y)
+            b (tuple[int, int]): 終点 (x, y)
+
+        Returns:
+            list[tuple[int, int]]: a, ..., bの座標のリスト．到達できない場合は空
+        """
+        if self.distance(a, b) == UNREACHABLE:
+            return []
+        path = [a]
+        while a != b:
+            dx, dy = self.next_step(a, b)
+            a = (a[0] + dx, a[1] + dy)
+            path.append(a)
+        return path
+
+
+_oracles: dict[str, DistanceOracle] = {}  # 壁の配置のハッシュ -> 表
+# 敵の行動方針と自動操作が使う表の保存先．Noneの場合は保存しない (テストなど)
+oracle_cache_dir: str | None = DEFAULT_CACHE_DIR
+
+
+def distance_oracle(
+        field: Field,
+        cache_dir: str | None = ...) -> DistanceOracle | None:
+    """フィールドの距離の表を返す
+    同じ壁の配置の表はプロセス内で使い回し (最近使った `MAX_LOADED_ORACLES` 個)，
+    なければディスクのキャッシュから読むか計算する．
+
+    Args:
+        field (Field): フィールド
+        cache_dir (str | None): キャッシュの保存先．Noneの場合は保存しない．
+            省略した場合は `oracle_cache_dir`
+
+    Returns:
+        DistanceOracle | None: 距離の表．マスの数が `MAX_ORACLE_CELLS` を超える場合はNone
+    """
+    if field.f_size * field.f_size > MAX_ORACLE_CELLS:
+        return None
+    key = wall_hash(field.wall_map, field.f_size)
+    oracle = _oracles.pop(key, None)
+    if oracle is None:
+        if cache_dir is ...:
+            cache_dir = oracle_cache_dir
+        oracle = DistanceOracle.from_field(field, cache_dir)
+        if len(_oracles) >= MAX_LOADED_ORACLES:
+            del _oracles[next(iter(_oracles))]  # 最も長く使っていない表
+    _oracles[key] = oracle
+    return oracle
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
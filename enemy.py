@@ -1,4 +1,5 @@
 from item import Item
+from game_random import GameRandom
 import random
 
 
@@ -18,14 +19,25 @@ class Enemy(Item):
         self.status(bool) : アイテムの状態（Trueなら存在する、Falseなら存在しない消滅した）
     """
 
-    def __init__(self, x, y) -> None:
-        super().__init__(x, y)
-        self.icon = "👻"
+    __slots__ = ()
+    ICON = "👻"
+    # 上下左右の方向を表す座標のリスト (その場に留まる(0, 0)を含む)
+    DIRECTIONS = ((0, 0), (1, 0), (-1, 0), (0, 1), (0, -1))
 
-    def get_next_pos(self) -> tuple[int, int]:
+    def get_next_pos(
+            self,
+            dir: tuple[int, int] | None = None,
+            rng: GameRandom | None = None) -> tuple[int, int]:
         """ランダムに動きたい方向を計算して次の座標を返すメソッド.
         random.choice()を用いて上下左右のいずれかの方向を選択し、
         現在座標に加えて次に移動したい座標を計算する.
+        全ての敵の方向をまとめて選んだ場合は、その方向をdirで受け取る.
+
+        Args:
+            dir (tuple[int, int] | None): 移動する方向. Noneの場合はランダムに選ぶ
+                (default: None)
+            rng (GameRandom | None): 方向の選択に使う乱数生成器.
+                Noneの場合はモジュール共通のrandomを使う (default: None)
 
         Returns:
             tuple[int, int]: 移動したい座標
@@ -36,12 +48,13 @@ class Enemy(Item):
             >>> next_move = enemy.get_next_pos()
             >>> next_move in possible_moves
             True
+            >>> enemy.get_next_pos((1, 0))
+            (3, 3)
 
         """
-        # 上下左右の方向を表す座標のリスト
-        directions = [(0, 0), (1, 0), (-1, 0), (0, 1), (0, -1)]
         # ランダムに方向を選択して次に移動したい座標を計算
-        dir = random.choice(directions)
+        if dir is None:
+            dir = (rng or random).choice(self.DIRECTIONS)
         self.next_x = self.now_x + dir[0]
         self.next_y = self.now_y + dir[1]
         return (self.next_x, self.next_y)
@@ -0,0 +1,218 @@
+"""敵の行動
+敵の移動方向を決める行動方針 (random, chase, ambush, scatter) を定義するモジュール．
+`Parameters.enemy_strategy` で選択する．
+追いかける行動方針は1ターンに1回だけ目標からの距離場を求め，
+全ての敵はその距離場で自分の隣のマスを比べるだけにすることで，
+敵が数百体いても1体ずつ経路探索するより軽く済ませる．
+距離場は全マス間の距離の表 (`distance.distance_oracle`) の行から取り出し，
+表を作れない広いマップでは幅優先探索で求める．
+"""
+from __future__ import annotations
+from array import array
+from distance import DistanceOracle
+from distance import bfs_distances
+from distance import distance_oracle
+from enemy import Enemy
+import typing
+if typing.TYPE_CHECKING:
+    from game import Game
+
+
+class EnemyStrategy:
+    """敵の行動方針の親クラス
+    `reset` でゲーム開始時の準備を行い，`directions` で毎ターン全ての敵の移動方向を返す．
+    """
+
+    def reset(self, game: Game) -> None:
+        """ゲーム開始時 (Fieldの作成後) に呼び出されるメソッド
+
+        Args:
+            game (Game): 開始したゲーム
+        """
+
+    def directions(self, game: Game) -> list[tuple[int, int]]:
+        """全ての敵の移動方向を返すメソッド
+
+        Args:
+            game (Game): 実行中のゲーム
+
+        Returns:
+            list[tuple[int, int]]: `game.enemies` の順の移動方向
+        """
+        raise NotImplementedError
+
+
+class RandomStrategy(EnemyStrategy):
+    """上下左右と停止からランダムに選ぶ行動方針 (従来の動き)
+    全ての敵の方向を1回でまとめて乱数から引く．
+    """
+
+    def directions(self, game: Game) -> list[tuple[int, int]]:
+        return game.rng.choices(Enemy.DIRECTIONS, len(game.enemies))
+
+
+class _FieldStrategy(EnemyStrategy):
+    """距離場を下るように敵を動かす行動方針の共通部分"""
+
+    def reset(self, game: Game) -> None:
+        field = game.field
+        self.f_size = field.f_size
+        self.wall_map = field.wall_map
+        self.neighbors = field.neighbors
+        self.oracle: DistanceOracle | None = distance_oracle(field)
+
+    def distances(self, *sources: tuple[int, int]) -> array:
+        """始点からの距離場を返す (`bfs_distances` と同じ結果)
+
+        Args:
+            *sources (tuple[int, int]): 始点の座標 (x, y)
+
+        Returns:
+            array: 距離場 [y * f_size + x]
+        """
+        if self.oracle is not None:
+            return self.oracle.field(*sources)
+        return bfs_distances(
+            self.wall_map, self.f_size, *sources, neighbors=self.neighbors)
+
+    def descend(
+            self,
+            enemy: Enemy,
+            dist: array,
+            rng_fallback: Game | None = None) -> tuple[int, int]:
+        """距離場で最も小さくなる隣のマスへの方向を返す
+
+        Args:
+            enemy (Enemy): 敵
+            dist (array): 距離場 [y * f_size + x]
+            rng_fallback (Game | None): 近づけない場合にランダムに動かすゲーム．
+                Noneの場合はその場に留まる
+
+        Returns:
+            tuple[int, int]: 移動方向
+        """
+        f = self.f_size
+        cell = enemy.now_y * f + enemy.now_x
+        best, best_dist = None, dist[cell]
+        for nxt in self.neighbors[cell]:
+            if dist[nxt] < best_dist:
+                best, best_dist = nxt, dist[nxt]
+        if best is None:
+            if rng_fallback is not None:
+                return rng_fallback.rng.choice(Enemy.DIRECTIONS)
+            return (0, 0)
+        return (best % f - enemy.now_x, best // f - enemy.now_y)
+
+
+class ChaseStrategy(_FieldStrategy):
+    """プレイヤーを最短経路で追いかける行動方針
+
+    Examples:
+        >>> import distance
+        >>> from config import Parameters
+        >>> from game import Game
+        >>> distance.oracle_cache_dir = None  # 距離の表をディスクに保存しない
+        >>> params = Parameters(enemy_num=3, food_num=1,
+        ...                     enemy_strategy="chase", seed=0)
+        >>> game = Game(params, headless=True)
+        >>> for _ in range(30):
+        ...     if game.result is not None:
+        ...         break
+        ...     _ = game.step((0, 0))
+        >>> game.result
+        'Game Over!'
+    """
+
+    def target_field(self, game: Game) -> array:
+        """生きているプレイヤーからの距離場を返す
+
+        Args:
+            game (Game): 実行中のゲーム
+
+        Returns:
+            array: 距離場
+        """
+        return self.distances(
+            *[p.get_pos() for p in game.players if p.status])
+
+    def directions(self, game: Game) -> list[tuple[int, int]]:
+        dist = self.target_field(game)  # 1ターンに1回だけ探索する
+        return [self.descend(enemy, dist) for enemy in game.enemies]
+
+
+class AmbushStrategy(ChaseStrategy):
+    """プレイヤーの先回りをする行動方針
+    プレイヤーが最寄りの食べ物へ最短経路で向かうと仮定し，
+    その経路上の `lead` マス先を目標にする．
+    状態を持たないため `Game.snapshot` / `restore` やリプレイでも同じ動きになる．
+    """
+
+    def __init__(self, lead: int = 4) -> None:
+        """
+        Args:
+            lead (int): 目標にするプレイヤーの何マス先か
+        """
+        self.lead = lead
+
+    def target_field(self, game: Game) -> array:
+        to_food = self.distances(
+            *[food.get_pos() for food in game.foods if food.status])
+        f = self.f_size
+        targets = []
+        for player in game.players:
+            if not player.status:
+                continue
+            cell = player.now_y * f + player.now_x
+            for _ in range(self.lead):
+                nxt = min(self.neighbors[cell], key=to_food.__getitem__,
+                          default=cell)
+                if to_food[nxt] >= to_food[cell]:
+                    break
+                cell = nxt
+            targets.append((cell % f, cell // f))
+        return self.distances(*targets)
+
+
+class ScatterStrategy(_FieldStrategy):
+    """敵ごとに決めた四隅の縄張りへ向かい，着いたらその周りをうろつく行動方針
+    四隅からの距離場は壁が変わらないためゲーム開始時に一度だけ求める．
+    """
+
+    def reset(self, game: Game) -> None:
+        super().reset(game)
+        f = self.f_size
+        corners = ((1, 1), (f - 2, 1), (1, f - 2), (f - 2, f - 2))
+        self.fields = [self.distances(corner) for corner in corners]
+
+    def directions(self, game: Game) -> list[tuple[int, int]]:
+        fields = self.fields
+        return [
+            self.descend(enemy, fields[i % len(fields)], rng_fallback=game)
+            for i, enemy in enumerate(game.enemies)]
+
+
+STRATEGIES: dict[str, type[EnemyStrategy]] = {
+    "random": RandomStrategy,
+    "chase": ChaseStrategy,
+    "ambush": AmbushStrategy,
+    "scatter": ScatterStrategy,
+}
+
+
+def make_strategy(name: str) -> EnemyStrategy:
+    """名前から敵の行動方針のインスタンスを作る
+
+    Args:
+        name (str): 行動方針の名前 (`STRATEGIES` のキー)
+
+    Returns:
+        EnemyStrategy: 行動方針のインスタンス
+
+    Examples:
+        >>> type(make_strategy("scatter")).__name__
+        'ScatterStrategy'
+    """
+    if name not in STRATEGIES:
+        raise ValueError(
+            f"unknown enemy_strategy: {name} (choose from {list(STRATEGIES)})")
+    return STRATEGIES[name]()
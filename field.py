@@ -3,6 +3,17 @@ from player import Player
 from enemy import Enemy
 from food import Food
 from block import Block
+from chunks import ChunkedGrid
+from chunks import DenseGrid
+from distance import neighbor_table
+from renderer import HELP_LINES
+import typing
+if typing.TYPE_CHECKING:
+    from game_map import GameMap
+
+
+DENSE_LIMIT = 256  # これ以下のサイズではFieldの表示内容を全マス分保持する
+VIEW_SIZE = 32  # 全マス分を保持しない場合に表示する範囲の1辺のマス数
 
 
 class Field:
@@ -16,8 +27,24 @@ class Field:
         enemies (list[Enemy]): 敵のリスト
         foods (list[Food]]): アイテムのリスト
         blocks (list[Block]): アイテムのリスト
-        field (list[list[str]]): フィールドの情報
+        field (list[list[str]] | None): フィールドの情報．
+            f_sizeが `DENSE_LIMIT` より大きい場合は保持せずNone
         f_size (int): フィールドのサイズ
+        border (bool): 外周を (Blockを作らずに) 壁とするか
+        game_map (GameMap | None): 壁を読み込んだマップ
+        walls (ChunkedGrid | DenseGrid): ブロックのあるマスを1とする格子．
+            マップを使う場合はマップの壁をそのまま使う
+        wall_map (bytearray): `walls` を密にしたビットマップ [y * f_size + x]．
+            マップ全体を調べる処理のために初めて参照したときに作る
+        neighbors (list[tuple[int, ...]]): 各マスから移動できるマスの表
+            (`distance.neighbor_table`)．初めて参照したときに作る
+
+    衝突判定を定数時間で行うため，ブロックの位置をチャンクに分けた格子で，
+    敵・食べ物・プレイヤーの位置を座標をキーとする辞書で保持する．
+    移動は `move` を通して行うと辞書も更新される．
+    何もないチャンクは確保せず，大きいマップでは表示内容も保持しないため，
+    使用するメモリはマップの広さではなくアイテムと壁の数で決まる．
+    表示は `viewport` で必要な範囲だけを作る．
     """
 
     #  Fieldを生成する関数
@@ -27,7 +54,9 @@ class Field:
             enemies: list[Enemy],
             foods: list[Food],
             blocks: list[Block],
-            f_size: int = 6):
+            f_size: int = 6,
+            border: bool = False,
+            game_map: 'GameMap | None' = None):
         """
         Fieldクラスの初期化を行う関数
 
@@ -37,22 +66,242 @@ class Field:
             foods (list[Food]): アイテムのリスト
             blocks (list[Block]): ブロックのリスト
             f_size (int): フィールドのサイズ
+            border (bool): Trueの場合は外周を壁とする (外周のBlockは作らない)
+            game_map (GameMap | None): 指定した場合はマップの壁を使い，
+                f_sizeはマップの大きさになる
         """
+        if game_map is not None:
+            f_size = game_map.f_size
         self.f_size = f_size
-        self.field = [["　" for _ in range(f_size)] for _ in range(f_size)]
+        self.border = border
+        self.game_map = game_map
+        self.field = [["　" for _ in range(f_size)] for _ in range(f_size)] \
+            if f_size <= DENSE_LIMIT else None
+        # 外周の壁との衝突判定で返すブロック (全ての外周のマスで共有する)
+        self.border_block = Block(-1, -1)
         self.players = players
         self.enemies = enemies
         self.foods = foods
         self.blocks = blocks
-        # それぞれのアイテムの位置をFieldに反映
-        self.update_field()
+        # 衝突判定用の索引を作成し，それぞれのアイテムの位置をFieldに反映
+        self.build_index()
+
+    def build_index(self) -> None:
+        """
+        衝突判定用の索引を作り直す関数
+        players, enemies, foods, blocksのリストを入れ替えたり，
+        `move` を通さずにアイテムの座標を書き換えた場合に呼び出す．
+        Fieldの表示内容も全て描き直す．
+        """
+        f_size = self.f_size
+        if self.game_map is not None:
+            # マップの壁はmmapしたまま使い，ブロックを置く場合のみ複製する
+            self.walls = self.game_map.walls
+            if self.blocks:
+                self.walls = DenseGrid(f_size, bytearray(self.walls.data))
+        else:
+            self.walls = ChunkedGrid(f_size)
+            if self.border:
+                for i in range(f_size):
+                    for x, y in (
+                            (i, 0), (i, f_size - 1), (0, i), (f_size - 1, i)):
+                        self.walls.set(x, y, 1)
+        for block in self.blocks:
+            x, y = block.now_x, block.now_y
+            if 0 <= x < f_size and 0 <= y < f_size:
+                self.walls.set(x, y, 1)
+        self._wall_map: bytearray | None = None
+        self._neighbors: list[tuple[int, ...]] | None = None
+        # リスト内の順番 (重なっている場合はリストの先頭に近いものを返すため)
+        self._rank: dict[int, int] = {}
+        # アイテムごとの所属する索引
+        self._occupancy_of: dict[int, dict[tuple[int, int], list[Item]]] = {}
+        self._block_at = self._build_occupancy(self.blocks)
+        self._player_at = self._build_occupancy(self.players)
+        self._enemy_at = self._build_occupancy(self.enemies)
+        self._food_at = self._build_occupancy(self.foods)
+        self._repaint()
+
+    @property
+    def wall_map(self) -> bytearray:
+        """壁のマスを1とする密なビットマップ [y * f_size + x]
+        最短距離や観測などマップ全体を調べる処理のためのもので，初めて参照したときに作る．
+        """
+        if self._wall_map is None:
+            self._wall_map = self.walls.to_bytes()
+        return self._wall_map
+
+    @property
+    def neighbors(self) -> list[tuple[int, ...]]:
+        """各マスから移動できるマスの表 (`distance.neighbor_table`)
+        マップの壁だけの場合はコンパイル済みマップの移動できる方向から作る．
+        """
+        if self._neighbors is None:
+            if self.game_map is not None and self.walls is self.game_map.walls:
+                self._neighbors = self.game_map.neighbor_table()
+            else:
+                self._neighbors = neighbor_table(self.wall_map, self.f_size)
+        return self._neighbors
+
+    def _repaint(self) -> None:
+        """
+        Fieldを全て描き直し，描画したアイテムの状態を記録する関数
+        """
+        # 動くアイテムごとに最後に描画した(x, y, status, icon)
+        self._painted: dict[int, tuple[int, int, bool, str]] = {}
+        self._dirty: set[tuple[int, int]] = set()
+        if self.field is None:
+            return  # 表示内容を保持しない場合は `viewport` で都度作る
+        # fieldを一旦すべて空白にする
+        for row in self.field:
+            for j in range(len(row)):
+                row[j] = "　"
+        # 動かない壁はここでのみ描画する
+        for x, y in self.walls.cells():
+            self.field[y][x] = self.glyph_at(x, y)
+        for items in (self.foods, self.enemies, self.players):
+            for item in items:
+                self._painted[id(item)] = (
+                    item.now_x, item.now_y, item.status, item.icon)
+                self._dirty.add((item.now_x, item.now_y))
+        self._flush_dirty()
+
+    def _in_field(self, x: int, y: int) -> bool:
+        """
+        座標がフィールド内にあるか判定する関数
+
+        Args:
+            x (int): x座標
+            y (int): y座標
+
+        Returns:
+            bool: フィールド内にあればTrue
+        """
+        return 0 <= x < self.f_size and 0 <= y < self.f_size
+
+    def glyph_at(self, x: int, y: int) -> str:
+        """
+        指定したマスに表示するアイコンを返す関数
+        プレイヤー，ブロック，敵，食べ物の順に優先し，
+        同じ種類ではリストの後ろにあるものを優先する．
+        Blockのない外周の壁はBlockのアイコンになる．
+
+        Args:
+            x (int): x座標
+            y (int): y座標
+
+        Returns:
+            str: 表示するアイコン．何もなければ空白
+        """
+        pos = (x, y)
+        for item in reversed(self._player_at.get(pos, ())):
+            if item.status:
+                return item.icon
+        if self.walls.get(x, y):
+            blocks = self._block_at.get(pos)
+            if blocks is None:
+                return Block.ICON  # 外周の壁
+            for item in reversed(blocks):
+                if item.status:
+                    return item.icon
+        for occupancy in (self._enemy_at, self._food_at):
+            for item in reversed(occupancy.get(pos, ())):
+                if item.status:
+                    return item.icon
+        return "　"
+
+    def _flush_dirty(self) -> None:
+        """
+        変化のあったマスだけを描き直す関数
+        """
+        for x, y in self._dirty:
+            if self._in_field(x, y):
+                self.field[y][x] = self.glyph_at(x, y)
+        self._dirty.clear()
+
+    def _build_occupancy(
+            self,
+            items: list[Item]) -> dict[tuple[int, int], list[Item]]:
+        """
+        座標からその座標にあるアイテムのリストを引く辞書を作る関数
+
+        Args:
+            items (list[Item]): アイテムのリスト
+
+        Returns:
+            dict[tuple[int, int], list[Item]]: 座標 -> アイテムのリスト(リストの順)
+        """
+        occupancy: dict[tuple[int, int], list[Item]] = {}
+        for i, item in enumerate(items):
+            occupancy.setdefault((item.now_x, item.now_y), []).append(item)
+            self._rank[id(item)] = i
+            self._occupancy_of[id(item)] = occupancy
+        return occupancy
+
+    def move(self, item: Item, stuck: bool = False) -> None:
+        """
+        アイテムの座標を更新し，衝突判定用の索引にも反映する関数
+
+        Args:
+            item (Item): 移動するアイテム
+            stuck (bool): そのターンに動けない場合にTrueを渡す (default: False)
+
+        Examples:
+            >>> e = Enemy(1, 1)
+            >>> field = Field([], [e], [], [], 3)
+            >>> e.next_x, e.next_y = 2, 1
+            >>> field.move(e)
+            >>> field.occupant(Item(2, 1), field.enemies) is e
+            True
+        """
+        old = (item.now_x, item.now_y)
+        item.update_pos(stuck)
+        new = (item.now_x, item.now_y)
+        occupancy = self._occupancy_of.get(id(item))
+        if old == new or occupancy is None:
+            return
+        cell = occupancy[old]
+        cell.remove(item)
+        if not cell:
+            del occupancy[old]
+        cell = occupancy.setdefault(new, [])
+        # リストの順を保って挿入する
+        rank = self._rank[id(item)]
+        i = len(cell)
+        while i > 0 and self._rank[id(cell[i - 1])] > rank:
+            i -= 1
+        cell.insert(i, item)
 
-    def update_field(self) -> list[list[str]]:
+    def is_wall(self, x: int, y: int) -> bool:
+        """
+        指定したマスがブロックかフィールドの外であるか判定する関数
+
+        Args:
+            x (int): x座標
+            y (int): y座標
+
+        Returns:
+            bool: ブロックかフィールドの外であればTrue
+
+        Examples:
+            >>> field = Field([], [], [], [Block(0, 0)], 3)
+            >>> field.is_wall(0, 0), field.is_wall(1, 0), field.is_wall(3, 0)
+            (True, False, True)
+        """
+        f_size = self.f_size
+        if 0 <= x < f_size and 0 <= y < f_size:
+            return self.walls.get(x, y) == 1
+        return True
+
+    def update_field(self) -> list[list[str]] | None:
         """
         敵、プレイヤー、アイテムを配置を参照して、Fieldを更新する関数
+        前回の更新から位置・状態・アイコンが変わったアイテムについて，
+        離れたマスと入ったマスだけを描き直す．
+        表示内容を保持しない大きいマップでは何もしない．
 
         Returns:
-            list[list[str]]: 更新されたField
+            list[list[str]] | None: 更新されたField．保持しない場合はNone
 
         Examples:
             >>> p = [Player(1, 0)]
@@ -76,24 +325,32 @@ class Field:
             ['f1', 'e2', '\\u3000']
             >>> field.update_field()[2]
             ['b1', 'b2', '\\u3000']
+            >>> e2.next_x = 0
+            >>> field.move(e2)
+            >>> field.update_field()[1]
+            ['e2', '\\u3000', '\\u3000']
+            >>> e2.next_x = 1
+            >>> field.move(e2)
+            >>> f[0].status = False
+            >>> field.update_field()[1]
+            ['\\u3000', 'e2', '\\u3000']
         """
-        # fieldを一旦すべて空白にする
-        for i in range(len(self.field)):
-            for j in range(len(self.field[i])):
-                self.field[i][j] = "　"
+        if self.field is None:
+            return None
+        # 変化のあったアイテムについて，前回描画したマスと現在のマスを記録
+        painted = self._painted
+        dirty = self._dirty
+        for items in (self.foods, self.enemies, self.players):
+            for item in items:
+                now = (item.now_x, item.now_y, item.status, item.icon)
+                prev = painted.get(id(item))
+                if prev != now:
+                    if prev is not None:
+                        dirty.add((prev[0], prev[1]))
+                    dirty.add((now[0], now[1]))
+                    painted[id(item)] = now
         #  Fieldを更新する処理を記述
-        for food in self.foods:
-            if food.status:
-                self.field[food.now_y][food.now_x] = food.icon
-        for enemy in self.enemies:
-            if enemy.status:
-                self.field[enemy.now_y][enemy.now_x] = enemy.icon
-        for block in self.blocks:
-            if block.status:
-                self.field[block.now_y][block.now_x] = block.icon
-        for player in self.players:
-            if player.status:
-                self.field[player.now_y][player.now_x] = player.icon
+        self._flush_dirty()
         return self.field
 
     # 衝突判定を行う関数
@@ -103,6 +360,10 @@ class Field:
             items: list[Item]) -> Item | None:
         """
         2つのアイテムの位置が重なっているか判定する関数
+        targetとitemsの移動先 (next_x, next_y) が重なるかを調べるため，移動する前にも使える．
+        itemsがこのFieldのblocksであれば (ブロックは動かないので) 壁の格子と索引を引いて
+        定数時間で判定し，それ以外は先頭から順に調べる．
+        移動が確定した後に敵や食べ物との衝突を索引で判定する場合は `occupant` を使う．
 
         Args:
             target (Item): アイテム1
@@ -123,13 +384,131 @@ class Field:
             >>> r = field.check_bump(p, [e])
             >>> r is e
             True
+            >>> b = Block(2, 0)
+            >>> field = Field([p], [e], [], [b], 3)
+            >>> p.next_x, p.next_y = 2, 0
+            >>> field.check_bump(p, field.blocks) is b
+            True
+            >>> field.check_bump(p, field.enemies) is None
+            True
+            >>> e.next_x, e.next_y = 2, 0  # 移動する前でも移動先で判定する
+            >>> field.check_bump(p, field.enemies) is e
+            True
         """
+        x, y = target.next_x, target.next_y
+        if items is self.blocks:
+            # 壁の格子で先に判定し，壁がある場合のみ辞書を引く
+            f_size = self.f_size
+            if 0 <= x < f_size and 0 <= y < f_size \
+                    and not self.walls.get(x, y):
+                return None
+            cell = self._block_at.get((x, y))
+            if cell:
+                return cell[0]
+            return self.border_block if self.border else None
         # 衝突判定を行う処理を記述
         for item in items:
             if item.next_x == target.next_x and item.next_y == target.next_y:
                 return item
         return None
 
+    def occupant(
+            self,
+            target: Item,
+            items: list[Item]) -> Item | None:
+        """
+        targetの移動先 (next_x, next_y) のマスに現在いるアイテムを返す関数
+        itemsの現在の座標 (now_x, now_y) で判定するため，`move` で移動が確定した後
+        (移動先と現在の座標が同じとき) は `check_bump` と同じ結果になる．
+        itemsがこのFieldのblocks, enemies, foods, playersのいずれかであれば
+        索引を引いて定数時間で判定し，それ以外は先頭から順に調べる．
+
+        Args:
+            target (Item): アイテム1
+            items (list[Item]): アイテムのリスト2
+
+        Returns:
+            Item | None: 重なっているアイテムがあればそのアイテム、なければNone
+
+        Examples:
+            >>> p = Item(1, 0)
+            >>> e = Enemy(1, 1)
+            >>> field = Field([p], [e], [], [], 3)
+            >>> e.next_x, e.next_y = 1, 0  # 移動する前は元のマスにいる
+            >>> field.occupant(p, field.enemies) is None
+            True
+            >>> field.move(e)
+            >>> field.occupant(p, field.enemies) is e
+            True
+        """
+        x, y = target.next_x, target.next_y
+        if items is self.blocks:
+            return self.check_bump(target, items)
+        if items is self.enemies:
+            occupancy = self._enemy_at
+        elif items is self.foods:
+            occupancy = self._food_at
+        elif items is self.players:
+            occupancy = self._player_at
+        else:
+            occupancy = None
+        if occupancy is not None:
+            cell = occupancy.get((x, y))
+            return cell[0] if cell else None
+        for item in items:
+            if item.now_x == x and item.now_y == y:
+                return item
+        return None
+
+    def viewport(
+            self, x0: int, y0: int,
+            width: int, height: int) -> list[list[str]]:
+        """
+        左上を (x0, y0) とする範囲のアイコンを返す関数
+        範囲はフィールド内に収まるように切り詰める．
+        かかる時間は範囲のマス数に比例し，フィールドの広さによらない．
+
+        Args:
+            x0 (int): 左上のx座標
+            y0 (int): 左上のy座標
+            width (int): 幅
+            height (int): 高さ
+
+        Returns:
+            list[list[str]]: 範囲内の各マスのアイコン
+
+        Examples:
+            >>> field = Field([Player(2, 2)], [], [], [], 1000, border=True)
+            >>> field.field is None
+            True
+            >>> view = field.viewport(-3, -3, 5, 5)  # 左上の角 (外周は壁)
+            >>> len(view), len(view[0]), view[0][0] == Block.ICON
+            (2, 2, True)
+            >>> field.viewport(1, 1, 2, 2)[1][1] == Player.ICON
+            True
+        """
+        x1 = min(x0 + width, self.f_size)
+        y1 = min(y0 + height, self.f_size)
+        x0, y0 = max(x0, 0), max(y0, 0)
+        if self.field is not None:
+            return [row[x0:x1] for row in self.field[y0:y1]]
+        rows = [["　"] * (x1 - x0) for _ in range(y0, y1)]
+        # 何かがあるマスだけを調べる (壁はチャンクから，他は位置の辞書から集める)
+        cells = set(self.walls.cells_in(x0, y0, x1, y1))
+        area = (x1 - x0) * (y1 - y0)
+        for occupancy in (self._player_at, self._enemy_at, self._food_at):
+            if len(occupancy) <= area:
+                cells.update(
+                    pos for pos in occupancy
+                    if x0 <= pos[0] < x1 and y0 <= pos[1] < y1)
+            else:
+                cells.update(
+                    (x, y) for y in range(y0, y1) for x in range(x0, x1)
+                    if (x, y) in occupancy)
+        for x, y in cells:
+            rows[y - y0][x - x0] = self.glyph_at(x, y)
+        return rows
+
     # Fieldを表示する関数
     def display_field(self) -> None:
         """
@@ -161,15 +540,21 @@ class Field:
             b1b2　
         """
         # 動きか方を表示
-        print("w: 上に移動")
-        print("a: 左に移動")
-        print("s: 下に移動")
-        print("d: 右に移動")
+        for line in HELP_LINES:
+            print(line)
+
+        rows = self.field
+        if rows is None:
+            # 表示内容を保持しない場合は最初のプレイヤーの周りだけを表示する
+            x, y = (self.players[0].now_x, self.players[0].now_y) \
+                if self.players else (0, 0)
+            half = VIEW_SIZE // 2
+            rows = self.viewport(x - half, y - half, VIEW_SIZE, VIEW_SIZE)
 
         # self.fieldを表示する処理を記述
-        max_width = max(len(row) for row in self.field)  # フィールド内の最大幅を取得
+        max_width = max(len(row) for row in rows)  # フィールド内の最大幅を取得
 
-        for row in self.field:
+        for row in rows:
             # 各行の文字列を作成し、不足分を空白文字で埋める
             row_str = "".join(row)
             row_str = row_str.ljust(max_width)
@@ -0,0 +1,69 @@
+"""テスト用の部品
+決まった動きをする敵と，敵や食べ物を差し替えたゲームを作る関数をまとめる．
+"""
+from __future__ import annotations
+from config import Parameters
+from enemy import Enemy
+from field import Field
+from food import Food
+from game import Game
+
+
+class StillEnemy(Enemy):
+    """動かない敵"""
+
+    def get_next_pos(self, *args, **kwargs) -> tuple[int, int]:
+        return self.get_pos()
+
+
+class FixedEnemy(Enemy):
+    """決まった方向に動き続ける敵"""
+
+    def __init__(self, x: int, y: int, dx: int, dy: int) -> None:
+        super().__init__(x, y)
+        self.dx, self.dy = dx, dy
+
+    def get_next_pos(self, *args, **kwargs) -> tuple[int, int]:
+        self.next_x, self.next_y = self.now_x + self.dx, self.now_y + self.dy
+        return self.next_x, self.next_y
+
+
+def staged_game(
+        params: Parameters,
+        enemies: list[Enemy],
+        foods: list[Food] | None = None,
+        seed: int = 0) -> Game:
+    """シードでresetしたゲームの敵 (と食べ物) を差し替え，Fieldを作り直す
+    シード0ではプレイヤーは(1, 1)に出現する．
+
+    Args:
+        params (Parameters): ゲームのパラメータ
+        enemies (list[Enemy]): 差し替える敵
+        foods (list[Food] | None): 差し替える食べ物．Noneの場合はそのまま
+        seed (int): resetするシード
+
+    Returns:
+        Game: 差し替えたゲーム
+
+    Examples:
+        >>> game = staged_game(Parameters(enemy_num=1), [StillEnemy(2, 1)])
+        >>> game.get_state()["players"], game.get_state()["enemies"]
+        ([(1, 1)], [(2, 1)])
+        >>> enemy = game.enemies[0]
+        >>> game.field.occupant(enemy, game.enemies) is enemy
+        True
+    """
+    game = Game(params, headless=True)
+    game.reset(seed=seed)
+    game.enemies[:] = enemies
+    if foods is not None:
+        game.foods[:] = foods
+    game.field = Field(
+        game.players, game.enemies, game.foods, game.blocks,
+        params.field_size, border=True)
+    return game
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
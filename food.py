@@ -26,9 +26,8 @@ class Food(Item):
         True
     """
 
-    def __init__(self, x, y) -> None:
-        super().__init__(x, y)
-        self.icon = "🍒"
+    __slots__ = ()
+    ICON = "🍒"
 
 
 if __name__ == "__main__":
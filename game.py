@@ -3,47 +3,148 @@ from player import Player
 from enemy import Enemy
 from food import Food
 from block import Block
+from collision import LEGACY
+from collision import collision_groups
+from collision import resolve_moves
 from field import Field
+from field import VIEW_SIZE
 from controller import Controller
+from renderer import TerminalRenderer
 from config import Parameters
-from random import randint
+from game_random import GameRandom
+from enemy_ai import EnemyStrategy
+from enemy_ai import make_strategy
+from policy import Policy
+from profiler import PhaseProfiler
+from profiler import BLOCK_COLLISION, ENEMY_AI, ENEMY_FOOD_COLLISION
+from profiler import INPUT, RENDER, UPDATE_FIELD
 import logging
-import os
+import typing
+if typing.TYPE_CHECKING:
+    from game_map import GameMap
+    from replay import ReplayWriter
+    from telemetry import TelemetryWriter
 
 
 logger = logging.getLogger(__name__)
 
 
+class GameSnapshot(typing.NamedTuple):
+    """ゲームの動的な状態の不変なコピー
+    壁などの変化しない情報は含まないため，同じGameか同じ構成のGameにのみ戻せる．
+
+    Attributes:
+        tick (int): 経過ターン数
+        rng_state (int): 乱数生成器の状態
+        food_eaten (int): 食べた食べ物の数
+        result (str | None): ゲーム終了時のメッセージ
+        xs (tuple[int, ...]): プレイヤー，敵の順のx座標
+        ys (tuple[int, ...]): プレイヤー，敵の順のy座標
+        food_status (tuple[bool, ...]): 食べ物の状態
+        icons (tuple[str, ...]): プレイヤーのアイコン
+    """
+    tick: int
+    rng_state: int
+    food_eaten: int
+    result: str | None
+    xs: tuple[int, ...]
+    ys: tuple[int, ...]
+    food_status: tuple[bool, ...]
+    icons: tuple[str, ...]
+
+
 class Game:
     """ゲームクラス
     ゲームの初期設定とメインループを実行してゲームを実施するクラス．
+    `headless=True` で生成した場合はメインループを開始せず，
+    `reset` と `step` で入出力・待機なしにゲームを進めることができる．
 
     Attributes:
+        params (Parameters): configのパラメータのインスタンス
         players (list[Player]): プレイヤーのリスト
         enemies (list[Enemy]): 敵のリスト
         foods (list[Food]): 食べ物のリスト
         blocks (list[Block]): ブロックのリスト
         field (Field): フィールドのインスタンス
+        rng (GameRandom): 配置と敵の移動に使う乱数生成器
+        enemy_ai (EnemyStrategy): 敵の行動方針 (`params.enemy_strategy`)
+        collision_groups (list[int | None]): プレイヤー，敵の順の，
+            移動を互いにふさぐグループ (`params.collision`)
+        seed (int): 現在のゲームのシード．同じシードでは同じゲームになる
+        tick (int): 経過ターン数
+        food_eaten (int): 食べた食べ物の数
+        result (str | None): ゲーム終了時のメッセージ．終了していなければNone
+        recorder (ReplayWriter | None): 設定されていればstepごとに入力を記録する
+        telemetry (TelemetryWriter | None): 設定されていればstepごとに
+            座標や衝突などの計測値を記録する
+        profiler (PhaseProfiler | None): `params.profile` がTrueの場合に
+            処理ごとの時間を計測する
+
+    Examples:
+        >>> game = Game(Parameters(), headless=True)
+        >>> state = game.reset(seed=0)
+        >>> state["players"]
+        [(1, 1)]
+        >>> state, reward, done, info = game.step((1, 0))
+        >>> info["tick"]
+        1
     """
 
-    def __init__(self, params: Parameters) -> None:
+    def __init__(self, params: Parameters, headless: bool = False) -> None:
         """ゲームクラスの初期化
 
         Args:
             params (Parameters): configのパラメータのインスタンス
+            headless (bool): Trueの場合はメインループを開始しない (default: False)
         """
+        self.params = params
         self.players: list[Player] = []
         self.enemies: list[Enemy] = []
         self.foods: list[Food] = []
         self.blocks: list[Block] = []
         self.field = Field([], [], [], [], 0)
+        self.game_map: GameMap | None = None
+        self.rng = GameRandom(params.seed)
+        self.seed = self.rng.seed
+        self.enemy_ai: EnemyStrategy = make_strategy(params.enemy_strategy)
+        self.collision_groups: list[int | None] = []
+        self.tick = 0
+        self.food_eaten = 0
+        self.result: str | None = None
+        self.recorder: ReplayWriter | None = None
+        self.telemetry: TelemetryWriter | None = None
+        self.profiler = PhaseProfiler() if params.profile else None
         self.setup(params)  # ゲームの初期設定
-        self.start()  # ゲームのメインループ
+        if not headless:
+            self.start()  # ゲームのメインループ
 
-    def setup(self, params: Parameters) -> None:
+    def setup(self, params: Parameters, seed: int | None = None) -> None:
         """ゲームの初期設定
         ゲームの初期設定を行うメソッド．
 
+        Args:
+            params (Parameters): configのパラメータのインスタンス
+            seed (int | None): 乱数のシード．
+                Noneの場合は `params.seed` を使い，それもNoneなら毎回異なる配置になる
+        """
+        # 配置と敵の移動は全て同じ乱数生成器から引く
+        self.rng = GameRandom(seed if seed is not None else params.seed)
+        self.seed = self.rng.seed
+        self.tick = 0
+        self.food_eaten = 0
+        self.result = None
+        if params.map_path:
+            self._setup_from_map(params)
+        else:
+            self._setup_square(params)
+        self.enemy_ai = make_strategy(params.enemy_strategy)
+        self.enemy_ai.reset(self)
+        self.collision_groups = collision_groups(
+            params.collision, len(self.players), len(self.enemies))
+
+    def _setup_square(self, params: Parameters) -> None:
+        """周りが壁の正方形のフィールドに，敵と食べ物をランダムに配置する
+
         Args:
             params (Parameters): configのパラメータのインスタンス
         """
@@ -53,92 +154,404 @@ class Game:
         # フィールドの初期化
         self.players = [Player(1, 1)]
         self.enemies = [
-            Enemy(randint(1, f_size - 2), randint(1, f_size - 2))
+            Enemy(self.rng.randint(1, f_size - 2),
+                  self.rng.randint(1, f_size - 2))
             for _ in range(e_num)]
         self.foods = [
-            Food(randint(1, f_size - 2), randint(1, f_size - 2))
+            Food(self.rng.randint(1, f_size - 2),
+                 self.rng.randint(1, f_size - 2))
             for _ in range(f_num)
             ]  # 食べ物を配置
-        # 6*6のフィールドの周りを壁とするBlockインスタンスを生成
+        # フィールドの周りは壁とする (広いマップでも外周のBlockインスタンスは作らない)
         if f_size < 4:
             raise ValueError("field_size must be greater than 4")
-        self.blocks = [
-            Block(x, y)
-            for x in range(f_size)
-            for y in range(f_size)
-            if x == 0 or x == f_size - 1 or y == 0 or y == f_size - 1
-        ]
+        self.blocks = []
+        self.field = Field(
+            self.players,
+            self.enemies,
+            self.foods,
+            self.blocks,
+            f_size,
+            border=True)
+
+    def _setup_from_map(self, params: Parameters) -> None:
+        """マップファイルの壁と出現位置でフィールドを作る
+        敵と食べ物はそれぞれの出現位置からランダムに選んで置く (`_spawn_cells`)．
+        読み込んだマップはresetで再利用する．
+
+        Args:
+            params (Parameters): configのパラメータのインスタンス
+        """
+        if self.game_map is None or self.game_map.path != params.map_path:
+            from game_map import GameMap  # numpyはマップを使うときまで読み込まない
+            self.game_map = GameMap.load(params.map_path)
+        game_map = self.game_map
+        if not game_map.player_spawns:
+            raise ValueError(f"{params.map_path} has no player spawn 'P'")
+        self.players = [Player(*game_map.player_spawns[0])]
+        self.enemies = [
+            Enemy(x, y) for x, y in self._spawn_cells(
+                game_map.enemy_spawns, params.enemy_num)]
+        self.foods = [
+            Food(x, y) for x, y in self._spawn_cells(
+                game_map.food_spawns, params.food_num)]
+        self.blocks = []
         self.field = Field(
             self.players,
             self.enemies,
             self.foods,
             self.blocks,
-            f_size)
+            border=True,
+            game_map=game_map)
+
+    def _spawn_cells(
+            self,
+            spawns: list[tuple[int, int]],
+            n: int) -> list[tuple[int, int]]:
+        """出現位置のリストから重ならないようにランダムにn個選ぶ
+        出現位置が足りない場合，残りは壁でないマスからランダムに選ぶ．
+
+        Args:
+            spawns (list[tuple[int, int]]): 出現位置
+            n (int): 選ぶ数
+
+        Returns:
+            list[tuple[int, int]]: 選んだマスの座標
+        """
+        pool = list(spawns)
+        cells = []
+        f_size, walls = self.game_map.f_size, self.game_map.walls
+        for _ in range(n):
+            if pool:
+                i = self.rng.randint(0, len(pool) - 1)
+                pool[i], pool[-1] = pool[-1], pool[i]
+                cells.append(pool.pop())
+                continue
+            while True:
+                x = self.rng.randint(1, f_size - 2)
+                y = self.rng.randint(1, f_size - 2)
+                if not walls.get(x, y):
+                    cells.append((x, y))
+                    break
+        return cells
+
+    def reset(self, seed: int | None = None) -> dict[str, list]:
+        """ゲームを初期状態に戻す
+        同じシードを与えると同じ配置・同じ敵の動きが再現される．
+
+        Args:
+            seed (int | None): 乱数のシード．Noneの場合は `params.seed` を使う
+
+        Returns:
+            dict[str, list]: 初期状態 (`get_state` を参照)
+
+        Examples:
+            >>> game = Game(Parameters(), headless=True)
+            >>> game.reset(seed=1) == game.reset(seed=1)
+            True
+        """
+        self.setup(self.params, seed)
+        return self.get_state()
+
+    def get_state(self) -> dict[str, list]:
+        """現在の状態を返す
+
+        Returns:
+            dict[str, list]: プレイヤー，敵，残っている食べ物の座標のリスト
+                {'players': [(x, y), ...], 'enemies': [...], 'foods': [...]}
+        """
+        return {
+            "players": [player.get_pos() for player in self.players],
+            "enemies": [enemy.get_pos() for enemy in self.enemies],
+            "foods": [food.get_pos() for food in self.foods if food.status],
+        }
+
+    def snapshot(self) -> GameSnapshot:
+        """現在の動的な状態 (座標，状態，乱数の状態) を保存する
+        先読みを行う操作方針が何度も呼び出すことを想定し，
+        フィールドや壁はコピーしない．
+
+        Returns:
+            GameSnapshot: 保存した状態
+
+        Examples:
+            >>> game = Game(Parameters(seed=0), headless=True)
+            >>> snap = game.snapshot()
+            >>> after = game.step((1, 0))
+            >>> game.restore(snap)
+            >>> game.step((1, 0)) == after
+            True
+        """
+        movers = self.players + self.enemies
+        return GameSnapshot(
+            self.tick,
+            self.rng.state,
+            self.food_eaten,
+            self.result,
+            tuple([item.now_x for item in movers]),
+            tuple([item.now_y for item in movers]),
+            tuple([food.status for food in self.foods]),
+            tuple([player.icon for player in self.players]),
+        )
 
-    def start(self) -> str:
+    def restore(self, snap: GameSnapshot) -> None:
+        """`snapshot` で保存した状態に戻す
+        座標が変わったアイテムだけを `Field.move` で動かすため，
+        衝突判定の索引とフィールドの差分描画もそのまま使える．
+
+        Args:
+            snap (GameSnapshot): このゲームで保存した状態
+        """
+        self.tick = snap.tick
+        self.rng.state = snap.rng_state
+        self.food_eaten = snap.food_eaten
+        self.result = snap.result
+        move = self.field.move
+        for item, x, y in zip(
+                self.players + self.enemies, snap.xs, snap.ys):
+            item.next_x = x
+            item.next_y = y
+            if item.now_x != x or item.now_y != y:
+                move(item)
+        for food, status in zip(self.foods, snap.food_status):
+            food.status = status
+        for player, icon in zip(self.players, snap.icons):
+            player.icon = icon
+
+    def step(
+            self,
+            action: tuple[int, int]
+            ) -> tuple[dict[str, list], float, bool, dict]:
+        """1ターン分ゲームを進める
+        画面表示やキー入力，待機を行わずに，プレイヤーと敵の移動と衝突判定だけを行う．
+        報酬は食べ物を食べると+1，敵にぶつかると-1．
+
+        Args:
+            action (tuple[int, int]): プレイヤーの移動方向 (例: (1, 0))
+
+        Returns:
+            tuple[dict[str, list], float, bool, dict]:
+                (状態, 報酬, 終了したか, 付加情報)．
+                付加情報は {'tick', 'food_eaten', 'result'} を持つ．
+
+        Raises:
+            RuntimeError: 終了したゲームでstepを呼んだ場合
+
+        Examples:
+            >>> params = Parameters(field_size=4, enemy_num=0, food_num=1)
+            >>> game = Game(params, headless=True)
+            >>> _ = game.reset(seed=0)
+            >>> for action in [(1, 0), (0, 1), (-1, 0), (0, -1)]:
+            ...     state, reward, done, info = game.step(action)
+            ...     if done:
+            ...         break
+            >>> reward, done, info["result"]
+            (1.0, True, 'Game Clear!')
+        """
+        if self.result is not None:
+            raise RuntimeError("game is already over. call reset()")
+        if self.recorder is not None:
+            self.recorder.record(self, action)
+        telemetry = self.telemetry  # Noneの場合は記録しない
+        if telemetry is not None:
+            t_step = time.perf_counter_ns()
+        bumps = 0
+
+        profiler = self.profiler  # Noneの場合は計測しない
+        if profiler is not None:
+            t = profiler.clock()
+
+        # プレイヤーの移動を決定
+        for player in self.players:
+            player.get_next_pos(action)
+
+        # 敵の移動を決定 (全ての敵の方向を行動方針からまとめて受け取る)
+        dirs = self.enemy_ai.directions(self)
+        for enemy, dir in zip(self.enemies, dirs):
+            enemy.get_next_pos(dir)
+        if profiler is not None:
+            t = profiler.lap(ENEMY_AI, t)
+
+        # プレイヤーと敵の移動
+        swaps = []
+        if self.params.collision == LEGACY:
+            for item in self.players + self.enemies:
+                # ブロックとの衝突判定
+                bumped_item = self.field.check_bump(item, self.blocks)
+                if bumped_item is not None:
+                    self.field.move(item, stuck=True)
+                    bumps += 1
+                else:
+                    self.field.move(item)
+        else:
+            # ブロックで止めた後の移動先で，プレイヤーと敵の移動をまとめて判定する
+            movers = self.players + self.enemies
+            starts, targets, walled = [], [], []
+            for item in movers:
+                start = (item.now_x, item.now_y)
+                wall = self.field.check_bump(item, self.blocks) is not None
+                starts.append(start)
+                targets.append(start if wall else (item.next_x, item.next_y))
+                walled.append(wall)
+            stuck, swaps = resolve_moves(
+                starts, targets, self.collision_groups)
+            for item, wall, blocked in zip(movers, walled, stuck):
+                self.field.move(item, stuck=wall or blocked)
+            bumps = sum(walled)
+        if profiler is not None:
+            t = profiler.lap(BLOCK_COLLISION, t)
+
+        self.tick += 1
+        reward = 0.0
+        # 敵とすれ違ったプレイヤー (プレイヤーが先に並ぶので組の先頭)
+        n_players = len(self.players)
+        crossed = {i for i, j in swaps if i < n_players <= j}
+        for i, player in enumerate(self.players):
+            # 敵との衝突判定
+            if i in crossed or self.field.occupant(player, self.enemies):
+                player.change_face_bad()
+                self.result = "Game Over!"
+                reward -= 1.0
+                break
+
+            # 食べ物との衝突判定
+            bumped_item = self.field.occupant(player, self.foods)
+            if bumped_item is not None:
+                if bumped_item.status:
+                    self.food_eaten += 1
+                    reward += 1.0
+                bumped_item.status = False
+                if all([not food.status for food in self.foods]):
+                    player.change_face_good()
+                    self.result = "Game Clear!"
+                    break
+        if profiler is not None:
+            profiler.lap(ENEMY_FOOD_COLLISION, t)
+            profiler.end_tick()
+        if telemetry is not None:
+            telemetry.record(
+                self, bumps, time.perf_counter_ns() - t_step)
+
+        info = {
+            "tick": self.tick,
+            "food_eaten": self.food_eaten,
+            "result": self.result,
+        }
+        return self.get_state(), reward, self.result is not None, info
+
+    def frame(self) -> list[list[str]]:
+        """描画する範囲のアイコンを返す
+        `Parameters.viewport_size` が0でフィールド全体を保持している場合はフィールド全体，
+        それ以外は最初のプレイヤーを中心とする範囲 (マップの端では内側にずらす)．
+
+        Returns:
+            list[list[str]]: 描画する各マスのアイコン
+
+        Examples:
+            >>> game = Game(Parameters(field_size=1000, seed=0), headless=True)
+            >>> view = game.frame()
+            >>> len(view), len(view[0])
+            (32, 32)
+            >>> game.frame()[1][1] == game.players[0].icon
+            True
+        """
+        field = self.field
+        size = self.params.viewport_size
+        if not size:
+            if field.field is not None:
+                return field.field
+            size = VIEW_SIZE
+        player = self.players[0]
+        x0 = max(0, min(player.now_x - size // 2, field.f_size - size))
+        y0 = max(0, min(player.now_y - size // 2, field.f_size - size))
+        return field.viewport(x0, y0, size, size)
+
+    def play(self, policy: Policy, max_ticks: int | None = None) -> str | None:
+        """操作方針に従ってゲームを最後までヘッドレスで進める
+
+        Args:
+            policy (Policy): プレイヤーの移動方向を決める操作方針
+            max_ticks (int | None): 打ち切るターン数．Noneの場合は終了するまで続ける
+
+        Returns:
+            str | None: ゲーム終了時のメッセージ．打ち切った場合はNone
+
+        Examples:
+            >>> from policy import GreedyPolicy
+            >>> game = Game(Parameters(enemy_num=0, seed=0), headless=True)
+            >>> game.play(GreedyPolicy(), max_ticks=100)
+            'Game Clear!'
+        """
+        policy.reset(self)
+        player = self.players[0]
+        while self.result is None:
+            if max_ticks is not None and self.tick >= max_ticks:
+                break
+            self.step(policy(self, player))
+        if self.profiler is not None:
+            self.profiler.log_summary()
+        return self.result
+
+    def start(self, policy: Policy | None = None) -> str | None:
         """ゲームのメインループ
         ゲームのメインループを実行するメソッド．
         キー入力を受け取り，プレイヤーと敵の移動を行い，フィールドを更新する．
         ゲーム終了条件を満たした場合は終了する．
 
+        Args:
+            policy (Policy | None): 指定した場合はキー入力の代わりに
+                操作方針でプレイヤーを動かす (無人での長時間実行用)
+
         Returns:
-            str: ゲーム終了時のメッセージ (例: "Game Over!", "Game Clear!")
+            str | None: ゲーム終了時のメッセージ (例: "Game Over!", "Game Clear!")．
+                ゲームの途中で入力 (台本など) が終わった場合はNone
         """
-        # ゲームのメインループ
-        while True:
-            #  フィールドを表示
-            os.system("cls" if os.name == "nt" else "clear")  # ターミナルをクリア
-            self.field.display_field()
-
-            # プレイヤーの移動を決定
-            for player in self.players:
-                # キー入力を受け取る
-                key = Controller.get_user_input()
-                player.get_next_pos(key)
-
-            # 敵の移動を決定
-            for enemy in self.enemies:
-                enemy.get_next_pos()
-
-            # プレイヤーと敵の移動
-            for item in self.players + self.enemies:
-                # ブロックとの衝突判定
-                bumped_item = self.field.check_bump(item, list(self.blocks))
-                if bumped_item is not None:
-                    item.update_pos(stuck=True)
+        logger.info(f"seed: {self.seed}")  # 同じゲームを再現するためのシード
+        renderer = TerminalRenderer()  # 変化したマスだけを描き直す
+        if policy is not None:
+            policy.reset(self)
+        profiler = self.profiler  # Noneの場合は計測しない
+        try:
+            # ゲームのメインループ
+            while True:
+                #  フィールドを表示
+                if profiler is not None:
+                    t = profiler.clock()
+                renderer.render(self.frame())
+                if profiler is not None:
+                    t = profiler.lap(RENDER, t)
+
+                # キー入力 (または操作方針) で移動方向を決め，1ターン進める
+                if policy is None:
+                    key = Controller.get_user_input()
+                    if Controller.get_backend().exhausted:
+                        logger.info("input closed")
+                        return None
                 else:
-                    item.update_pos()
-
-            for player in self.players:
-                # 敵との衝突判定
-                if self.field.check_bump(player, list(self.enemies)):
-                    player.change_face_bad()
-                    self.field.update_field()
-                    os.system("cls" if os.name == "nt" else "clear")
-                    # ターミナルをクリア
-                    self.field.display_field()
-                    logger.info("Game Over!")
-                    return "Game Over!"
-
-                # 食べ物との衝突判定
-                bumped_item = self.field.check_bump(player, list(self.foods))
-                if bumped_item is not None:
-                    bumped_item.status = False
-                    if all([not food.status for food in self.foods]):
-                        player.change_face_good()
-                        self.field.update_field()
-                        os.system("cls" if os.name == "nt" else "clear")
-                        # ターミナルをクリア
-                        self.field.display_field()
-                        logger.info("Game Clear!")
-                        return "Game Clear!"
-
-            # fieldを更新
-            self.field.update_field()
-
-            # 一定の間隔で処理を繰り返す
-            # 0.3秒待つ
-            time.sleep(0.3)
-
-            # 終了条件のチェック
-            # 例えば、全ての食べ物が消えたり、敵とプレイヤーが衝突したりしたら終了する処理を追加する
+                    key = policy(self, self.players[0])
+                if profiler is not None:
+                    profiler.lap(INPUT, t)
+                _, _, done, info = self.step(key)
+
+                # fieldを更新
+                if profiler is not None:
+                    t = profiler.clock()
+                self.field.update_field()
+                if profiler is not None:
+                    profiler.lap(UPDATE_FIELD, t)
+
+                # 終了条件のチェック
+                # 全ての食べ物が消えたり，敵とプレイヤーが衝突したりしたら終了する
+                if done:
+                    renderer.render(self.frame())
+                    logger.info(info["result"])
+                    if profiler is not None:
+                        profiler.log_summary()
+                    return info["result"]
+
+                # 一定の間隔で処理を繰り返す
+                # tick_interval秒 (デフォルトは0.3秒) 待つ
+                time.sleep(self.params.tick_interval)
+        finally:
+            renderer.close()  # カーソルの表示を元に戻す
+            Controller.close()  # 端末の入力モードを元に戻す
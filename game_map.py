@@ -0,0 +1,239 @@
+"""マップファイル
+テキストで書いたマップを読み込み，壁のビットマップ・各マスの移動できる方向・
+出現位置のリストをまとめたバイナリ (コンパイル済みマップ) にするモジュール．
+コンパイル済みマップはテキストの内容のハッシュをキーとしてディスクにキャッシュし，
+2回目以降はmmapで開くだけなので，大きいマップでもすぐにゲームを始められる．
+
+マップの書き方 (1文字が1マス):
+    #   壁
+    .   床 (空白も床)
+    P   プレイヤーの出現位置
+    E   敵の出現位置
+    F   食べ物の出現位置
+    ;   で始まる行はコメント
+
+行の長さが揃っていない場合や縦横の長さが違う場合は，壁で埋めて正方形にする．
+外周は常に壁になる．
+
+コンパイル済みマップの構成 (整数は全てリトルエンディアン):
+    ヘッダ      : MAGIC(4) version(u16) reserved(u16) f_size(u32)
+                  n_players(u32) n_enemies(u32) n_foods(u32)
+    壁          : f_size^2 バイト (壁は1)
+    移動できる方向: f_size^2 バイト (`NEIGHBORS` のk番目に移動できればビットk)
+    出現位置    : プレイヤー，敵，食べ物の順にマスの番号 y * f_size + x (u32)
+"""
+from __future__ import annotations
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+import numpy as np
+from chunks import DenseGrid
+from distance import NEIGHBORS
+
+
+MAGIC = b"PMMP"
+VERSION = 1
+DEFAULT_CACHE_DIR = "cache/maps"
+WALL, PLAYER, ENEMY, FOOD = "#", "P", "E", "F"
+
+_HEADER = struct.Struct("<4sHHIIII")
+
+
+def map_hash(text: bytes) -> str:
+    """マップのテキストのハッシュを返す (キャッシュのキー)
+
+    Args:
+        text (bytes): マップファイルの内容
+
+    Returns:
+        str: 16進数のハッシュ
+    """
+    h = hashlib.sha256(VERSION.to_bytes(2, "little"))
+    h.update(text)
+    return h.hexdigest()[:32]
+
+
+def compile_map(text: bytes) -> bytes:
+    """マップのテキストをコンパイル済みマップのバイト列にする
+
+    Args:
+        text (bytes): マップファイルの内容
+
+    Returns:
+        bytes: コンパイル済みマップ
+
+    Raises:
+        ValueError: マップが小さすぎる，または出現位置が外周にある場合
+
+    Examples:
+        >>> data = compile_map(b"#####\\n#P.E#\\n#.#F#\\n")
+        >>> _HEADER.unpack_from(data)[3:]
+        (5, 1, 1, 1)
+    """
+    lines = [line.rstrip(b"\r") for line in text.split(b"\n")
+             if not line.startswith(b";")]
+    while lines and not lines[-1].strip():
+        lines.pop()
+    f_size = max([len(lines)] + [len(line) for line in lines])
+    if f_size < 4:
+        raise ValueError("map must be at least 4x4")
+    cells = np.full((f_size, f_size), ord(WALL), dtype=np.uint8)
+    for y, line in enumerate(lines):
+        cells[y, :len(line)] = np.frombuffer(line, dtype=np.uint8)
+    walls = cells == ord(WALL)
+    border = np.zeros_like(walls)
+    border[[0, -1], :] = border[:, [0, -1]] = True
+    spawns = []
+    for mark in (PLAYER, ENEMY, FOOD):
+        found = cells == ord(mark)
+        if (found & border).any():
+            raise ValueError(f"spawn '{mark}' must not be on the border")
+        spawns.append(np.flatnonzero(found).astype("<u4"))
+    walls |= border
+    # 隣のマスが壁でなければ，その方向のビットを立てる
+    open_cells = ~walls
+    masks = np.zeros((f_size, f_size), dtype=np.uint8)
+    for k, (dx, dy) in enumerate(NEIGHBORS):
+        shifted = np.zeros_like(open_cells)
+        ys = slice(max(-dy, 0), f_size - max(dy, 0))
+        xs = slice(max(-dx, 0), f_size - max(dx, 0))
+        shifted[ys, xs] = open_cells[
+            ys.start + dy:ys.stop + dy, xs.start + dx:xs.stop + dx]
+        masks |= ((shifted & open_cells).astype(np.uint8) << k)
+    header = _HEADER.pack(
+        MAGIC, VERSION, 0, f_size, *(len(s) for s in spawns))
+    return b"".join([
+        header, walls.astype(np.uint8).tobytes(), masks.tobytes(),
+        *(s.tobytes() for s in spawns)])
+
+
+class GameMap:
+    """コンパイル済みマップ
+    バイト列はmmapしたファイル (またはメモリ上のバイト列) を複製せずに参照する．
+
+    Attributes:
+        path (str): マップファイルのパス
+        f_size (int): フィールドのサイズ
+        walls (DenseGrid): 壁の格子
+        neighbor_masks (memoryview): マスごとの移動できる方向のビット
+        player_spawns (list[tuple[int, int]]): プレイヤーの出現位置
+        enemy_spawns (list[tuple[int, int]]): 敵の出現位置
+        food_spawns (list[tuple[int, int]]): 食べ物の出現位置
+        loaded_from_cache (bool): キャッシュから読み込んだか
+
+    Examples:
+        >>> import tempfile
+        >>> d = tempfile.mkdtemp()
+        >>> path = os.path.join(d, "map.txt")
+        >>> with open(path, "w") as f:
+        ...     _ = f.write("#####\\n#P..#\\n#.#E#\\n#F..#\\n")
+        >>> game_map = GameMap.load(path, cache_dir=d)
+        >>> game_map.f_size, game_map.loaded_from_cache
+        (5, False)
+        >>> game_map.walls.get(2, 2), game_map.walls.get(2, 4)  # 足りない行は壁
+        (1, 1)
+        >>> game_map.player_spawns, game_map.enemy_spawns, game_map.food_spawns
+        ([(1, 1)], [(3, 2)], [(1, 3)])
+        >>> game_map.neighbor_table()[1 * 5 + 1]  # (1, 1) から右と下へ移動できる
+        (7, 11)
+        >>> GameMap.load(path, cache_dir=d).loaded_from_cache
+        True
+    """
+
+    def __init__(self, data: bytes | mmap.mmap, path: str = "") -> None:
+        """
+        Args:
+            data (bytes | mmap.mmap): コンパイル済みマップ
+            path (str): マップファイルのパス
+        """
+        magic, version, _, f_size, n_players, n_enemies, n_foods = \
+            _HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"not a compiled map (version {VERSION})")
+        self.path = path
+        self.f_size = f_size
+        self.loaded_from_cache = False
+        self._data = data
+        view = memoryview(data)
+        n = f_size * f_size
+        offset = _HEADER.size
+        self.walls = DenseGrid(f_size, view[offset:offset + n])
+        self.neighbor_masks = view[offset + n:offset + 2 * n]
+        offset += 2 * n
+        spawns = []
+        for count in (n_players, n_enemies, n_foods):
+            cells = np.frombuffer(
+                view[offset:offset + 4 * count], dtype="<u4").tolist()
+            spawns.append([(cell % f_size, cell // f_size) for cell in cells])
+            offset += 4 * count
+        self.player_spawns, self.enemy_spawns, self.food_spawns = spawns
+        self._neighbors: list[tuple[int, ...]] | None = None
+
+    @classmethod
+    def load(
+            cls,
+            path: str,
+            cache_dir: str | None = DEFAULT_CACHE_DIR) -> GameMap:
+        """マップファイルを読み込む
+        キャッシュにコンパイル済みマップがあればmmapで開き，なければコンパイルして保存する．
+
+        Args:
+            path (str): マップファイルのパス
+            cache_dir (str | None): キャッシュの保存先．Noneの場合は保存しない
+
+        Returns:
+            GameMap: コンパイル済みマップ
+        """
+        with open(path, "rb") as f:
+            text = f.read()
+        cache = os.path.join(cache_dir, f"{map_hash(text)}.map") \
+            if cache_dir is not None else None
+        if cache is not None and os.path.exists(cache):
+            with open(cache, "rb") as f:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            game_map = cls(data, path)
+            game_map.loaded_from_cache = True
+            return game_map
+        data = compile_map(text)
+        if cache is not None:
+            _save(cache, data)
+        return cls(data, path)
+
+    def neighbor_table(self) -> list[tuple[int, ...]]:
+        """各マスから移動できるマスの表を返す (`distance.neighbor_table` と同じ形)
+        最初に呼んだときに移動できる方向のビットから作り，以降は同じ表を返す．
+
+        Returns:
+            list[tuple[int, ...]]: マス [y * f_size + x] ごとの移動できるマスの番号
+        """
+        if self._neighbors is None:
+            f = self.f_size
+            steps = [dy * f + dx for dx, dy in NEIGHBORS]
+            # ビットの組み合わせごとの移動量
+            by_mask = [tuple(s for k, s in enumerate(steps) if mask >> k & 1)
+                       for mask in range(1 << len(steps))]
+            self._neighbors = [
+                tuple(cell + s for s in by_mask[mask])
+                for cell, mask in enumerate(self.neighbor_masks)]
+        return self._neighbors
+
+
+def _save(path: str, data: bytes) -> None:
+    """コンパイル済みマップをキャッシュに保存する (一時ファイルに書いてから置き換える)
+
+    Args:
+        path (str): 保存先
+        data (bytes): コンパイル済みマップ
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
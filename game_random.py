@@ -0,0 +1,121 @@
+"""乱数生成器
+ゲームの配置と敵の移動に使う乱数生成器．
+状態が64bit整数1つだけのsplitmix64を使うため，
+Pythonのint演算とNumPyのuint64配列演算で全く同じ乱数列を作ることができる．
+"""
+import os
+
+
+MASK64 = (1 << 64) - 1
+GOLDEN_GAMMA = 0x9E3779B97F4A7C15  # 1回の生成ごとに状態に足す定数
+MIX_MULT1 = 0xBF58476D1CE4E5B9
+MIX_MULT2 = 0x94D049BB133111EB
+
+
+def mix64(z: int) -> int:
+    """splitmix64の出力関数
+
+    Args:
+        z (int): 64bitの状態
+
+    Returns:
+        int: 64bitの乱数
+
+    Examples:
+        >>> mix64(GOLDEN_GAMMA)
+        16294208416658607535
+    """
+    z = ((z ^ (z >> 30)) * MIX_MULT1) & MASK64
+    z = ((z ^ (z >> 27)) * MIX_MULT2) & MASK64
+    return z ^ (z >> 31)
+
+
+class GameRandom:
+    """ゲーム1つ分の乱数生成器
+    `random.Random` のうちゲームで使う `randint` と `choice` を同じ名前で提供する．
+
+    Attributes:
+        seed (int): シード．Noneを渡した場合はOSの乱数から決めた値
+        state (int): 64bitの内部状態．生成するたびにGOLDEN_GAMMAだけ進む
+
+    Examples:
+        >>> rng = GameRandom(0)
+        >>> [rng.randint(1, 10) for _ in range(5)]
+        [6, 1, 10, 5, 8]
+        >>> GameRandom(0).choice("abc") == GameRandom(0).choice("abc")
+        True
+        >>> rng1, rng2 = GameRandom(3), GameRandom(3)
+        >>> picks = rng1.choices("abcde", 4)
+        >>> picks == [rng2.choice("abcde") for _ in range(4)]
+        True
+    """
+
+    def __init__(self, seed: int | None = None) -> None:
+        """
+        Args:
+            seed (int | None): シード．Noneの場合はOSの乱数から決める
+        """
+        if seed is None:
+            seed = int.from_bytes(os.urandom(8), "little")
+        self.seed = seed
+        self.state = seed & MASK64
+
+    def next_u64(self) -> int:
+        """64bitの乱数を1つ生成する
+
+        Returns:
+            int: 0以上2**64未満の乱数
+        """
+        self.state = (self.state + GOLDEN_GAMMA) & MASK64
+        return mix64(self.state)
+
+    def randint(self, a: int, b: int) -> int:
+        """a以上b以下の整数を返す
+
+        Args:
+            a (int): 下限
+            b (int): 上限
+
+        Returns:
+            int: a以上b以下の整数
+        """
+        return a + self.next_u64() % (b - a + 1)
+
+    def choice(self, seq):
+        """列から要素を1つ選んで返す
+
+        Args:
+            seq (Sequence): 選択元の列
+
+        Returns:
+            選ばれた要素
+        """
+        return seq[self.next_u64() % len(seq)]
+
+    def choices(self, seq, k: int) -> list:
+        """列から要素をk回選んだリストを返す
+        `choice` をk回呼んだ場合と同じ結果を1回の呼び出しで生成する．
+
+        Args:
+            seq (Sequence): 選択元の列
+            k (int): 選ぶ回数
+
+        Returns:
+            list: 選ばれた要素のリスト
+        """
+        n = len(seq)
+        state = self.state
+        out = [None] * k
+        for i in range(k):
+            state = (state + GOLDEN_GAMMA) & MASK64
+            # mix64を展開したもの
+            z = ((state ^ (state >> 30)) * MIX_MULT1) & MASK64
+            z = ((z ^ (z >> 27)) * MIX_MULT2) & MASK64
+            out[i] = seq[(z ^ (z >> 31)) % n]
+        self.state = state
+        return out
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -13,8 +13,14 @@ class Item:
        next_y(int) : 次の時刻でのy座標
        status(bool) : アイテムの状態（Trueなら存在する、Falseなら存在しない消滅した）
        icon(str) : 表示されるアイテムのアイコン
+
+    大量のアイテムを扱うため `__slots__` でインスタンスごとの `__dict__` を持たせない．
+    アイコンの初期値はクラス属性 `ICON` で共有し，インスタンスはその参照だけを持つ．
     """
 
+    __slots__ = ("now_x", "now_y", "next_x", "next_y", "status", "icon")
+    ICON = ""  # 表示アイコンの初期値
+
     def __init__(self, x, y) -> None:
         """
         Itemクラスのコンストラクタ
@@ -47,7 +53,7 @@ class Item:
         self.next_x = x  # 次の時刻でのx座標
         self.next_y = y  # 次の時刻でのy座標
         self.status = True  # アイテムの状態(存在するか消滅したか)
-        self.icon = ""
+        self.icon = self.ICON
 
     def get_next_pos(self, *args, **kargs) -> tuple[int, int]:
         """
@@ -1,9 +1,14 @@
 from game import Game
-import os
+from replay import ReplayWriter
+from telemetry import TelemetryWriter
+from policy import AutopilotPolicy
+from controller import Controller
+from controller import ScriptedInput
 import argparse
 from config import common_args
 from config import Parameters
 from utils import dump_params
+from utils import make_result_dir
 from utils import setup_params
 from utils import set_logging
 import logging
@@ -13,15 +18,26 @@ def main() -> None:
     # コマンドライン引数の設定
     parser = argparse.ArgumentParser()
     parser = common_args(parser)  # コマンドライン引数引数を読み込み
-    # parser.add_argument("--main")
-    # # 実行スクリプト固有のコマンドライン引数があればここに記入する．
+    parser.add_argument(
+        "--autopilot",
+        action="store_true",
+        help="キー入力の代わりに自動操作でプレイヤーを動かす")
+    parser.add_argument(
+        "--keys",
+        type=str,
+        default=None,
+        help="キー入力の代わりにファイルに書かれたキーの列でプレイヤーを動かす")
+    parser.add_argument(
+        "--realtime",
+        action="store_true",
+        help="キー入力を待たずにtick_intervalごとにゲームを進める")
     args = parser.parse_args()
     params = Parameters(**setup_params(vars(args), args.parameters))
     # args，run_date，git_revisionなどを追加した辞書を取得
 
     # 結果出力用ファイルの作成
-    result_dir = f'result/{params.run_date}'  # 結果出力ディレクトリ
-    os.mkdir(result_dir)  # 実行日時を名前とするディレクトリを作成
+    # 実行日時とプロセスIDを名前とするディレクトリを作成
+    result_dir = make_result_dir(params.run_date)  # 結果出力ディレクトリ
     dump_params(params, f'{result_dir}')  # パラメータを出力
 
     # ログ設定
@@ -34,8 +50,32 @@ def main() -> None:
     # logger.info(params.param1)  # params変数は各パラメータにドットアクセスが可能．
     # logger.info(params.args['arg1'])  # コマンドライン引数はargs['']でアクセス．
 
-    # ゲームの実行
-    Game(params)
+    # ゲームの実行 (入力をリプレイファイルに記録する)
+    if args.keys is not None:
+        Controller.backend = ScriptedInput(args.keys)
+    game = Game(params, headless=True)
+    if params.telemetry:
+        # ターンごとの計測値を結果出力ディレクトリに記録する
+        game.telemetry = TelemetryWriter(
+            f'{result_dir}/telemetry', game, fmt=params.telemetry)
+    with ReplayWriter(f'{result_dir}/game.replay', game) as game.recorder:
+        policy = AutopilotPolicy() if args.autopilot else None
+        try:
+            if args.realtime:
+                # asyncioはリアルタイムで遊ぶときまで読み込まない
+                import asyncio
+                from async_loop import FixedTimestepLoop
+                asyncio.run(FixedTimestepLoop(game, policy).run())
+            else:
+                game.start(policy)
+        finally:
+            if game.telemetry is not None:
+                game.telemetry.close()
+    if policy is not None:
+        logger.info(
+            f"autopilot: {policy.decisions} decisions, "
+            f"max {policy.max_latency_ns / 1e6:.3f} ms, "
+            f"{policy.overruns} over {policy.budget_ns / 1e6:.3f} ms budget")
 
 
 if __name__ == "__main__":
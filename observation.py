@@ -0,0 +1,181 @@
+"""学習用の観測の作成
+フィールドを壁・敵・食べ物・プレイヤーの4チャンネルの平面として
+あらかじめ確保したNumPyの配列に書き込むモジュール．
+配列は毎ターン同じものを書き換え，`as_tensor` でコピーせずにtorchから参照できる．
+"""
+from __future__ import annotations
+from collections.abc import Sequence
+import numpy as np
+import typing
+if typing.TYPE_CHECKING:
+    import torch
+    from batch_game import BatchGame
+    from game import Game
+
+
+CHANNELS = ("walls", "enemies", "foods", "players")
+WALLS, ENEMIES, FOODS, PLAYERS = range(len(CHANNELS))
+
+
+class ObservationEncoder:
+    """観測を作成するクラス
+    壁のチャンネルはゲームが変わったときだけ書き込み，
+    動くもののチャンネルは前回書き込んだマスを0に戻してから新しい位置に書き込む．
+
+    Attributes:
+        buffer (np.ndarray): 観測 [ゲーム, チャンネル, y, x] (N, 4, f_size, f_size)
+
+    Examples:
+        >>> from config import Parameters
+        >>> from game import Game
+        >>> game = Game(Parameters(field_size=5, enemy_num=1, seed=0),
+        ...             headless=True)
+        >>> encoder = ObservationEncoder(5)
+        >>> obs = encoder.encode([game])
+        >>> obs.shape
+        (1, 4, 5, 5)
+        >>> int(obs[0, WALLS].sum()), int(obs[0, PLAYERS, 1, 1])
+        (16, 1)
+        >>> _ = game.step((1, 0))
+        >>> obs = encoder.encode([game])
+        >>> int(obs[0, PLAYERS, 1, 2]), int(obs[0, PLAYERS].sum())
+        (1, 1)
+    """
+
+    def __init__(
+            self,
+            f_size: int,
+            n_games: int = 1,
+            dtype: np.dtype = np.float32) -> None:
+        """
+        Args:
+            f_size (int): フィールドのサイズ
+            n_games (int): 一度に観測を作るゲームの数
+            dtype (np.dtype): 観測の型
+        """
+        self.f_size = f_size
+        self.buffer = np.zeros((n_games, len(CHANNELS), f_size, f_size), dtype)
+        self._fields: list[object] = [None] * n_games  # 壁を書き込んだFieldなど
+        self._prev: tuple[np.ndarray, ...] | None = None  # 前回書き込んだ位置
+        self._tensor: torch.Tensor | None = None
+
+    def _scatter(
+            self,
+            game_idx: np.ndarray,
+            channel: np.ndarray,
+            ys: np.ndarray,
+            xs: np.ndarray) -> np.ndarray:
+        """前回の位置を0に戻し，新しい位置に1を書き込む
+
+        Args:
+            game_idx (np.ndarray): ゲームの番号
+            channel (np.ndarray): チャンネル
+            ys (np.ndarray): y座標
+            xs (np.ndarray): x座標
+
+        Returns:
+            np.ndarray: 観測
+        """
+        if self._prev is not None:
+            self.buffer[self._prev] = 0
+        index = (game_idx, channel, ys, xs)
+        self.buffer[index] = 1
+        self._prev = index
+        return self.buffer
+
+    def encode(self, games: Sequence[Game]) -> np.ndarray:
+        """Gameのリストから観測を作る
+
+        Args:
+            games (Sequence[Game]): ゲームのリスト (長さはn_games以下)
+
+        Returns:
+            np.ndarray: 観測 (`buffer` そのもの)
+        """
+        f = self.f_size
+        game_idx: list[int] = []
+        channel: list[int] = []
+        ys: list[int] = []
+        xs: list[int] = []
+        for i, game in enumerate(games):
+            field = game.field
+            if self._fields[i] is not field:
+                # resetなどでFieldが作り直されたときだけ壁を書き込む
+                walls = np.frombuffer(field.wall_map, dtype=np.uint8)
+                self.buffer[i, WALLS] = walls.reshape(f, f)
+                self._fields[i] = field
+            for ch, items in (
+                    (ENEMIES, game.enemies),
+                    (FOODS, game.foods),
+                    (PLAYERS, game.players)):
+                pos = [(item.now_y, item.now_x) for item in items
+                       if item.status]
+                game_idx += [i] * len(pos)
+                channel += [ch] * len(pos)
+                ys += [p[0] for p in pos]
+                xs += [p[1] for p in pos]
+        return self._scatter(
+            np.array(game_idx, dtype=np.intp),
+            np.array(channel, dtype=np.intp),
+            np.array(ys, dtype=np.intp),
+            np.array(xs, dtype=np.intp))
+
+    def encode_batch(self, batch: BatchGame) -> np.ndarray:
+        """BatchGameから観測を作る (Pythonのループなし)
+
+        Args:
+            batch (BatchGame): n_games個のゲームを持つBatchGame
+
+        Returns:
+            np.ndarray: 観測 (`buffer` そのもの)
+
+        Examples:
+            >>> from config import Parameters
+            >>> from batch_game import BatchGame
+            >>> from game import Game
+            >>> params = Parameters(field_size=6, enemy_num=3, food_num=2)
+            >>> batch = BatchGame(params, 2)
+            >>> batch.reset([5, 6])
+            >>> games = [Game(params, headless=True) for _ in range(2)]
+            >>> _ = [game.reset(seed) for game, seed in zip(games, [5, 6])]
+            >>> a = ObservationEncoder(6, 2).encode_batch(batch)
+            >>> b = ObservationEncoder(6, 2).encode(games)
+            >>> bool((a == b).all())
+            True
+        """
+        n = batch.n_games
+        if self._fields[0] is not batch.walls:
+            self.buffer[:n, WALLS] = batch.walls
+            self._fields[0] = batch.walls
+        rows = np.arange(n)
+        parts = []
+        for ch, pos, mask in (
+                (ENEMIES, batch.enemies, None),
+                (FOODS, batch.foods, batch.food_alive),
+                (PLAYERS, batch.players, None)):
+            k = pos.shape[1]
+            game_idx = np.repeat(rows, k)
+            ys = pos[..., 1].ravel()
+            xs = pos[..., 0].ravel()
+            if mask is not None:
+                keep = mask.ravel()
+                game_idx, ys, xs = game_idx[keep], ys[keep], xs[keep]
+            parts.append((game_idx, np.full(len(ys), ch), ys, xs))
+        return self._scatter(*(np.concatenate(a) for a in zip(*parts)))
+
+    def as_tensor(self) -> torch.Tensor:
+        """観測をコピーせずにtorchのTensorとして返す
+        `buffer` とメモリを共有するため，以降のencodeの結果もそのまま反映される．
+
+        Returns:
+            torch.Tensor: 観測 (N, 4, f_size, f_size)
+        """
+        if self._tensor is None:
+            import torch  # torchは必要になるまで読み込まない
+            self._tensor = torch.from_numpy(self.buffer)
+        return self._tensor
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
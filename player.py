@@ -17,9 +17,10 @@ class Player(Item):
         self.status(bool) : アイテムの状態（Trueなら存在する、Falseなら存在しない消滅した）
     """
 
-    def __init__(self, x, y) -> None:
-        super().__init__(x, y)
-        self.icon = "😶"
+    __slots__ = ()
+    ICON = "😶"
+    GOOD_ICON = "😊"  # 食べ物を全て食べたときのアイコン
+    BAD_ICON = "😭"  # 敵にぶつかったときのアイコン
 
     def get_next_pos(self, dir: tuple[int, int]) -> tuple[int, int]:
         """
@@ -61,7 +62,7 @@ class Player(Item):
             >>> player.icon
             '😊'
         """
-        self.icon = "😊"
+        self.icon = self.GOOD_ICON
 
     def change_face_bad(self) -> None:
         """
@@ -76,7 +77,7 @@ class Player(Item):
             >>> player.icon
             '😭'
         """
-        self.icon = "😭"
+        self.icon = self.BAD_ICON
 
 
 if __name__ == "__main__":
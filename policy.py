@@ -0,0 +1,246 @@
+"""プレイヤーの操作方針
+キー入力の代わりにプレイヤーの移動方向を決めるクラス群．
+ヘッドレス実行 (`Game.step`) で大量のゲームを自動で遊ばせるために使う．
+"""
+import time
+from distance import UNREACHABLE
+from distance import bfs_distances
+from distance import distance_oracle
+from game_random import GameRandom
+from player import Player
+from enemy import Enemy
+import typing
+if typing.TYPE_CHECKING:
+    from game import Game
+
+
+class Policy:
+    """操作方針の親クラス
+    `reset` でゲーム開始時の準備を行い，`__call__` で毎ターンの移動方向を返す．
+    """
+
+    def reset(self, game: 'Game') -> None:
+        """ゲーム開始時に呼び出されるメソッド
+
+        Args:
+            game (Game): 開始したゲーム
+        """
+
+    def __call__(self, game: 'Game', player: Player) -> tuple[int, int]:
+        """移動方向を決めるメソッド
+
+        Args:
+            game (Game): 実行中のゲーム
+            player (Player): 操作するプレイヤー
+
+        Returns:
+            tuple[int, int]: x, y座標の差分
+        """
+        raise NotImplementedError
+
+
+class RandomPolicy(Policy):
+    """上下左右と停止からランダムに選ぶ操作方針
+
+    Examples:
+        >>> from config import Parameters
+        >>> from game import Game
+        >>> game = Game(Parameters(seed=0), headless=True)
+        >>> policy = RandomPolicy(seed=0)
+        >>> policy(game, game.players[0]) in Enemy.DIRECTIONS
+        True
+    """
+
+    def __init__(self, seed: int | None = None) -> None:
+        """
+        Args:
+            seed (int | None): 乱数のシード
+        """
+        self.rng = GameRandom(seed)
+
+    def __call__(self, game: 'Game', player: Player) -> tuple[int, int]:
+        return self.rng.choice(Enemy.DIRECTIONS)
+
+
+class GreedyPolicy(Policy):
+    """最も近い (マンハッタン距離) 残っている食べ物に向かう操作方針
+    壁で進めない方向は選ばない．敵は避けない．
+
+    Examples:
+        >>> from config import Parameters
+        >>> from game import Game
+        >>> game = Game(Parameters(enemy_num=0, food_num=1), headless=True)
+        >>> _ = game.reset(seed=0)
+        >>> policy = GreedyPolicy()
+        >>> for _ in range(30):
+        ...     if game.result is not None:
+        ...         break
+        ...     _ = game.step(policy(game, game.players[0]))
+        >>> game.result
+        'Game Clear!'
+    """
+
+    def __call__(self, game: 'Game', player: Player) -> tuple[int, int]:
+        foods = [food for food in game.foods if food.status]
+        if not foods:
+            return (0, 0)
+        x, y = player.now_x, player.now_y
+        target = min(
+            foods, key=lambda f: abs(f.now_x - x) + abs(f.now_y - y))
+        best = (0, 0)
+        best_dist = abs(target.now_x - x) + abs(target.now_y - y)
+        for dx, dy in Enemy.DIRECTIONS[1:]:
+            if game.field.is_wall(x + dx, y + dy):
+                continue
+            dist = abs(target.now_x - x - dx) + abs(target.now_y - y - dy)
+            if dist < best_dist:
+                best, best_dist = (dx, dy), dist
+        return best
+
+
+class AutopilotPolicy(Policy):
+    """最も近い (最短経路の歩数) 残っている食べ物に向かい，敵を避ける操作方針
+    キー入力なしで長時間遊ばせる (soakテストやベンチマーク) ために使う．
+
+    食べ物は動かないため，食べ物ごとの距離場は `reset` で一度だけ全マス間の距離の表
+    (広いマップでは幅優先探索) から求める．
+    毎ターンは食べられた食べ物があったときだけ残りの距離場の最小値をNumPyで取り直し，
+    それ以外は隣の4マスと現在のマスを比べるだけで方向を決める．
+    次のターンに敵が入れるマス (敵のいるマスとその上下左右) は避け，
+    避けられない場合だけ食べ物への近さを優先する．
+
+    1回の判断にかける時間の予算を `budget_ns` (既定は1ミリ秒) とする．
+    通常のターンはO(敵の数)，食べ物が食べられたターンはO(食べ物の数 * f_size^2) かかる．
+    予算は守られる保証はなく，超えた判断の回数を `overruns` に記録する．
+    マップの大きさ・敵と食べ物の数ごとの最大時間と超えた回数は benchmark.py で計測する．
+
+    Attributes:
+        budget_ns (int): 1回の判断の時間の予算 (ナノ秒)
+        overruns (int): 予算を超えた判断の回数
+        max_latency_ns (int): これまでで最も時間のかかった判断 (ナノ秒)
+        decisions (int): 判断の回数
+
+    Examples:
+        >>> import distance
+        >>> from config import Parameters
+        >>> from game import Game
+        >>> distance.oracle_cache_dir = None  # 距離の表をディスクに保存しない
+        >>> game = Game(Parameters(enemy_num=0, food_num=3, seed=0),
+        ...             headless=True)
+        >>> game.play(AutopilotPolicy(), max_ticks=100)
+        'Game Clear!'
+    """
+
+    def __init__(self, budget_ns: int = 1_000_000) -> None:
+        """
+        Args:
+            budget_ns (int): 1回の判断の時間の予算 (ナノ秒)
+        """
+        self.budget_ns = budget_ns
+        self.overruns = 0
+        self.max_latency_ns = 0
+        self.decisions = 0
+        self._field = None
+
+    def reset(self, game: 'Game') -> None:
+        field = game.field
+        self._field = field
+        self.f_size = field.f_size
+        self.neighbors = field.neighbors
+        import numpy as np  # numpyは自動操作を使うときまで読み込まない
+        # 食べ物ごとの距離場 [食べ物, マス] (食べ物は動かないのでゲーム中は変わらない)
+        self._food_fields = np.full(
+            (len(game.foods), self.f_size * self.f_size), UNREACHABLE,
+            dtype=np.uint16)
+        oracle = distance_oracle(field)
+        for i, food in enumerate(game.foods):
+            if oracle is not None:
+                self._food_fields[i] = oracle.field(food.get_pos())
+            else:
+                self._food_fields[i] = bfs_distances(
+                    field.wall_map, field.f_size, food.get_pos(),
+                    neighbors=self.neighbors)
+        self._alive: tuple[bool, ...] = ()
+        self._dist: list[int] = []
+
+    def _update_distances(self, game: 'Game') -> list[int]:
+        """残っている食べ物までの距離場を返す
+        食べ物の状態が変わったときだけ，残りの食べ物の距離場の最小値を取り直す．
+
+        Args:
+            game (Game): 実行中のゲーム
+
+        Returns:
+            list[int]: 最も近い残っている食べ物までの距離 [y * f_size + x]
+        """
+        alive = tuple(food.status for food in game.foods)
+        if alive != self._alive:
+            import numpy as np
+            fields = self._food_fields[np.array(alive, dtype=bool)]
+            if len(fields):
+                self._dist = fields.min(axis=0).tolist()
+            else:
+                self._dist = [UNREACHABLE] * self._food_fields.shape[1]
+            self._alive = alive
+        return self._dist
+
+    def __call__(self, game: 'Game', player: Player) -> tuple[int, int]:
+        start = time.perf_counter_ns()
+        if game.field is not self._field:
+            self.reset(game)  # resetやrestoreでFieldが作り直された
+        f = self.f_size
+        dist = self._update_distances(game)
+        # 次のターンに敵が入れるマス
+        danger = set()
+        for enemy in game.enemies:
+            cell = enemy.now_y * f + enemy.now_x
+            danger.add(cell)
+            danger.update(self.neighbors[cell])
+        cell = player.now_y * f + player.now_x
+        best, best_key = cell, (cell in danger, dist[cell])
+        for nxt in self.neighbors[cell]:
+            key = (nxt in danger, dist[nxt])
+            if key < best_key:
+                best, best_key = nxt, key
+        elapsed = time.perf_counter_ns() - start
+        self.decisions += 1
+        if elapsed > self.max_latency_ns:
+            self.max_latency_ns = elapsed
+        if elapsed > self.budget_ns:
+            self.overruns += 1
+        return (best % f - player.now_x, best // f - player.now_y)
+
+
+POLICIES: dict[str, type[Policy]] = {
+    "random": RandomPolicy,
+    "greedy": GreedyPolicy,
+    "autopilot": AutopilotPolicy,
+}
+
+
+def make_policy(name: str, seed: int | None = None) -> Policy:
+    """名前から操作方針のインスタンスを作る
+
+    Args:
+        name (str): 操作方針の名前 (`POLICIES` のキー)
+        seed (int | None): 乱数を使う操作方針に渡すシード
+
+    Returns:
+        Policy: 操作方針のインスタンス
+
+    Examples:
+        >>> type(make_policy("greedy")).__name__
+        'GreedyPolicy'
+    """
+    if name not in POLICIES:
+        raise ValueError(
+            f"unknown policy: {name} (choose from {list(POLICIES)})")
+    cls = POLICIES[name]
+    if cls is RandomPolicy:
+        return cls(seed)
+    return cls()
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,208 @@
+"""メインループの処理ごとの時間計測
+`Game.start` と `Game.step` の各処理 (入力，敵の行動決定，ブロックとの衝突，
+敵・食べ物との衝突，フィールドの更新，描画) にかかった時間を計測するモジュール．
+時間は処理ごとに2のべき乗の幅の区間を持つ固定長のヒストグラムに数えるため，
+ターンごとにリストや辞書を作らない．
+一定ターンごとに直近の分布を `log.log` (DEBUGレベル) に書き出し，
+ゲーム終了時に全体の要約をINFOレベルで出力する．
+
+`Parameters.profile` がFalseの場合はプロファイラを作らず，
+各処理の前後では `profiler is not None` の判定だけを行う．
+"""
+from __future__ import annotations
+import logging
+import time
+from array import array
+
+
+logger = logging.getLogger(__name__)
+
+# 計測する処理の名前と番号
+PHASES = (
+    "input", "enemy_ai", "block_collision",
+    "enemy_food_collision", "update_field", "render")
+INPUT, ENEMY_AI, BLOCK_COLLISION, ENEMY_FOOD_COLLISION, UPDATE_FIELD, \
+    RENDER = range(len(PHASES))
+N_BUCKETS = 40  # 区間bは [2^(b-1), 2^b) ナノ秒．最後の区間は約9分以上をまとめる
+
+
+class PhaseProfiler:
+    """処理ごとの時間のヒストグラムを集計するクラス
+
+    Attributes:
+        flush_interval (int): 直近の分布をログに書き出す間隔 (ターン数)
+        ticks (int): 計測したターン数
+
+    Examples:
+        >>> profiler = PhaseProfiler(flush_interval=0)
+        >>> t = profiler.lap(INPUT, profiler.clock() - 3000)
+        >>> profiler.count(INPUT), profiler.total_ns(INPUT) >= 3000
+        (1, True)
+        >>> profiler.percentile_ns(INPUT, 0.5) >= 3000
+        True
+    """
+
+    clock = staticmethod(time.perf_counter_ns)
+
+    def __init__(self, flush_interval: int = 100) -> None:
+        """
+        Args:
+            flush_interval (int): 直近の分布をログに書き出す間隔 (ターン数)．
+                0の場合は書き出さない
+        """
+        n = len(PHASES) * N_BUCKETS
+        self.flush_interval = flush_interval
+        self.ticks = 0
+        # [処理 * N_BUCKETS + 区間] の回数．直近の分と全体の分
+        self._window = array("Q", bytes(8 * n))
+        self._hist = array("Q", bytes(8 * n))
+        self._total = array("Q", bytes(8 * len(PHASES)))
+        self._max = array("Q", bytes(8 * len(PHASES)))
+
+    def lap(self, phase: int, start: int) -> int:
+        """startからの経過時間をphaseの時間として記録する
+
+        Args:
+            phase (int): 処理の番号 (`PHASES` の添字)
+            start (int): 処理を始めた時刻 (`clock` の値)
+
+        Returns:
+            int: 現在の時刻．次の処理の開始時刻として使う
+        """
+        now = time.perf_counter_ns()
+        ns = now - start
+        bucket = ns.bit_length()
+        if bucket >= N_BUCKETS:
+            bucket = N_BUCKETS - 1
+        self._window[phase * N_BUCKETS + bucket] += 1
+        self._total[phase] += ns
+        if ns > self._max[phase]:
+            self._max[phase] = ns
+        return now
+
+    def end_tick(self) -> None:
+        """1ターンの終わりに呼び出し，一定ターンごとに直近の分布を書き出す"""
+        self.ticks += 1
+        if self.flush_interval and self.ticks % self.flush_interval == 0:
+            self.flush()
+
+    def _merge(self) -> None:
+        """直近の分布を全体の分布に足し，直近の分布を0に戻す"""
+        window, hist = self._window, self._hist
+        for i in range(len(window)):
+            if window[i]:
+                hist[i] += window[i]
+                window[i] = 0
+
+    def _histogram_line(self, counts: array, phase: int) -> str:
+        """1つの処理の0でない区間を `<上限>:<回数>` の形で並べた文字列を返す"""
+        base = phase * N_BUCKETS
+        return " ".join(
+            f"<{_format_ns(1 << b)}:{counts[base + b]}"
+            for b in range(N_BUCKETS) if counts[base + b])
+
+    def flush(self) -> None:
+        """直近の分布をDEBUGレベルでログに書き出す"""
+        if logger.isEnabledFor(logging.DEBUG):
+            for phase, name in enumerate(PHASES):
+                line = self._histogram_line(self._window, phase)
+                if line:
+                    logger.debug(f"tick {self.ticks} {name}: {line}")
+        self._merge()
+
+    def count(self, phase: int) -> int:
+        """phaseを計測した回数を返す
+
+        Args:
+            phase (int): 処理の番号
+
+        Returns:
+            int: 回数
+        """
+        base = phase * N_BUCKETS
+        return sum(self._hist[base:base + N_BUCKETS]) \
+            + sum(self._window[base:base + N_BUCKETS])
+
+    def total_ns(self, phase: int) -> int:
+        """phaseにかかった時間の合計を返す
+
+        Args:
+            phase (int): 処理の番号
+
+        Returns:
+            int: 合計時間 (ナノ秒)
+        """
+        return self._total[phase]
+
+    def percentile_ns(self, phase: int, q: float) -> int:
+        """phaseの時間の分位点 (区間の上限) を返す
+
+        Args:
+            phase (int): 処理の番号
+            q (float): 0から1の割合 (0.5で中央値)
+
+        Returns:
+            int: 分位点が含まれる区間の上限 (ナノ秒)．計測していなければ0
+        """
+        self._merge()
+        base = phase * N_BUCKETS
+        n = self.count(phase)
+        seen = 0
+        for b in range(N_BUCKETS):
+            seen += self._hist[base + b]
+            if n and seen >= q * n:
+                return 1 << b
+        return 0
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        """処理ごとの回数，平均，中央値，99パーセンタイル，最大を返す
+
+        Returns:
+            dict[str, dict[str, float]]: 処理の名前ごとの要約 (時間はマイクロ秒)
+        """
+        result = {}
+        for phase, name in enumerate(PHASES):
+            n = self.count(phase)
+            if not n:
+                continue
+            result[name] = {
+                "count": n,
+                "mean_us": self._total[phase] / n / 1e3,
+                "p50_us": self.percentile_ns(phase, 0.5) / 1e3,
+                "p99_us": self.percentile_ns(phase, 0.99) / 1e3,
+                "max_us": self._max[phase] / 1e3,
+            }
+        return result
+
+    def log_summary(self) -> None:
+        """全体の要約をINFOレベルでログに出力する"""
+        self.flush()
+        logger.info(
+            f"profile of {self.ticks} ticks "
+            "(p50/p99 are upper bounds of power-of-2 buckets)")
+        for name, s in self.summary().items():
+            logger.info(
+                f"  {name:<20} n={s['count']:<6} mean={s['mean_us']:.1f}us "
+                f"p50<{s['p50_us']:.1f}us p99<{s['p99_us']:.1f}us "
+                f"max={s['max_us']:.1f}us")
+
+
+def _format_ns(ns: int) -> str:
+    """ナノ秒を読みやすい単位の文字列にする
+
+    Examples:
+        >>> _format_ns(512), _format_ns(32768), _format_ns(1 << 22)
+        ('512ns', '33us', '4.2ms')
+    """
+    if ns < 1000:
+        return f"{ns}ns"
+    if ns < 1000_000:
+        return f"{ns / 1e3:.2g}us" if ns < 10_000 else f"{ns / 1e3:.0f}us"
+    if ns < 1000_000_000:
+        return f"{ns / 1e6:.2g}ms" if ns < 10_000_000 else f"{ns / 1e6:.0f}ms"
+    return f"{ns / 1e9:.1f}s"
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
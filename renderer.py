@@ -0,0 +1,138 @@
+"""ターミナル描画
+前回描画したフレームを保持し，変化したマスだけをANSIエスケープシーケンスで
+書き換えるモジュール．1フレーム分の出力は1回のwriteでまとめて書き出す．
+"""
+import sys
+import unicodedata
+from typing import TextIO
+
+
+CELL_WIDTH = 2  # 1マスの表示幅 (絵文字と全角空白は2桁)
+HELP_LINES = (
+    "w: 上に移動",
+    "a: 左に移動",
+    "s: 下に移動",
+    "d: 右に移動",
+)
+
+
+def display_width(text: str) -> int:
+    """文字列をターミナルに表示したときの桁数を返す
+
+    Args:
+        text (str): 文字列
+
+    Returns:
+        int: 表示桁数 (全角・絵文字は2，結合文字や異体字セレクタは0)
+
+    Examples:
+        >>> display_width("👻"), display_width("　"), display_width("p1")
+        (2, 2, 2)
+    """
+    width = 0
+    for ch in text:
+        if unicodedata.combining(ch) or unicodedata.category(ch) in (
+                "Mn", "Me", "Cf"):
+            continue  # 結合文字，異体字セレクタ，ZWJなど
+        width += 2 if unicodedata.east_asian_width(ch) in ("W", "F") else 1
+    return width
+
+
+def fit_cell(glyph: str) -> str:
+    """アイコンの後ろを空白で埋めてちょうど1マス分の幅にする
+
+    Args:
+        glyph (str): アイコン
+
+    Returns:
+        str: 1マス分の幅の文字列
+
+    Examples:
+        >>> fit_cell("a"), fit_cell("🍒")
+        ('a ', '🍒')
+    """
+    return glyph + " " * max(0, CELL_WIDTH - display_width(glyph))
+
+
+class TerminalRenderer:
+    """差分描画を行うクラス
+    最初のフレームでは画面を消去して操作説明と全てのマスを描画し，
+    以降は前回と異なるマスだけにカーソルを移動して書き換える．
+
+    Attributes:
+        out (TextIO): 出力先
+        frames (int): 描画したフレーム数
+
+    Examples:
+        >>> import io
+        >>> out = io.StringIO()
+        >>> renderer = TerminalRenderer(out, help_lines=())
+        >>> renderer.render([["a", "b"], ["c", "d"]])
+        >>> out.getvalue()
+        '\\x1b[?25l\\x1b[2J\\x1b[H\\x1b[1;1Ha b \\x1b[2;1Hc d \\x1b[3;1H'
+        >>> _ = out.seek(0), out.truncate()
+        >>> renderer.render([["a", "b"], ["e", "d"]])
+        >>> out.getvalue()
+        '\\x1b[2;1He \\x1b[3;1H'
+    """
+
+    def __init__(
+            self,
+            out: TextIO | None = None,
+            help_lines: tuple[str, ...] = HELP_LINES) -> None:
+        """
+        Args:
+            out (TextIO | None): 出力先．Noneの場合は標準出力
+            help_lines (tuple[str, ...]): フィールドの上に一度だけ表示する説明
+        """
+        self.out = out if out is not None else sys.stdout
+        self.help_lines = help_lines
+        self.frames = 0
+        self._prev: list[list[str | None]] | None = None
+
+    def render(self, field: list[list[str]]) -> None:
+        """フィールドを描画する
+
+        Args:
+            field (list[list[str]]): 各マスのアイコン (`Field.field`)
+        """
+        buf = []
+        prev = self._prev
+        if prev is None or len(prev) != len(field) \
+                or any(len(p) != len(r) for p, r in zip(prev, field)):
+            # 初回 (または大きさが変わった場合) は画面を消去して説明を描く
+            buf.append("\x1b[?25l\x1b[2J\x1b[H")
+            for line in self.help_lines:
+                buf.append(line + "\n")
+            prev = [[None] * len(row) for row in field]
+            self._prev = prev
+        top = len(self.help_lines) + 1  # フィールドの1行目の行番号 (1始まり)
+        for y, row in enumerate(field):
+            prev_row = prev[y]
+            if prev_row == row:
+                continue
+            next_x = -1  # カーソルが今いるマス (連続するマスは移動を省略する)
+            for x, glyph in enumerate(row):
+                if prev_row[x] == glyph:
+                    continue
+                if x != next_x:
+                    buf.append(f"\x1b[{top + y};{x * CELL_WIDTH + 1}H")
+                buf.append(fit_cell(glyph))
+                prev_row[x] = glyph
+                next_x = x + 1
+        if buf:
+            # カーソルをフィールドの下に置き，ログなどがフィールドに重ならないようにする
+            buf.append(f"\x1b[{top + len(field)};1H")
+            self.out.write("".join(buf))
+            self.out.flush()
+        self.frames += 1
+
+    def close(self) -> None:
+        """カーソルの表示を元に戻す"""
+        self.out.write("\x1b[?25h")
+        self.out.flush()
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
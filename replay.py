@@ -0,0 +1,300 @@
+"""リプレイの記録と再生
+ゲームをパラメータとシードのヘッダと，1ターン1バイトの入力列として記録する．
+一定ターンごとにキーフレーム (その時点の状態) も記録し，
+読み込み時は `mmap` でファイルを開いて任意のターンから高速に再シミュレーションする．
+
+ファイルの構成 (整数は全てリトルエンディアン):
+    ヘッダ  : MAGIC(4) version(u16) reserved(u16) json_len(u32) interval(u32)
+              + パラメータとシードのJSON
+    ブロック: キーフレーム (ターン0, interval, 2*interval, ... の状態，固定長) と
+              その後のintervalターン分の入力 (1ターン1バイトの方向コード，
+              `DIRECTIONS` の添字) の繰り返し．最後のブロックは途中で終わってよい
+    フッタ  : n_ticks(u64) reserved(u64) MAGIC(4)
+
+ブロックは記録しながら書き出すため，途中で異常終了してフッタがないファイルも
+ブロックの長さからターン数を求めて読める．
+"""
+from __future__ import annotations
+import json
+import mmap
+import struct
+from array import array
+from dataclasses import asdict
+from config import Parameters
+from game import Game
+from game import GameSnapshot
+from player import Player
+
+
+MAGIC = b"PMRP"
+VERSION = 2
+# 方向コードと移動方向の対応 (0: 停止, 1: w, 2: a, 3: s, 4: d)
+DIRECTIONS = ((0, 0), (0, -1), (-1, 0), (0, 1), (1, 0))
+DIRECTION_CODES = {d: i for i, d in enumerate(DIRECTIONS)}
+
+_HEADER = struct.Struct("<4sHHII")
+_FOOTER = struct.Struct("<QQ4s")
+_KEYFRAME = struct.Struct("<IQI")  # tick, 乱数の状態, 食べた数
+
+
+def _pack_keyframe(snap: GameSnapshot) -> bytes:
+    """ゲームの状態をキーフレームのバイト列にする
+
+    Args:
+        snap (GameSnapshot): `Game.snapshot` で保存した状態
+
+    Returns:
+        bytes: ターン数，乱数の状態，食べた数，プレイヤーと敵の座標，食べ物の状態
+    """
+    pos = array("i", snap.xs + snap.ys)
+    alive = bytes(snap.food_status)
+    head = _KEYFRAME.pack(snap.tick, snap.rng_state, snap.food_eaten)
+    return head + pos.tobytes() + alive
+
+
+def _unpack_keyframe(
+        buf: bytes,
+        n_players: int,
+        n_movers: int) -> GameSnapshot:
+    """キーフレームのバイト列を `Game.restore` で戻せる状態にする
+
+    Args:
+        buf (bytes): `_pack_keyframe` で作ったバイト列
+        n_players (int): プレイヤーの数
+        n_movers (int): プレイヤーと敵の数の合計
+
+    Returns:
+        GameSnapshot: キーフレームの状態 (ゲームは実行中)
+    """
+    tick, rng_state, food_eaten = _KEYFRAME.unpack_from(buf)
+    end = _KEYFRAME.size + 8 * n_movers
+    pos = array("i", buf[_KEYFRAME.size:end])
+    return GameSnapshot(
+        tick, rng_state, food_eaten, None,
+        tuple(pos[:n_movers]), tuple(pos[n_movers:]),
+        tuple(bool(alive) for alive in buf[end:]),
+        (Player.ICON,) * n_players)
+
+
+class ReplayWriter:
+    """リプレイを記録するクラス
+    `Game.recorder` に設定すると，`Game.step` のたびに入力が記録される．
+
+    Attributes:
+        path (str): 出力先のファイル
+        keyframe_interval (int): キーフレームを記録する間隔 (ターン数)
+        n_ticks (int): 記録したターン数
+
+    Examples:
+        >>> import os, tempfile
+        >>> path = os.path.join(tempfile.mkdtemp(), "game.replay")
+        >>> game = Game(Parameters(seed=3), headless=True)
+        >>> with ReplayWriter(path, game) as game.recorder:
+        ...     for action in [(1, 0), (0, 1), (0, 0)]:
+        ...         if game.result is None:
+        ...             _ = game.step(action)
+        >>> with ReplayReader(path) as replay:
+        ...     replay.seed, replay.n_ticks == game.tick
+        (3, True)
+        >>> game.recorder = None
+        >>> _ = game.reset()
+        >>> with ReplayWriter(path, game) as writer:
+        ...     writer.record(game, (1, 1))
+        Traceback (most recent call last):
+        ...
+        ValueError: invalid action: (1, 1) (choose from w, a, s, d or stay)
+    """
+
+    def __init__(
+            self,
+            path: str,
+            game: Game,
+            keyframe_interval: int = 256) -> None:
+        """
+        Args:
+            path (str): 出力先のファイル
+            game (Game): 記録するゲーム (reset直後であること)
+            keyframe_interval (int): キーフレームを記録する間隔 (ターン数)
+        """
+        if keyframe_interval < 1:
+            raise ValueError("keyframe_interval must be positive")
+        self.path = path
+        self.keyframe_interval = keyframe_interval
+        self.n_ticks = 0
+        header = json.dumps({
+            "params": asdict(game.params),
+            "seed": game.seed,
+        }).encode()
+        self._f = open(path, "wb")
+        self._f.write(_HEADER.pack(
+            MAGIC, VERSION, 0, len(header), keyframe_interval))
+        self._f.write(header)
+
+    def record(self, game: Game, action: tuple[int, int]) -> None:
+        """1ターン分の入力を記録する (`Game.step` から呼ばれる)
+
+        Args:
+            game (Game): 記録中のゲーム (入力を適用する前の状態)
+            action (tuple[int, int]): プレイヤーの移動方向
+        """
+        code = DIRECTION_CODES.get(tuple(action))
+        if code is None:
+            raise ValueError(
+                f"invalid action: {tuple(action)} "
+                "(choose from w, a, s, d or stay)")
+        if self.n_ticks % self.keyframe_interval == 0:
+            # 前のブロックまでは異常終了しても残るよう書き出しておく
+            self._f.flush()
+            self._f.write(_pack_keyframe(game.snapshot()))
+        self._f.write(bytes((code,)))
+        self.n_ticks += 1
+
+    def close(self) -> None:
+        """フッタを書き込んでファイルを閉じる"""
+        if self._f.closed:
+            return
+        self._f.write(_FOOTER.pack(self.n_ticks, 0, MAGIC))
+        self._f.close()
+
+    def __enter__(self) -> ReplayWriter:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class ReplayReader:
+    """リプレイを読み込んで再シミュレーションするクラス
+
+    Attributes:
+        params (Parameters): 記録したゲームのパラメータ
+        seed (int): 記録したゲームのシード
+        n_ticks (int): 記録されたターン数
+        keyframe_interval (int): キーフレームの間隔
+        complete (bool): フッタまで書かれていたか．Falseの場合は異常終了した記録で，
+            書き出されていたブロックまでを読む
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+        Args:
+            path (str): リプレイファイル
+        """
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _, json_len, interval = _HEADER.unpack_from(self._mm)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(
+                f"{path} is not a replay file (version {VERSION})")
+        header = json.loads(
+            self._mm[_HEADER.size:_HEADER.size + json_len])
+        self.params = Parameters(**header["params"])
+        self.seed = header["seed"]
+        self.keyframe_interval = interval
+        self._blocks_offset = _HEADER.size + json_len
+        self._game = Game(self.params, headless=True)
+        self._game.reset(self.seed)
+        self._n_movers = len(self._game.players) + len(self._game.enemies)
+        self._keyframe_size = (
+            _KEYFRAME.size + 8 * self._n_movers + len(self._game.foods))
+        self._block_size = self._keyframe_size + interval
+        self.n_ticks, self.complete = self._count_ticks()
+
+    def _count_ticks(self) -> tuple[int, bool]:
+        """記録されたターン数とフッタがあるかを返す
+        フッタがない (またはブロックの長さと合わない) 場合は，
+        書き出されていたブロックの長さからターン数を求める．
+        """
+        size = len(self._mm)
+        if size >= self._blocks_offset + _FOOTER.size:
+            n_ticks, _, magic = _FOOTER.unpack_from(
+                self._mm, size - _FOOTER.size)
+            if magic == MAGIC and \
+                    self._ticks_end(n_ticks) + _FOOTER.size == size:
+                return n_ticks, True
+        # 最後のキーフレームが途中までしかない場合はその前のブロックまで
+        blocks, rest = divmod(size - self._blocks_offset, self._block_size)
+        return (blocks * self.keyframe_interval
+                + max(0, rest - self._keyframe_size)), False
+
+    def _ticks_end(self, n_ticks: int) -> int:
+        """n_ticksターン分のブロックの終わりの位置を返す"""
+        if n_ticks == 0:
+            return self._blocks_offset
+        blocks = (n_ticks - 1) // self.keyframe_interval
+        return (self._blocks_offset + blocks * self._block_size
+                + self._keyframe_size
+                + n_ticks - blocks * self.keyframe_interval)
+
+    def _tick_offset(self, tick: int) -> int:
+        """指定したターンの入力の位置を返す"""
+        block, i = divmod(tick, self.keyframe_interval)
+        return (self._blocks_offset + block * self._block_size
+                + self._keyframe_size + i)
+
+    def action(self, tick: int) -> tuple[int, int]:
+        """指定したターンの入力を返す
+
+        Args:
+            tick (int): ターン (0始まり)
+
+        Returns:
+            tuple[int, int]: プレイヤーの移動方向
+        """
+        if not 0 <= tick < self.n_ticks:
+            raise IndexError(f"tick {tick} is out of range")
+        return DIRECTIONS[self._mm[self._tick_offset(tick)]]
+
+    def game_at(self, tick: int) -> Game:
+        """指定したターン数だけ進めた時点のゲームを返す
+        直前のキーフレームから再シミュレーションするため，
+        かかる時間はキーフレームの間隔に比例する．
+        返すゲームは読み込みごとに使い回す．
+
+        Args:
+            tick (int): 0以上n_ticks以下のターン数
+
+        Returns:
+            Game: 指定したターンの状態のゲーム
+        """
+        if not 0 <= tick <= self.n_ticks:
+            raise IndexError(f"tick {tick} is out of range")
+        k = min(tick // self.keyframe_interval,
+                (self.n_ticks - 1) // self.keyframe_interval) \
+            if self.n_ticks else 0
+        game = self._game
+        if self.n_ticks:
+            offset = self._blocks_offset + k * self._block_size
+            game.restore(_unpack_keyframe(
+                self._mm[offset:offset + self._keyframe_size],
+                len(game.players), self._n_movers))
+        else:
+            game.reset(self.seed)
+        # キーフレームからのターンの入力は同じブロックに並んでいる
+        start = self._tick_offset(game.tick)
+        for code in self._mm[start:start + tick - game.tick]:
+            game.step(DIRECTIONS[code])
+        return game
+
+    def replay(self) -> Game:
+        """最後まで再シミュレーションしたゲームを返す
+
+        Returns:
+            Game: 記録の最後の状態のゲーム
+        """
+        return self.game_at(self.n_ticks)
+
+    def close(self) -> None:
+        """ファイルを閉じる"""
+        self._mm.close()
+
+    def __enter__(self) -> ReplayReader:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,381 @@
+"""複数のゲームを同時に進めるサーバー
+1つのプロセスのasyncioのイベントループ上で，接続ごとに1つのゲーム (セッション) を持ち，
+全てのセッションを1つのスケジューラで `tick_interval` ごとに1ターンずつ進める．
+接続ごとにスレッドやタスクを作らないため，数千の接続でも動く．
+接続はUnixドメインソケットまたはlocalhostのTCPで受け付ける．
+
+プロトコル (1行1メッセージのテキスト):
+    サーバー → クライアント
+        H <セッション番号> <シード> <フィールドのサイズ>   接続直後に1回
+        T <ターン> <x> <y> <残りの食べ物の数>            ターンごと (プレイヤーの位置)
+        E <ターン> <結果>                                 ゲーム終了時 (その後切断する)
+    クライアント → サーバー
+        w, a, s, d の1バイト (改行などそれ以外のバイトは無視)．
+        次のターンでは前のターンから最後に送られたキーを使う．
+
+    python server.py --unix /tmp/pacman.sock
+    python server.py --unix /tmp/pacman.sock --bots 1000  # 負荷試験用のクライアント
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import logging
+import os
+from config import Parameters
+from config import common_args
+from controller import KEY_DIRECTIONS
+from game import Game
+from game_random import GameRandom
+from utils import dump_params
+from utils import make_result_dir
+from utils import set_logging
+from utils import setup_params
+
+
+logger = logging.getLogger(__name__)
+
+# 送られたバイトと移動方向の対応
+BYTE_DIRECTIONS = {ord(key): d for key, d in KEY_DIRECTIONS.items()}
+MAX_BUFFERED = 64 * 1024  # これ以上送信がたまったクライアントは切断する
+BACKLOG = 4096  # 一度に大量のクライアントが接続しても拒否しないようにする
+
+
+class Session(asyncio.Protocol):
+    """1つの接続と，そのゲーム
+
+    Attributes:
+        session_id (int): セッション番号
+        game (Game): このセッションのゲーム
+        key (tuple[int, int]): 前のターンから最後に送られたキーの方向
+    """
+
+    def __init__(self, server: GameServer) -> None:
+        """
+        Args:
+            server (GameServer): セッションを管理するサーバー
+        """
+        self.server = server
+        self.session_id = -1
+        self.game: Game | None = None
+        self.key = (0, 0)
+        self.transport: asyncio.Transport | None = None
+
+    def connection_made(self, transport: asyncio.Transport) -> None:
+        self.transport = transport
+        self.server.open_session(self)
+
+    def data_received(self, data: bytes) -> None:
+        # 最後の移動キーだけを覚える
+        for byte in reversed(data):
+            direction = BYTE_DIRECTIONS.get(byte)
+            if direction is not None:
+                self.key = direction
+                break
+
+    def connection_lost(self, exc: Exception | None) -> None:
+        self.server.close_session(self)
+
+    def send(self, line: str) -> None:
+        """1行送る (送信がたまりすぎたクライアントは切断する)
+
+        Args:
+            line (str): 改行を含まないメッセージ
+        """
+        transport = self.transport
+        if transport is None or transport.is_closing():
+            return
+        if transport.get_write_buffer_size() > MAX_BUFFERED:
+            logger.warning(f"session {self.session_id}: too slow, closing")
+            transport.abort()
+            return
+        transport.write(line.encode() + b"\n")
+
+
+class GameServer:
+    """全てのセッションを1つのスケジューラで進めるサーバー
+
+    Attributes:
+        params (Parameters): 全てのゲームで共通のパラメータ
+        interval (float): 1ターンの長さ (秒)
+        sessions (dict[int, Session]): 接続中のセッション
+        ticks (int): スケジューラが進めたターン数
+        missed (int): 予定時刻に間に合わなかったターンの数
+        opened (int): 開いたセッションの数
+        closed (int): 閉じたセッションの数 (ゲームの終了と切断)
+        finished (int): 終了したゲームの数
+    """
+
+    def __init__(
+            self,
+            params: Parameters,
+            base_seed: int | None = None) -> None:
+        """
+        Args:
+            params (Parameters): 全てのゲームで共通のパラメータ
+            base_seed (int | None): セッションnのシードを base_seed + n とする．
+                Noneの場合は `params.seed`，それもNoneなら毎回異なるシード
+        """
+        self.params = params
+        self.interval = params.tick_interval
+        if base_seed is None:
+            base_seed = params.seed
+        if base_seed is None:
+            base_seed = GameRandom().seed
+        self.base_seed = base_seed
+        self.sessions: dict[int, Session] = {}
+        self.ticks = 0
+        self.missed = 0
+        self.opened = 0
+        self.closed = 0
+        self.finished = 0
+        self._servers: list[asyncio.AbstractServer] = []
+        self._scheduler: asyncio.Task | None = None
+
+    def open_session(self, session: Session) -> None:
+        """接続されたセッションのゲームを作り，挨拶を送る
+
+        Args:
+            session (Session): 接続されたセッション
+        """
+        session.session_id = self.opened
+        self.opened += 1
+        seed = self.base_seed + session.session_id
+        session.game = Game(self.params, headless=True)
+        session.game.reset(seed)
+        self.sessions[session.session_id] = session
+        session.send(
+            f"H {session.session_id} {seed} {session.game.field.f_size}")
+
+    def close_session(self, session: Session) -> None:
+        """切断されたセッションを取り除く
+
+        Args:
+            session (Session): 切断されたセッション
+        """
+        if self.sessions.pop(session.session_id, None) is not None:
+            self.closed += 1
+
+    def tick(self) -> None:
+        """全てのセッションを1ターン進め，状態を送る"""
+        for session in list(self.sessions.values()):
+            game = session.game
+            action, session.key = session.key, (0, 0)
+            _, _, done, info = game.step(action)
+            player = game.players[0]
+            session.send(
+                f"T {game.tick} {player.now_x} {player.now_y} "
+                f"{len(game.foods) - game.food_eaten}")
+            if done:
+                session.send(f"E {game.tick} {info['result']}")
+                self.finished += 1
+                self.close_session(session)
+                session.transport.close()
+        self.ticks += 1
+
+    async def _run_scheduler(self) -> None:
+        """`interval` ごとに `tick` を呼ぶ (遅れた場合は取り戻さない)"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time()
+        while True:
+            self.tick()
+            deadline += self.interval
+            delay = deadline - loop.time()
+            if delay < 0:
+                self.missed += 1
+                logger.debug(
+                    f"tick {self.ticks} missed deadline by "
+                    f"{-delay * 1e3:.1f} ms ({len(self.sessions)} sessions)")
+                deadline = loop.time()
+                delay = 0
+            await asyncio.sleep(delay)
+
+    def _start_scheduler(self) -> None:
+        if self._scheduler is None:
+            self._scheduler = asyncio.get_running_loop().create_task(
+                self._run_scheduler())
+
+    async def start_unix(self, path: str) -> None:
+        """Unixドメインソケットで接続を受け付ける
+
+        Args:
+            path (str): ソケットのパス (既にあれば置き換える)
+        """
+        if os.path.exists(path):
+            os.unlink(path)
+        loop = asyncio.get_running_loop()
+        self._servers.append(
+            await loop.create_unix_server(
+                lambda: Session(self), path, backlog=BACKLOG))
+        self._start_scheduler()
+        logger.info(f"listening on {path}")
+
+    async def start_tcp(self, port: int, host: str = "127.0.0.1") -> int:
+        """localhostのTCPで接続を受け付ける
+
+        Args:
+            port (int): ポート番号 (0の場合は空いているポート)
+            host (str): 待ち受けるアドレス
+
+        Returns:
+            int: 待ち受けているポート番号
+        """
+        loop = asyncio.get_running_loop()
+        server = await loop.create_server(
+            lambda: Session(self), host, port, backlog=BACKLOG)
+        self._servers.append(server)
+        self._start_scheduler()
+        port = server.sockets[0].getsockname()[1]
+        logger.info(f"listening on {host}:{port}")
+        return port
+
+    async def stop(self) -> None:
+        """接続の受付とスケジューラを止め，全てのセッションを切断する"""
+        for server in self._servers:
+            server.close()
+        if self._scheduler is not None:
+            self._scheduler.cancel()
+            try:
+                await self._scheduler
+            except asyncio.CancelledError:
+                pass
+            self._scheduler = None
+        for session in list(self.sessions.values()):
+            self.close_session(session)
+            session.transport.close()
+        for server in self._servers:
+            await server.wait_closed()
+        self._servers.clear()
+
+
+async def _bot(
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+        rng: GameRandom,
+        max_ticks: int) -> tuple[str | None, int]:
+    """ランダムにキーを送るクライアント
+
+    Returns:
+        tuple[str | None, int]: (ゲームの結果, 受け取ったターン数)．
+            max_ticksで打ち切った場合の結果はNone
+    """
+    keys = b"wasd"
+    ticks = 0
+    result = None
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            kind, _, rest = line.decode().rstrip("\n").partition(" ")
+            if kind == "T":
+                ticks += 1
+                if ticks >= max_ticks:
+                    break
+                i = rng.randint(0, 3)
+                writer.write(keys[i:i + 1])
+            elif kind == "E":
+                result = rest.partition(" ")[2]
+                break
+    finally:
+        writer.close()
+    return result, ticks
+
+
+async def run_bots(
+        n: int,
+        path: str | None = None,
+        port: int | None = None,
+        host: str = "127.0.0.1",
+        max_ticks: int = 1000,
+        seed: int = 0) -> dict:
+    """負荷試験用に，ランダムにキーを送るクライアントをn個同時に接続する
+
+    Args:
+        n (int): クライアントの数
+        path (str | None): Unixドメインソケットのパス
+        port (int | None): TCPのポート番号 (pathを指定しない場合)
+        host (str): TCPのアドレス
+        max_ticks (int): クライアントごとに打ち切るターン数
+        seed (int): キーを選ぶ乱数のシード
+
+    Returns:
+        dict: 終了したゲーム数，結果ごとの数，受け取ったターン数の合計，かかった時間
+    """
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+
+    async def one(i: int) -> tuple[str | None, int]:
+        if path is not None:
+            reader, writer = await asyncio.open_unix_connection(path)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        return await _bot(reader, writer, GameRandom(seed + i), max_ticks)
+
+    outcomes = await asyncio.gather(*(one(i) for i in range(n)))
+    results: dict[str, int] = {}
+    for result, _ in outcomes:
+        if result is not None:
+            results[result] = results.get(result, 0) + 1
+    return {
+        "bots": n,
+        "finished": sum(results.values()),
+        "results": results,
+        "ticks": sum(ticks for _, ticks in outcomes),
+        "elapsed_sec": loop.time() - start,
+    }
+
+
+def main() -> None:
+    # コマンドライン引数の設定
+    parser = argparse.ArgumentParser()
+    parser = common_args(parser)  # コマンドライン引数引数を読み込み
+    parser.add_argument(
+        "--unix", type=str, default=None, help="Unixドメインソケットのパス")
+    parser.add_argument(
+        "--port", type=int, default=None, help="localhostのTCPのポート番号")
+    parser.add_argument(
+        "--bots", type=int, default=None,
+        help="指定した場合はサーバーの代わりにこの数のクライアントを接続する")
+    parser.add_argument(
+        "--max-ticks", type=int, default=1000,
+        help="クライアントごとに打ち切るターン数")
+    args = parser.parse_args()
+    if args.unix is None and args.port is None:
+        parser.error("--unix or --port is required")
+    params = Parameters(**setup_params(vars(args), args.parameters))
+
+    # 結果出力用ファイルの作成
+    # 実行日時とプロセスIDを名前とするディレクトリを作成
+    result_dir = make_result_dir(params.run_date)  # 結果出力ディレクトリ
+    dump_params(params, f'{result_dir}')  # パラメータを出力
+    set_logging(result_dir)  # ログを標準出力とファイルに出力するよう設定
+
+    if args.bots is not None:
+        stats = asyncio.run(run_bots(
+            args.bots, args.unix, args.port, max_ticks=args.max_ticks))
+        logger.info(stats)
+        return
+
+    async def serve() -> None:
+        server = GameServer(params)
+        if args.unix is not None:
+            await server.start_unix(args.unix)
+        if args.port is not None:
+            await server.start_tcp(args.port)
+        try:
+            while True:
+                await asyncio.sleep(10)
+                logger.info(
+                    f"{len(server.sessions)} sessions, {server.ticks} ticks, "
+                    f"{server.missed} missed, {server.finished} finished")
+        finally:
+            await server.stop()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
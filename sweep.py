@@ -0,0 +1,346 @@
+"""パラメータのスイープ
+`Parameters` のフィールドの値の組み合わせ (グリッドまたはランダムサーチ) ごとに
+操作方針でゲームを複数プロセスで実行し，組み合わせごとの集計結果を出力する．
+
+各組み合わせの結果は，パラメータ・シード・操作方針・ゲーム数・Gitのリビジョンの
+ハッシュをキーとして `cache/sweep/` に保存する．同じスイープを再実行した場合や
+途中で中断したスイープを再開した場合は，計算済みの組み合わせを読み込んで飛ばし，
+新しい組み合わせだけを計算する．
+
+    python sweep.py --grid field_size=8,12,16 enemy_num=0,5,10 -g 200
+    python sweep.py --grid field_size=8,12,16 enemy_num=0,5,10 --random 4
+"""
+from __future__ import annotations
+import argparse
+import hashlib
+import itertools
+import json
+import logging
+import os
+import tempfile
+import time
+from dataclasses import asdict
+from dataclasses import fields
+from dataclasses import replace
+from multiprocessing import Pool
+from config import Parameters
+from config import common_args
+from game_random import GameRandom
+from policy import POLICIES
+from tournament import make_tasks
+from tournament import play_games
+from tournament import summarize
+from utils import dump_params
+from utils import make_result_dir
+from utils import set_logging
+from utils import setup_params
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = "cache/sweep"
+# ゲームの結果に影響しないフィールド (キーに含めない)．
+# seedは引数のシードを使い，git_revisionはキーに別に含める
+VOLATILE_FIELDS = (
+    "args", "run_date", "git_revision", "seed",
+    "tick_interval", "profile", "telemetry", "viewport_size")
+
+
+def expand_grid(space: dict[str, list]) -> list[dict]:
+    """全ての値の組み合わせを作る
+
+    Args:
+        space (dict[str, list]): フィールド名と値のリスト
+
+    Returns:
+        list[dict]: 組み合わせのリスト
+
+    Examples:
+        >>> expand_grid({"field_size": [8, 12], "enemy_num": [0, 5]})
+        ... # doctest: +NORMALIZE_WHITESPACE
+        [{'field_size': 8, 'enemy_num': 0},
+         {'field_size': 8, 'enemy_num': 5},
+         {'field_size': 12, 'enemy_num': 0},
+         {'field_size': 12, 'enemy_num': 5}]
+    """
+    names = list(space)
+    return [dict(zip(names, values))
+            for values in itertools.product(*(space[n] for n in names))]
+
+
+def sample_points(
+        space: dict[str, list],
+        n: int,
+        seed: int | None = None) -> list[dict]:
+    """値の組み合わせからランダムにn個選ぶ (重複なし)
+
+    Args:
+        space (dict[str, list]): フィールド名と値のリスト
+        n (int): 選ぶ数 (組み合わせの数より多い場合は全て)
+        seed (int | None): 乱数のシード
+
+    Returns:
+        list[dict]: 組み合わせのリスト
+
+    Examples:
+        >>> space = {"field_size": [8, 12, 16], "enemy_num": [0, 5, 10]}
+        >>> points = sample_points(space, 4, seed=0)
+        >>> len(points), points == sample_points(space, 4, seed=0)
+        (4, True)
+        >>> len({tuple(p.values()) for p in points})
+        4
+    """
+    grid = expand_grid(space)
+    rng = GameRandom(seed)
+    # 先頭からn個を部分的にシャッフルする
+    for i in range(min(n, len(grid))):
+        j = rng.randint(i, len(grid) - 1)
+        grid[i], grid[j] = grid[j], grid[i]
+    return grid[:n]
+
+
+def point_key(
+        params: Parameters,
+        seed: int,
+        n_games: int,
+        policy_name: str,
+        max_ticks: int) -> str:
+    """組み合わせの結果のキャッシュのキーを返す
+    結果に影響するパラメータ，シード，ゲーム数，操作方針，打ち切るターン数と
+    Gitのリビジョンのハッシュ．マップファイルはパスではなく内容のハッシュを含める．
+
+    Args:
+        params (Parameters): パラメータ
+        seed (int): 最初のゲームのシード
+        n_games (int): ゲーム数
+        policy_name (str): 操作方針の名前
+        max_ticks (int): 打ち切るターン数
+
+    Returns:
+        str: 16進数のハッシュ
+
+    Examples:
+        >>> key = lambda p: point_key(p, 0, 10, "greedy", 100)
+        >>> a = key(Parameters(enemy_num=5))
+        >>> a == key(Parameters(enemy_num=5, run_date="x"))  # 実行時刻は含めない
+        True
+        >>> a == key(Parameters(enemy_num=5, tick_interval=0.1))  # 表示の設定
+        True
+        >>> a == key(Parameters(enemy_num=5, git_revision="abc"))
+        False
+    """
+    values = asdict(params)
+    for name in VOLATILE_FIELDS:
+        del values[name]
+    if params.map_path:
+        # マップを書き換えたら計算し直し，同じ内容なら別のパスでも同じキーにする
+        from game_map import map_hash  # numpyを使うためマップがあるときだけ読み込む
+        with open(params.map_path, "rb") as f:
+            values["map_path"] = map_hash(f.read())
+    content = json.dumps({
+        "params": values,
+        "seed": seed,
+        "games": n_games,
+        "policy": policy_name,
+        "max_ticks": max_ticks,
+        "git_revision": params.git_revision,
+    }, sort_keys=True)
+    return hashlib.sha256(content.encode()).hexdigest()[:32]
+
+
+def _load_cached(cache_dir: str | None, key: str) -> dict | None:
+    """キャッシュから集計結果を読む (なければNone)"""
+    if cache_dir is None:
+        return None
+    path = os.path.join(cache_dir, f"{key}.json")
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def _save_cached(cache_dir: str | None, key: str, summary: dict) -> None:
+    """集計結果をキャッシュに保存する (一時ファイルに書いてから置き換える)"""
+    if cache_dir is None:
+        return
+    os.makedirs(cache_dir, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        json.dump(summary, f)
+    os.replace(tmp, os.path.join(cache_dir, f"{key}.json"))
+
+
+def _play_point(task: tuple[int, tuple]) -> tuple[int, list]:
+    """ワーカープロセスで組み合わせの番号付きのタスクを実行する"""
+    index, games = task
+    return index, play_games(games)
+
+
+def run_sweep(
+        base_params: Parameters,
+        points: list[dict],
+        n_games: int,
+        policy_name: str,
+        max_ticks: int,
+        seed: int = 0,
+        workers: int | None = None,
+        cache_dir: str | None = DEFAULT_CACHE_DIR,
+        result_dir: str | None = None) -> list[dict]:
+    """組み合わせごとにゲームを複数プロセスで実行して集計する
+    計算済みの組み合わせはキャッシュから読み込み，残りの組み合わせの全てのタスクを
+    1つのプロセスプールで実行する．組み合わせの全てのゲームが終わった時点で
+    キャッシュに保存するため，中断しても終わった組み合わせは失われない．
+
+    Args:
+        base_params (Parameters): 組み合わせで上書きする元のパラメータ
+        points (list[dict]): 組み合わせのリスト (`expand_grid` など)
+        n_games (int): 組み合わせごとのゲーム数
+        policy_name (str): 操作方針の名前
+        max_ticks (int): 1ゲームを打ち切るターン数
+        seed (int): 最初のゲームのシード (全ての組み合わせで同じシードの列を使う)
+        workers (int | None): プロセス数．Noneの場合はCPU数
+        cache_dir (str | None): キャッシュの保存先．Noneの場合は保存しない
+        result_dir (str | None): 指定した場合は `sweep.jsonl` に組み合わせごとの結果を書く
+
+    Returns:
+        list[dict]: 組み合わせごとの {'point', 'key', 'cached', 'summary'} (pointsの順)
+
+    Raises:
+        ValueError: `Parameters` にないフィールドを指定した場合
+    """
+    names = {f.name for f in fields(Parameters)}
+    for point in points:
+        unknown = set(point) - names
+        if unknown:
+            raise ValueError(f"unknown parameters: {sorted(unknown)}")
+    workers = workers or os.cpu_count() or 1
+    seeds = [seed + i for i in range(n_games)]
+    results: list[dict | None] = [None] * len(points)
+    pending: dict[int, list] = {}  # 組み合わせの番号 -> 終わったゲームの結果
+    remaining: dict[int, int] = {}  # 組み合わせの番号 -> 残りのタスク数
+    tasks = []
+    for i, point in enumerate(points):
+        params = replace(base_params, **point)
+        key = point_key(params, seed, n_games, policy_name, max_ticks)
+        summary = _load_cached(cache_dir, key)
+        results[i] = {
+            "point": point, "key": key,
+            "cached": summary is not None, "summary": summary}
+        if summary is None:
+            # 1プロセスあたり8タスク程度に分ける
+            chunksize = max(1, n_games // (workers * 8))
+            point_tasks = list(make_tasks(
+                params, policy_name, seeds, max_ticks, chunksize))
+            pending[i] = []
+            remaining[i] = len(point_tasks)
+            tasks.extend((i, task) for task in point_tasks)
+    logger.info(
+        f"{len(points)} points, {len(points) - len(pending)} cached, "
+        f"{len(pending)} to run")
+
+    out = open(f"{result_dir}/sweep.jsonl", "w") \
+        if result_dir is not None else None
+    try:
+        for result in results:
+            if result["cached"] and out is not None:
+                out.write(json.dumps(result) + "\n")
+        if tasks:
+            start = time.perf_counter()
+            with Pool(min(workers, len(tasks))) as pool:
+                for i, outcomes in pool.imap_unordered(_play_point, tasks):
+                    pending[i].extend(outcomes)
+                    remaining[i] -= 1
+                    if remaining[i]:
+                        continue
+                    summary = summarize(sorted(pending.pop(i)))
+                    _save_cached(cache_dir, results[i]["key"], summary)
+                    results[i]["summary"] = summary
+                    if out is not None:
+                        out.write(json.dumps(results[i]) + "\n")
+                        out.flush()
+                    logger.info(
+                        f"{points[i]}: win rate {summary['win_rate']:.3f}")
+            logger.info(
+                f"sweep finished in {time.perf_counter() - start:.1f}s")
+    finally:
+        if out is not None:
+            out.close()
+    return results
+
+
+def parse_space(items: list[str]) -> dict[str, list]:
+    """コマンドライン引数の "name=v1,v2,..." を探索空間にする
+
+    Args:
+        items (list[str]): "フィールド名=値,値,..." のリスト
+
+    Returns:
+        dict[str, list]: フィールド名と値のリスト (値はJSONとして読めれば変換する)
+
+    Examples:
+        >>> parse_space(["field_size=8,12", "enemy_strategy=random,chase"])
+        {'field_size': [8, 12], 'enemy_strategy': ['random', 'chase']}
+    """
+    space = {}
+    for item in items:
+        name, _, values = item.partition("=")
+        parsed = []
+        for value in values.split(","):
+            try:
+                parsed.append(json.loads(value))
+            except json.JSONDecodeError:
+                parsed.append(value)
+        space[name] = parsed
+    return space
+
+
+def main() -> None:
+    # コマンドライン引数の設定
+    parser = argparse.ArgumentParser()
+    parser = common_args(parser)  # コマンドライン引数引数を読み込み
+    parser.add_argument(
+        "--grid", nargs="+", required=True,
+        help="探索するフィールドと値 (例: field_size=8,12 enemy_num=0,5)")
+    parser.add_argument(
+        "--random", type=int, default=None,
+        help="指定した場合はグリッドからランダムに選んだ数だけ実行する")
+    parser.add_argument(
+        "-g", "--games", type=int, default=200, help="組み合わせごとのゲーム数")
+    parser.add_argument(
+        "--policy", choices=list(POLICIES), default="greedy",
+        help="プレイヤーの操作方針")
+    parser.add_argument(
+        "--max-ticks", type=int, default=1000, help="1ゲームを打ち切るターン数")
+    parser.add_argument(
+        "--seed", type=int, default=0, help="最初のゲームのシード")
+    parser.add_argument(
+        "-w", "--workers", type=int, default=None,
+        help="プロセス数．デフォルトはCPU数")
+    parser.add_argument(
+        "--no-cache", action="store_true", help="キャッシュを使わない")
+    args = parser.parse_args()
+    params = Parameters(**setup_params(vars(args), args.parameters))
+
+    # 結果出力用ファイルの作成
+    # 実行日時とプロセスIDを名前とするディレクトリを作成
+    result_dir = make_result_dir(params.run_date)  # 結果出力ディレクトリ
+    dump_params(params, f'{result_dir}')  # パラメータを出力
+    set_logging(result_dir)  # ログを標準出力とファイルに出力するよう設定
+
+    space = parse_space(args.grid)
+    points = expand_grid(space) if args.random is None \
+        else sample_points(space, args.random, args.seed)
+    results = run_sweep(
+        params, points, args.games, args.policy, args.max_ticks,
+        args.seed, args.workers,
+        None if args.no_cache else DEFAULT_CACHE_DIR, result_dir)
+    for result in results:
+        summary = result["summary"]
+        logger.info(
+            f"{result['point']}: win rate {summary['win_rate']:.3f}, "
+            f"mean ticks {summary['ticks'].get('mean', 0):.1f}"
+            + (" (cached)" if result["cached"] else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+"""ターンごとの計測値の記録
+ターンごとのプレイヤーと敵の座標，残りの食べ物の数，衝突，stepにかかった時間を
+あらかじめ確保した列ごとのバッファにため，`chunk_ticks` ターン分たまったら
+まとめて書き出すモジュール．ターンごとにはファイルに書き込まず，
+メモリ使用量は `chunk_ticks` で決まる．
+
+出力先のディレクトリの構成:
+    columns形式: 列ごとのバイナリ `<列名>.bin` (ネイティブのバイト順の配列を追記) と
+                 列の型と行数を書いた `schema.json`
+    jsonl形式  : 1ターン1行の `telemetry.jsonl` (numpyを使わずに読みたい場合)
+
+    with TelemetryWriter(f'{result_dir}/telemetry', game) as game.telemetry:
+        game.play(policy)
+    columns = read_telemetry(f'{result_dir}/telemetry')
+"""
+from __future__ import annotations
+import json
+import os
+from array import array
+import typing
+if typing.TYPE_CHECKING:
+    import numpy as np
+    from game import Game
+
+
+FORMATS = ("columns", "jsonl")
+# 結果のコード (result列)
+RESULT_CODES = {None: 0, "Game Over!": 1, "Game Clear!": 2}
+# 列名と `array` の型 (positions以外は1ターン1個)
+COLUMNS = {
+    "tick": "I",
+    "duration_ns": "Q",
+    "food_remaining": "I",
+    "wall_bumps": "H",  # 壁にぶつかって止まったプレイヤーと敵の数
+    "enemy_hit": "B",  # プレイヤーが敵にぶつかったか
+    "result": "B",  # RESULT_CODES
+    "positions": "i",  # プレイヤー，敵の順に x, y を並べたもの
+}
+
+
+class TelemetryWriter:
+    """ターンごとの計測値を列ごとにまとめて書き出すクラス
+    `Game.telemetry` に設定すると，`Game.step` のたびに記録される．
+
+    Attributes:
+        outdir (str): 出力先のディレクトリ
+        fmt (str): 出力形式 ("columns" または "jsonl")
+        chunk_ticks (int): まとめて書き出すターン数
+        n_ticks (int): 記録したターン数
+        n_flushes (int): 書き出した回数
+
+    Examples:
+        >>> import tempfile
+        >>> from config import Parameters
+        >>> from game import Game
+        >>> from policy import GreedyPolicy
+        >>> outdir = tempfile.mkdtemp()
+        >>> game = Game(Parameters(enemy_num=2, seed=1), headless=True)
+        >>> game.telemetry = TelemetryWriter(outdir, game, chunk_ticks=4)
+        >>> with game.telemetry:
+        ...     _ = game.play(GreedyPolicy(), max_ticks=10)
+        >>> game.telemetry.n_ticks, game.telemetry.n_flushes  # 4 + 4 + 2ターン
+        (10, 3)
+        >>> columns = read_telemetry(outdir)
+        >>> columns["tick"].tolist() == list(range(1, game.tick + 1))
+        True
+        >>> columns["positions"].shape == (game.tick, 2 * 3)
+        True
+    """
+
+    def __init__(
+            self,
+            outdir: str,
+            game: Game,
+            chunk_ticks: int = 4096,
+            fmt: str = "columns") -> None:
+        """
+        Args:
+            outdir (str): 出力先のディレクトリ (なければ作る)
+            game (Game): 記録するゲーム
+            chunk_ticks (int): まとめて書き出すターン数
+            fmt (str): 出力形式 ("columns" または "jsonl")
+        """
+        if fmt not in FORMATS:
+            raise ValueError(f"unknown telemetry format: {fmt}")
+        if chunk_ticks < 1:
+            raise ValueError("chunk_ticks must be positive")
+        os.makedirs(outdir, exist_ok=True)
+        self.outdir = outdir
+        self.fmt = fmt
+        self.chunk_ticks = chunk_ticks
+        self.n_ticks = 0
+        self.n_flushes = 0
+        self._n_movers = len(game.players) + len(game.enemies)
+        self._widths = {name: 1 for name in COLUMNS}
+        self._widths["positions"] = 2 * self._n_movers
+        # 列ごとのバッファ (chunk_ticks 行分を確保して使い回す)
+        self._buffers = {
+            name: array(typecode, [0]) * (chunk_ticks * self._widths[name])
+            for name, typecode in COLUMNS.items()}
+        self._rows = 0  # バッファにたまっている行数
+        if fmt == "columns":
+            self._files = {
+                name: open(os.path.join(outdir, f"{name}.bin"), "wb")
+                for name in COLUMNS}
+        else:
+            self._files = {
+                "jsonl": open(os.path.join(outdir, "telemetry.jsonl"), "w")}
+
+    def record(self, game: Game, wall_bumps: int, duration_ns: int) -> None:
+        """1ターン分の計測値をバッファに書き込む (`Game.step` から呼ばれる)
+
+        Args:
+            game (Game): 記録中のゲーム (stepを適用した後の状態)
+            wall_bumps (int): 壁にぶつかって止まったプレイヤーと敵の数
+            duration_ns (int): stepにかかった時間 (ナノ秒)
+        """
+        i = self._rows
+        buffers = self._buffers
+        buffers["tick"][i] = game.tick
+        buffers["duration_ns"][i] = duration_ns
+        buffers["food_remaining"][i] = len(game.foods) - game.food_eaten
+        buffers["wall_bumps"][i] = wall_bumps
+        buffers["enemy_hit"][i] = game.result == "Game Over!"
+        buffers["result"][i] = RESULT_CODES[game.result]
+        positions = buffers["positions"]
+        j = i * 2 * self._n_movers
+        for item in game.players:
+            positions[j] = item.now_x
+            positions[j + 1] = item.now_y
+            j += 2
+        for item in game.enemies:
+            positions[j] = item.now_x
+            positions[j + 1] = item.now_y
+            j += 2
+        self._rows = i + 1
+        self.n_ticks += 1
+        if self._rows == self.chunk_ticks:
+            self.flush()
+
+    def flush(self) -> None:
+        """たまっている行をまとめて書き出す"""
+        n = self._rows
+        if n == 0:
+            return
+        if self.fmt == "columns":
+            for name, buf in self._buffers.items():
+                self._files[name].write(
+                    memoryview(buf)[:n * self._widths[name]])
+            self._write_schema()
+        else:
+            w = 2 * self._n_movers
+            lines = []
+            for i in range(n):
+                row = {name: self._buffers[name][i]
+                       for name in COLUMNS if name != "positions"}
+                row["positions"] = self._buffers["positions"][
+                    i * w:(i + 1) * w].tolist()
+                lines.append(json.dumps(row))
+            self._files["jsonl"].write("\n".join(lines) + "\n")
+        for f in self._files.values():
+            f.flush()
+        self._rows = 0
+        self.n_flushes += 1
+
+    def _write_schema(self) -> None:
+        """列の型と幅，書き出した行数を `schema.json` に書く"""
+        schema = {
+            "rows": self.n_ticks,
+            "columns": {
+                name: {"typecode": typecode, "width": self._widths[name]}
+                for name, typecode in COLUMNS.items()},
+        }
+        with open(os.path.join(self.outdir, "schema.json"), "w") as f:
+            json.dump(schema, f, indent=4)
+
+    def close(self) -> None:
+        """残りの行を書き出してファイルを閉じる"""
+        if not self._files:
+            return
+        self.flush()
+        for f in self._files.values():
+            f.close()
+        self._files = {}
+
+    def __enter__(self) -> TelemetryWriter:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def read_telemetry(outdir: str) -> dict[str, np.ndarray]:
+    """書き出した計測値を列ごとの配列として読み込む
+    columns形式は列のファイルをそのまま配列にし，jsonl形式は行を読んで列にまとめる．
+
+    Args:
+        outdir (str): `TelemetryWriter` の出力先
+
+    Returns:
+        dict[str, np.ndarray]: 列名と配列．positionsは (ターン数, 2 * (プレイヤー数 + 敵の数))
+    """
+    import numpy as np  # numpyは読み込むときまで読み込まない
+    schema_path = os.path.join(outdir, "schema.json")
+    if os.path.exists(schema_path):
+        with open(schema_path) as f:
+            schema = json.load(f)
+        columns = {}
+        for name, column in schema["columns"].items():
+            data = np.fromfile(
+                os.path.join(outdir, f"{name}.bin"),
+                dtype=np.dtype(column["typecode"]),
+                count=schema["rows"] * column["width"])
+            columns[name] = data.reshape(-1, column["width"]) \
+                if name == "positions" else data
+        return columns
+    rows = {name: [] for name in COLUMNS}
+    with open(os.path.join(outdir, "telemetry.jsonl")) as f:
+        for line in f:
+            row = json.loads(line)
+            for name in COLUMNS:
+                rows[name].append(row[name])
+    return {name: np.array(values, dtype=np.dtype(COLUMNS[name]))
+            for name, values in rows.items()}
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
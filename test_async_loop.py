@@ -0,0 +1,127 @@
+import asyncio
+import io
+import os
+import unittest
+from unittest.mock import patch
+from async_loop import FixedTimestepLoop
+from config import Parameters
+from controller import QueueInput, RawTerminalInput, ScriptedInput
+from controller import default_backend
+from game import Game
+from renderer import TerminalRenderer
+
+
+class TestFixedTimestepLoop(unittest.TestCase):
+
+    def make_loop(self, params, backend, food_pos):
+        game = Game(params, headless=True)
+        game.foods[0].now_x, game.foods[0].now_y = food_pos
+        game.foods[0].next_x, game.foods[0].next_y = food_pos
+        game.field.build_index()
+        return game, FixedTimestepLoop(
+            game, backend=backend, renderer=TerminalRenderer(io.StringIO()))
+
+    def test_keys_from_pipe(self):
+        # 食べ物をプレイヤーの右に置き，パイプから"d"を送る
+        params = Parameters(field_size=4, enemy_num=0, food_num=1,
+                            tick_interval=0.01)
+        r, w = os.pipe()
+        game, loop = self.make_loop(params, RawTerminalInput(r), (2, 1))
+        os.write(w, b"xd")
+        os.close(w)
+        self.assertEqual("Game Clear!", asyncio.run(loop.run()))
+        # 1ターン目は入力が読まれる前に進むため，2ターン目で食べる
+        self.assertEqual(2, game.tick)
+        os.close(r)
+
+    def test_ticks_without_input(self):
+        # キーが押されなくてもターンは進み，予定時刻より早く進むことはない
+        params = Parameters(field_size=4, enemy_num=0, food_num=1,
+                            tick_interval=0.02)
+        r, w = os.pipe()
+        game, loop = self.make_loop(params, RawTerminalInput(r), (2, 2))
+        pressed = []
+
+        async def press_later():
+            # ターンが進んでからキーを押す
+            for key, tick in ((b"s", 2), (b"d", 4)):
+                while game.tick < tick:
+                    await asyncio.sleep(0.005)
+                pressed.append(game.tick)
+                os.write(w, key)
+
+        async def timed_run():
+            start = asyncio.get_running_loop().time()
+            result = await loop.run()
+            return result, asyncio.get_running_loop().time() - start
+
+        async def main():
+            (result, elapsed), _ = await asyncio.gather(
+                timed_run(), press_later())
+            return result, elapsed
+
+        result, elapsed = asyncio.run(main())
+        self.assertEqual("Game Clear!", result)
+        self.assertEqual(2, len(pressed))
+        self.assertGreater(game.tick, pressed[-1])  # 最後のキーの後で食べる
+        self.assertGreaterEqual(
+            elapsed, (game.tick - 1) * params.tick_interval - 0.001)
+        os.close(r)
+        os.close(w)
+
+    def test_silent_pipe_does_not_block(self):
+        # 何も書かれないパイプの標準入力でも，イベントループを止めずにターンが進む
+        params = Parameters(field_size=4, enemy_num=0, food_num=1,
+                            tick_interval=0.001)
+        r, w = os.pipe()
+        with patch("sys.stdin", os.fdopen(r)) as stdin:
+            backend = default_backend()
+            self.assertIsInstance(backend, RawTerminalInput)
+            game, loop = self.make_loop(params, backend, (2, 2))
+
+            async def close_later():
+                while game.tick < 5:
+                    await asyncio.sleep(0.001)
+                os.close(w)  # 入力を閉じるとループが止まる
+
+            async def main():
+                result, _ = await asyncio.gather(loop.run(), close_later())
+                return result
+
+            self.assertIsNone(asyncio.run(main()))
+            self.assertGreaterEqual(game.tick, 5)
+            stdin.close()
+
+    def test_late_ticks_still_read_input(self):
+        # 毎ターン予定時刻に遅れても，イベントループに戻ってキー入力を読む
+        params = Parameters(field_size=4, enemy_num=0, food_num=1,
+                            tick_interval=0.0)
+        r, w = os.pipe()
+        game, loop = self.make_loop(params, RawTerminalInput(r), (2, 1))
+        os.write(w, b"d")
+        self.assertEqual("Game Clear!", asyncio.run(loop.run()))
+        self.assertGreater(loop.missed, 0)
+        self.assertLess(game.tick, 10)
+        os.close(r)
+        os.close(w)
+
+    def test_stops_when_script_exhausted(self):
+        # 台本を読み切ったら，キーなしで進み続けずに止まる
+        params = Parameters(field_size=4, enemy_num=0, food_num=1,
+                            tick_interval=0.001)
+        game, loop = self.make_loop(
+            params, ScriptedInput(io.StringIO("s")), (2, 2))
+        self.assertIsNone(asyncio.run(loop.run()))
+        self.assertEqual(1, game.tick)
+
+    def test_queue_input(self):
+        # ファイルディスクリプタを持たない入力は毎ターン読む
+        params = Parameters(field_size=4, enemy_num=0, food_num=1,
+                            tick_interval=0.001)
+        game, loop = self.make_loop(params, QueueInput("xsd"), (2, 1))
+        self.assertEqual("Game Clear!", asyncio.run(loop.run()))
+        self.assertEqual(1, game.tick)  # 最初のターンでまとめて読み，最後のキーを使う
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,45 @@
+import unittest
+import numpy as np
+from batch_game import BatchGame
+from config import Parameters
+from game import Game
+
+
+class TestBatchGame(unittest.TestCase):
+
+    def check_same_as_game(self, params, seeds, n_ticks=200):
+        batch = BatchGame(params, len(seeds))
+        batch.reset(seeds)
+        games = [Game(params, headless=True) for _ in seeds]
+        for game, seed in zip(games, seeds):
+            game.reset(seed)
+        moves = np.array([(0, 0), (1, 0), (-1, 0), (0, 1), (0, -1)])
+        action_rng = np.random.default_rng(0)
+        for _ in range(n_ticks):
+            actions = moves[action_rng.integers(0, 5, len(seeds))]
+            rewards, done = batch.step(actions)
+            for i, game in enumerate(games):
+                if game.result is None:
+                    _, reward, _, info = game.step(tuple(actions[i]))
+                    self.assertEqual(reward, rewards[i])
+                self.assertEqual(game.get_state(), batch.get_state(i))
+                self.assertEqual(game.result, batch.results()[i])
+                self.assertEqual(game.tick, batch.tick[i])
+                self.assertEqual(game.food_eaten, batch.food_eaten[i])
+            if done.all():
+                break
+
+    def test_same_as_game(self):
+        self.check_same_as_game(Parameters(), list(range(20)))
+
+    def test_same_as_game_small_field(self):
+        params = Parameters(field_size=5, enemy_num=2, food_num=3)
+        self.check_same_as_game(params, [-1, 2**70, 7, 8])
+
+    def test_no_food(self):
+        params = Parameters(enemy_num=3, food_num=0)
+        self.check_same_as_game(params, list(range(5)), n_ticks=50)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,40 +1,96 @@
+import os
+import pty
+import tempfile
+import termios
 import unittest
-from unittest.mock import patch
-from controller import Controller
+from controller import Controller, QueueInput, RawTerminalInput
+from controller import ScriptedInput
 
 
 class TestController(unittest.TestCase):
 
-    @patch("builtins.input", side_effect=["w"])
-    def test_get_user_input_A_up(self, mock_input):
+    def tearDown(self):
+        Controller.backend = None
+
+    def get_user_input(self, keys):
+        Controller.backend = QueueInput(keys)
+        return Controller.get_user_input()
+
+    def test_get_user_input_A_up(self):
         expected = (0, -1)
-        result = Controller.get_user_input()
+        result = self.get_user_input("w")
         self.assertEqual(expected, result)
 
-    @patch("builtins.input", side_effect=["a"])
-    def test_get_user_input_B_left(self, mock_inpput):
+    def test_get_user_input_B_left(self):
         expected = (-1, 0)
-        result = Controller.get_user_input()
+        result = self.get_user_input("a")
         self.assertEqual(expected, result)
 
-    @patch("builtins.input", side_effect=["s"])
-    def test_get_user_input_C_down(self, mock_input):
+    def test_get_user_input_C_down(self):
         expected = (0, 1)
-        result = Controller.get_user_input()
+        result = self.get_user_input("s")
         self.assertEqual(expected, result)
 
-    @patch("builtins.input", side_effect=["d"])
-    def test_get_user_input_D_right(self, mock_input):
+    def test_get_user_input_D_right(self):
         expected = (1, 0)
-        result = Controller.get_user_input()
+        result = self.get_user_input("d")
         self.assertEqual(expected, result)
 
-    @patch("builtins.input", side_effect=[" "])
-    def test_get_user_input_F_invalid(self, mock_input):
+    def test_get_user_input_F_invalid(self):
         expected = (0, 0)
-        result = Controller.get_user_input()
+        result = self.get_user_input(" ")
         self.assertEqual(expected, result)
 
 
+class TestRawTerminalInput(unittest.TestCase):
+
+    def test_raw_session(self):
+        master, slave = pty.openpty()
+        try:
+            before = termios.tcgetattr(slave)
+            with RawTerminalInput(slave) as backend:
+                backend.open()
+                os.write(master, b"ww\x1b[C")  # 連打と右矢印
+                self.assertEqual((1, 0), backend.read_key())
+                # ゲームの間はエンターなし・エコーなしのまま
+                lflag = termios.tcgetattr(slave)[3]
+                self.assertFalse(lflag & (termios.ICANON | termios.ECHO))
+                self.assertIsNone(backend.poll())
+                os.write(master, b"q")  # 移動キー以外はその場に留まる
+                self.assertEqual((0, 0), backend.read_key())
+            self.assertEqual(before, termios.tcgetattr(slave))
+        finally:
+            os.close(master)
+            os.close(slave)
+
+
+class TestScriptedInput(unittest.TestCase):
+
+    def test_path_closed_when_exhausted(self):
+        path = os.path.join(tempfile.mkdtemp(), "keys.txt")
+        with open(path, "w") as f:
+            f.write("d\ns")
+        backend = ScriptedInput(path)
+        self.assertEqual((1, 0), backend.read_key())
+        stream = backend.stream
+        self.assertEqual((0, 1), backend.read_key())
+        self.assertEqual((0, 0), backend.read_key())
+        self.assertTrue(backend.exhausted)
+        self.assertTrue(stream.closed)
+
+    def test_pipe_reads_what_is_written(self):
+        # 1ターンずつキーを送るプロセスを待たせない
+        r, w = os.pipe()
+        with os.fdopen(r) as stream:
+            backend = ScriptedInput(stream)
+            for key, direction in (("d", (1, 0)), ("s", (0, 1))):
+                os.write(w, key.encode())
+                self.assertEqual(direction, backend.read_key())
+                self.assertIsNone(backend.poll())
+            os.close(w)
+            self.assertEqual((0, 0), backend.read_key())
+            self.assertTrue(backend.exhausted)
+
+
 if __name__ == "__main__":
     unittest.main()
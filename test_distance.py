@@ -0,0 +1,83 @@
+import os
+import tempfile
+import unittest
+import distance
+from config import Parameters
+from distance import DistanceOracle, UNREACHABLE, bfs_distances
+from game import Game
+from game_random import GameRandom
+
+
+def setUpModule():
+    distance.oracle_cache_dir = None  # 距離の表をディスクに保存しない
+
+
+def tearDownModule():
+    distance.oracle_cache_dir = distance.DEFAULT_CACHE_DIR
+
+
+def random_walls(f_size, seed):
+    """周りと内側の一部が壁のビットマップを作る"""
+    rng = GameRandom(seed)
+    walls = bytearray(f_size * f_size)
+    for y in range(f_size):
+        for x in range(f_size):
+            border = x in (0, f_size - 1) or y in (0, f_size - 1)
+            walls[y * f_size + x] = border or rng.randint(0, 3) == 0
+    return walls
+
+
+class TestDistanceOracle(unittest.TestCase):
+
+    def test_table_matches_bfs(self):
+        f_size = 14
+        walls = random_walls(f_size, 5)
+        oracle = DistanceOracle(walls, f_size, cache_dir=None)
+        cells = [(x, y) for y in range(f_size) for x in range(f_size)]
+        for a in cells:
+            dist = bfs_distances(walls, f_size, a)
+            self.assertEqual(dist, oracle.field(a))
+            for b in cells:
+                self.assertEqual(
+                    dist[b[1] * f_size + b[0]], oracle.distance(a, b))
+        # 複数の始点は最も近い始点までの距離
+        sources = [(1, 1), (12, 12), (6, 3)]
+        self.assertEqual(
+            bfs_distances(walls, f_size, *sources), oracle.field(*sources))
+        self.assertTrue(all(d == UNREACHABLE for d in oracle.field()))
+
+    def test_cache_reuse(self):
+        f_size = 10
+        walls = random_walls(f_size, 1)
+        cache_dir = tempfile.mkdtemp()
+        first = DistanceOracle(walls, f_size, cache_dir)
+        self.assertFalse(first.loaded_from_cache)
+        self.assertEqual([f"{first.key}.npy"], os.listdir(cache_dir))
+        second = DistanceOracle(walls, f_size, cache_dir)
+        self.assertTrue(second.loaded_from_cache)
+        self.assertEqual(first.table.tolist(), second.table.tolist())
+        # 壁が変わると別のキーになり計算し直す
+        walls[f_size + 1] = 1
+        third = DistanceOracle(walls, f_size, cache_dir)
+        self.assertFalse(third.loaded_from_cache)
+        self.assertEqual(2, len(os.listdir(cache_dir)))
+
+    def test_strategies_use_table(self):
+        # 表から求めた距離場でも幅優先探索と同じ動きになる
+        for name in ("chase", "ambush", "scatter"):
+            params = Parameters(enemy_num=5, food_num=3,
+                                enemy_strategy=name, seed=2)
+            with_table = Game(params, headless=True)
+            self.assertIsNotNone(with_table.enemy_ai.oracle)
+            without_table = Game(params, headless=True)
+            without_table.enemy_ai.oracle = None
+            for _ in range(30):
+                if with_table.result is not None:
+                    break
+                self.assertEqual(
+                    without_table.step((0, 1))[0],
+                    with_table.step((0, 1))[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,200 @@
+import unittest
+import distance
+from config import Parameters
+from game import Game
+from food import Food
+from block import Block
+from fixtures import FixedEnemy, StillEnemy, staged_game
+
+
+def setUpModule():
+    distance.oracle_cache_dir = None  # 距離の表をディスクに保存しない
+
+
+def tearDownModule():
+    distance.oracle_cache_dir = distance.DEFAULT_CACHE_DIR
+
+
+class TestGame(unittest.TestCase):
+
+    def test_reset_same_seed_same_game(self):
+        game = Game(Parameters(), headless=True)
+        actions = [(1, 0), (0, 1), (-1, 0), (0, -1)] * 10
+        results = []
+        for _ in range(2):
+            states = [game.reset(seed=42)]
+            for action in actions:
+                state, _, done, _ = game.step(action)
+                states.append(state)
+                if done:
+                    break
+            results.append(states)
+        self.assertEqual(results[0], results[1])
+
+    def test_params_seed(self):
+        params = Parameters(seed=7)
+        game1 = Game(params, headless=True)
+        game2 = Game(params, headless=True)
+        self.assertEqual(7, game1.seed)
+        self.assertEqual(game1.get_state(), game2.get_state())
+        for _ in range(20):
+            if game1.result is not None:
+                break
+            self.assertEqual(game1.step((0, 0)), game2.step((0, 0)))
+        self.assertNotEqual(
+            game1.reset(seed=7)["enemies"], game1.reset(seed=8)["enemies"])
+
+    def test_snapshot_restore(self):
+        game = Game(Parameters(field_size=8, enemy_num=5, food_num=3),
+                    headless=True)
+        game.reset(seed=3)
+        snap = game.snapshot()
+        first = []
+        while game.result is None:
+            first.append(game.step((1, 0)))
+        game.restore(snap)
+        self.assertIsNone(game.result)
+        self.assertEqual("😶", game.players[0].icon)
+        second = []
+        while game.result is None:
+            second.append(game.step((1, 0)))
+        self.assertEqual(first, second)
+        # 衝突判定の索引と描画も戻した状態に追従する
+        game.restore(snap)
+        field = game.field.update_field()
+        for item in game.players + game.enemies:
+            items = game.players if item in game.players else game.enemies
+            self.assertIsNotNone(game.field.occupant(item, items))
+            self.assertNotEqual("　", field[item.now_y][item.now_x])
+
+    def test_step_game_over(self):
+        # 動かない敵をプレイヤーの移動先に置く
+        game = staged_game(
+            Parameters(enemy_num=1, food_num=1), [StillEnemy(2, 1)])
+        _, reward, done, info = game.step((1, 0))
+        self.assertTrue(done)
+        self.assertEqual(-1.0, reward)
+        self.assertEqual("Game Over!", info["result"])
+        self.assertEqual("😭", game.players[0].icon)
+        with self.assertRaises(RuntimeError):
+            game.step((0, 0))
+
+    def test_step_blocked_by_wall(self):
+        game = Game(Parameters(enemy_num=0), headless=True)
+        game.reset(seed=0)
+        state, _, _, _ = game.step((-1, 0))
+        self.assertEqual([(1, 1)], state["players"])
+
+    def test_enemy_strategies(self):
+        for name in ("chase", "ambush", "scatter"):
+            params = Parameters(
+                field_size=10, enemy_num=4, food_num=3,
+                enemy_strategy=name)
+            game = Game(params, headless=True)
+            game.reset(seed=3)
+            snap = game.snapshot()
+            actions = [(1, 0), (0, 1)] * 15
+            first = [game.step(a) for a in actions if game.result is None]
+            # 状態を持たないため，巻き戻すと同じ動きになる
+            game.restore(snap)
+            second = [game.step(a) for a in actions if game.result is None]
+            self.assertEqual(first, second, name)
+        with self.assertRaises(ValueError):
+            Game(Parameters(enemy_strategy="unknown"), headless=True)
+
+    def test_chase_approaches_player(self):
+        params = Parameters(field_size=10, enemy_num=1, food_num=1,
+                            enemy_strategy="chase")
+        game = Game(params, headless=True)
+        game.reset(seed=0)
+        enemy = game.enemies[0]
+        before = abs(enemy.now_x - 1) + abs(enemy.now_y - 1)
+        game.step((0, 0))
+        after = abs(enemy.now_x - 1) + abs(enemy.now_y - 1)
+        self.assertEqual(before - 1, after)
+
+    def test_profile(self):
+        from profiler import BLOCK_COLLISION, ENEMY_AI, INPUT
+        game = Game(Parameters(seed=0), headless=True)
+        self.assertIsNone(game.profiler)
+        game = Game(Parameters(seed=0, profile=True), headless=True)
+        for _ in range(5):
+            if game.result is None:
+                game.step((0, 0))
+        self.assertEqual(game.tick, game.profiler.ticks)
+        self.assertEqual(game.tick, game.profiler.count(ENEMY_AI))
+        self.assertEqual(game.tick, game.profiler.count(BLOCK_COLLISION))
+        self.assertEqual(0, game.profiler.count(INPUT))  # startのみで計測
+
+    def test_large_sparse_field(self):
+        params = Parameters(field_size=4000, enemy_num=20, food_num=5)
+        game = Game(params, headless=True)
+        game.reset(seed=0)
+        # 表示内容は保持せず，壁は外周を含むチャンクだけを確保する
+        self.assertIsNone(game.field.field)
+        self.assertLess(game.field.walls.nbytes, params.field_size ** 2 // 20)
+        state, _, _, _ = game.step((-1, 0))  # 外周の壁で止まる
+        self.assertEqual([(1, 1)], state["players"])
+        view = game.frame()
+        self.assertEqual((32, 32), (len(view), len(view[0])))
+        self.assertEqual(game.players[0].icon, view[1][1])
+        self.assertEqual(Block.ICON, view[0][0])
+
+    def test_map_file(self):
+        import os
+        import tempfile
+        path = os.path.join(tempfile.mkdtemp(), "map.txt")
+        with open(path, "w") as f:
+            f.write("#######\n#P#..E#\n#.#.#.#\n#...#F#\n")
+        params = Parameters(map_path=path, enemy_num=1, food_num=1)
+        game = Game(params, headless=True)
+        self.assertEqual(7, game.field.f_size)  # 足りない行は壁で埋める
+        state = game.reset(seed=0)
+        self.assertEqual([(1, 1)], state["players"])
+        self.assertEqual([(5, 1)], state["enemies"])
+        self.assertEqual([(5, 3)], state["foods"])
+        state, _, _, _ = game.step((1, 0))  # 内側の壁で止まる
+        self.assertEqual([(1, 1)], state["players"])
+        self.assertEqual(game.reset(seed=3), game.reset(seed=3))
+
+    def _collision_game(self, collision, enemies):
+        """プレイヤーを(1, 1)に置き，敵を差し替えたゲームを作る"""
+        params = Parameters(
+            enemy_num=len(enemies), food_num=1, collision=collision)
+        return staged_game(params, enemies, [Food(10, 10)])
+
+    def test_collision_swap(self):
+        # プレイヤーと敵が入れ替わる
+        expected = {
+            "legacy": (None, [(2, 1)]),  # すり抜ける
+            "stack": ("Game Over!", [(2, 1)]),
+            "kill": ("Game Over!", [(2, 1)]),
+            "block": ("Game Over!", [(2, 1)]),
+        }
+        for collision, (result, players) in expected.items():
+            game = self._collision_game(collision, [FixedEnemy(2, 1, -1, 0)])
+            state, _, _, info = game.step((1, 0))
+            self.assertEqual(result, info["result"], collision)
+            self.assertEqual(players, state["players"], collision)
+
+    def test_collision_crowding(self):
+        # 2つの敵が同じマスに入ろうとし，後ろの敵が続く
+        def enemies():
+            return [FixedEnemy(5, 3, 1, 0), FixedEnemy(7, 3, -1, 0),
+                    FixedEnemy(4, 3, 1, 0), FixedEnemy(5, 5, 0, -1)]
+        for collision in ("legacy", "stack"):
+            game = self._collision_game(collision, enemies())
+            state, _, _, _ = game.step((0, 0))
+            self.assertEqual(
+                [(6, 3), (6, 3), (5, 3), (5, 4)], state["enemies"])
+        for collision in ("block", "kill"):
+            game = self._collision_game(collision, enemies())
+            state, _, _, _ = game.step((0, 0))
+            self.assertEqual(
+                [(5, 3), (7, 3), (4, 3), (5, 4)], state["enemies"])
+        with self.assertRaises(ValueError):
+            Game(Parameters(collision="bounce"), headless=True)
+
+
+if __name__ == "__main__":
+    unittest.main()
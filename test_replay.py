@@ -0,0 +1,82 @@
+import os
+import tempfile
+import unittest
+from config import Parameters
+from game import Game
+from policy import RandomPolicy
+from replay import ReplayReader, ReplayWriter
+
+
+class TestReplay(unittest.TestCase):
+
+    def setUp(self):
+        self.path = os.path.join(tempfile.mkdtemp(), "game.replay")
+
+    def record(self, params, seed, max_ticks):
+        """ランダムな操作でゲームを記録し，各ターンの状態を返す"""
+        game = Game(params, headless=True)
+        game.reset(seed)
+        policy = RandomPolicy(seed)
+        states = [game.get_state()]
+        with ReplayWriter(self.path, game, keyframe_interval=8) as writer:
+            game.recorder = writer
+            while game.result is None and game.tick < max_ticks:
+                game.step(policy(game, game.players[0]))
+                states.append(game.get_state())
+        return game, states
+
+    def test_game_at_every_tick(self):
+        params = Parameters(field_size=20, enemy_num=3, food_num=5)
+        game, states = self.record(params, 11, 100)
+        with ReplayReader(self.path) as replay:
+            self.assertEqual(11, replay.seed)
+            self.assertEqual(params, replay.params)
+            self.assertEqual(game.tick, replay.n_ticks)
+            # 後ろから順に飛ばしながら読んでも同じ状態になる
+            for tick in reversed(range(replay.n_ticks + 1)):
+                self.assertEqual(
+                    states[tick], replay.game_at(tick).get_state())
+            final = replay.replay()
+            self.assertEqual(game.result, final.result)
+            self.assertEqual(game.food_eaten, final.food_eaten)
+
+    def test_empty_replay(self):
+        params = Parameters(seed=1)
+        game = Game(params, headless=True)
+        ReplayWriter(self.path, game).close()
+        with ReplayReader(self.path) as replay:
+            self.assertEqual(0, replay.n_ticks)
+            self.assertEqual(game.get_state(), replay.replay().get_state())
+
+    def test_truncated_replay(self):
+        # フッタを書く前に異常終了した記録も，書き出されていた分を読める
+        params = Parameters(field_size=20, enemy_num=3, food_num=5)
+        game, states = self.record(params, 11, 100)
+        with open(self.path, "rb") as f:
+            data = f.read()
+        with ReplayReader(self.path) as replay:
+            self.assertTrue(replay.complete)
+            keyframe_size = replay._keyframe_size
+            block_start = replay._blocks_offset + 2 * replay._block_size
+        cases = [
+            (block_start + keyframe_size + 3, 19),  # 3つ目のブロックの3ターン分まで
+            (block_start + 5, 16),  # 3つ目のキーフレームの途中まで
+        ]
+        for size, n_ticks in cases:
+            with open(self.path, "wb") as f:
+                f.write(data[:size])
+            with ReplayReader(self.path) as replay:
+                self.assertFalse(replay.complete)
+                self.assertEqual(n_ticks, replay.n_ticks)
+                self.assertEqual(
+                    states[n_ticks], replay.replay().get_state())
+
+    def test_invalid_action(self):
+        game = Game(Parameters(seed=1), headless=True)
+        with ReplayWriter(self.path, game) as game.recorder:
+            with self.assertRaises(ValueError):
+                game.step((2, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+import asyncio
+import os
+import tempfile
+import unittest
+from config import Parameters
+from game import Game
+from server import GameServer, Session, run_bots
+
+
+class FakeTransport:
+    """送った行を記録するだけのトランスポート"""
+
+    def __init__(self):
+        self.lines = []
+        self.closed = False
+
+    def write(self, data):
+        self.lines.extend(data.decode().splitlines())
+
+    def is_closing(self):
+        return self.closed
+
+    def get_write_buffer_size(self):
+        return 0
+
+    def close(self):
+        self.closed = True
+
+
+class TestGameServer(unittest.TestCase):
+
+    def test_tick_applies_last_key(self):
+        params = Parameters(enemy_num=0, food_num=1)
+        server = GameServer(params, base_seed=3)
+        session = Session(server)
+        transport = FakeTransport()
+        session.connection_made(transport)
+
+        # 同じシードのゲームに同じ移動を適用した結果と一致する
+        game = Game(params, headless=True)
+        game.reset(3)
+        self.assertEqual(f"H 0 3 {game.field.f_size}", transport.lines[0])
+        session.data_received(b"w\nd\n")
+        server.tick()
+        game.step((1, 0))
+        player = game.players[0]
+        self.assertEqual(
+            f"T 1 {player.now_x} {player.now_y} 1", transport.lines[1])
+
+        # キーが届かなかったターンは止まる
+        server.tick()
+        self.assertEqual(
+            f"T 2 {player.now_x} {player.now_y} 1", transport.lines[2])
+
+        session.connection_lost(None)
+        self.assertEqual({}, server.sessions)
+
+    def play_bots(self, n, start, **kwargs):
+        """n個のクライアントを最大20ターンずつ接続し，全員が切断するまで待つ"""
+        async def play():
+            server = GameServer(Parameters(tick_interval=0.001), base_seed=0)
+            address = await start(server)
+            stats = await run_bots(n, max_ticks=20, **address, **kwargs)
+            while server.sessions:  # 切断がサーバーに届くまで待つ
+                await asyncio.sleep(0.001)
+            await server.stop()
+            return stats, server
+
+        stats, server = asyncio.run(play())
+        # ゲームの結果はキーが届くタイミングによるので，サーバーが数える値を確かめる
+        self.assertEqual(n, stats["bots"])
+        self.assertEqual(n, server.opened)
+        self.assertEqual(n, server.closed)
+        self.assertEqual({}, server.sessions)
+        self.assertLessEqual(stats["finished"], server.finished)
+        self.assertLessEqual(n, stats["ticks"])
+        # 1つのクライアントが受け取るターンはサーバーが進めたターン以下
+        self.assertLessEqual(stats["ticks"], min(20, server.ticks) * n)
+
+    def test_bots_over_unix_socket(self):
+        path = os.path.join(tempfile.mkdtemp(), "game.sock")
+
+        async def start(server):
+            await server.start_unix(path)
+            return {"path": path}
+
+        self.play_bots(3, start)
+
+    def test_bots_over_tcp(self):
+        async def start(server):
+            return {"port": await server.start_tcp(0)}
+
+        self.play_bots(20, start)
+
+
+if __name__ == "__main__":
+    unittest.main()
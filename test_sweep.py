@@ -0,0 +1,61 @@
+import json
+import os
+import tempfile
+import unittest
+from config import Parameters
+from sweep import expand_grid, point_key, run_sweep
+
+
+class TestRunSweep(unittest.TestCase):
+
+    def test_cache_skips_completed_points(self):
+        cache_dir, result_dir = tempfile.mkdtemp(), tempfile.mkdtemp()
+        params = Parameters(field_size=6, food_num=1)
+        points = expand_grid({"enemy_num": [0, 2]})
+        first = run_sweep(
+            params, points, 6, "greedy", 50, workers=2,
+            cache_dir=cache_dir, result_dir=result_dir)
+        self.assertEqual([False, False], [r["cached"] for r in first])
+        self.assertEqual(2, len(os.listdir(cache_dir)))
+        with open(f"{result_dir}/sweep.jsonl") as f:
+            self.assertEqual(2, len(f.readlines()))
+        self.assertEqual(6, first[0]["summary"]["games"])
+
+        # 計算済みの組み合わせは読み込み，新しい組み合わせだけを計算する
+        points.append({"enemy_num": 4})
+        second = run_sweep(
+            params, points, 6, "greedy", 50, workers=2, cache_dir=cache_dir)
+        self.assertEqual([True, True, False], [r["cached"] for r in second])
+        self.assertEqual(
+            json.dumps(first[1]["summary"]), json.dumps(second[1]["summary"]))
+
+        # リビジョンが変わると計算し直す
+        third = run_sweep(
+            Parameters(field_size=6, food_num=1, git_revision="other"),
+            points[:1], 6, "greedy", 50, workers=1, cache_dir=cache_dir)
+        self.assertFalse(third[0]["cached"])
+
+    def test_key_follows_map_contents(self):
+        directory = tempfile.mkdtemp()
+        paths = [os.path.join(directory, name) for name in ("a.txt", "b.txt")]
+        for path in paths:
+            with open(path, "w") as f:
+                f.write("#####\n#P..#\n#..E#\n#F..#\n#####\n")
+
+        def key(path):
+            return point_key(Parameters(map_path=path), 0, 10, "greedy", 100)
+
+        self.assertEqual(key(paths[0]), key(paths[1]))  # 同じ内容なら同じキー
+        before = key(paths[0])
+        with open(paths[0], "w") as f:
+            f.write("#####\n#P#.#\n#..E#\n#F..#\n#####\n")
+        self.assertNotEqual(before, key(paths[0]))
+
+    def test_unknown_field(self):
+        with self.assertRaises(ValueError):
+            run_sweep(Parameters(), [{"no_such_field": 1}], 1, "greedy", 10,
+                      cache_dir=None)
+
+
+if __name__ == "__main__":
+    unittest.main()
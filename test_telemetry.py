@@ -0,0 +1,56 @@
+import os
+import tempfile
+import unittest
+from config import Parameters
+from fixtures import StillEnemy, staged_game
+from game import Game
+from policy import RandomPolicy
+from telemetry import TelemetryWriter, read_telemetry
+
+
+class TestTelemetryWriter(unittest.TestCase):
+
+    def play(self, fmt, outdir):
+        game = Game(Parameters(enemy_num=3, food_num=2), headless=True)
+        game.reset(seed=5)
+        policy = RandomPolicy(0)
+        with TelemetryWriter(outdir, game, 16, fmt) as game.telemetry:
+            game.play(policy, max_ticks=100)
+        return game
+
+    def test_columns_and_jsonl_match(self):
+        columns_dir, jsonl_dir = tempfile.mkdtemp(), tempfile.mkdtemp()
+        game = self.play("columns", columns_dir)
+        self.play("jsonl", jsonl_dir)
+        columns = read_telemetry(columns_dir)
+        rows = read_telemetry(jsonl_dir)
+        self.assertEqual(set(columns), set(rows))
+        for name in columns:
+            if name == "duration_ns":
+                continue  # 時間は実行ごとに変わる
+            self.assertEqual(columns[name].tolist(), rows[name].tolist(), name)
+        self.assertEqual(game.tick, len(columns["tick"]))
+        self.assertFalse(os.path.exists(f"{columns_dir}/telemetry.jsonl"))
+
+    def test_enemy_hit(self):
+        outdir = tempfile.mkdtemp()
+        # 動かない敵をプレイヤーの移動先に置く
+        game = staged_game(
+            Parameters(enemy_num=1, food_num=1), [StillEnemy(2, 1)])
+        with TelemetryWriter(outdir, game) as game.telemetry:
+            game.step((-1, 0))  # 壁で止まる
+            game.step((1, 0))
+        columns = read_telemetry(outdir)
+        self.assertEqual([1, 2], columns["tick"].tolist())
+        self.assertEqual(1, columns["wall_bumps"][0])
+        self.assertEqual([0, 1], columns["enemy_hit"].tolist())
+        self.assertEqual([2, 1, 2, 1], columns["positions"][1].tolist())
+
+    def test_invalid_format(self):
+        game = Game(Parameters(), headless=True)
+        with self.assertRaises(ValueError):
+            TelemetryWriter(tempfile.mkdtemp(), game, fmt="csv")
+
+
+if __name__ == "__main__":
+    unittest.main()
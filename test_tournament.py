@@ -0,0 +1,60 @@
+import json
+import tempfile
+import unittest
+from config import Parameters
+from tournament import TIMEOUT, make_tasks, play_games, run_tournament
+from tournament import summarize
+
+
+class TestTournament(unittest.TestCase):
+
+    def test_make_tasks(self):
+        params = Parameters()
+        tasks = list(make_tasks(params, "greedy", list(range(7)), 50, 3))
+        self.assertEqual(
+            [[0, 1, 2], [3, 4, 5], [6]], [task[2] for task in tasks])
+        self.assertTrue(all(task[0] is params for task in tasks))
+        self.assertEqual({("greedy", 50)}, {task[1::2] for task in tasks})
+
+    def test_summarize_timeouts(self):
+        outcomes = [(0, TIMEOUT, 50, 1), (1, "Game Clear!", 3, 2),
+                    (2, "Game Over!", 20, 0)]
+        summary = summarize(outcomes)
+        self.assertEqual(
+            {TIMEOUT: 1, "Game Clear!": 1, "Game Over!": 1},
+            summary["results"])
+        self.assertAlmostEqual(1 / 3, summary["win_rate"])
+        self.assertEqual(1.0, summary["food_eaten_mean"])
+        self.assertEqual(9, len(summary["ticks"]["deciles"]))
+        self.assertEqual(
+            {"2-3": 1, "16-31": 1, "32-63": 1}, summary["ticks"]["histogram"])
+        self.assertEqual({"games": 0, "results": {}, "win_rate": 0.0,
+                          "food_eaten_mean": 0.0, "ticks": {}},
+                         summarize([]))
+
+    def test_run_tournament(self):
+        # 2プロセスで実行しても，1プロセスで順に実行した結果と同じになる
+        params = Parameters(enemy_num=3, food_num=2)
+        result_dir = tempfile.mkdtemp()
+        summary = run_tournament(
+            params, result_dir, 6, "greedy", 50,
+            workers=2, chunksize=2, base_seed=10)
+        expected = play_games((params, "greedy", list(range(10, 16)), 50))
+
+        with open(f"{result_dir}/games.jsonl") as f:
+            games = [json.loads(line) for line in f]
+        self.assertEqual(
+            expected,
+            sorted((g["seed"], g["result"], g["tick"], g["food_eaten"])
+                   for g in games))
+        with open(f"{result_dir}/summary.json") as f:
+            saved = json.load(f)
+        self.assertEqual(summary, saved)
+        self.assertEqual(6, saved["games"])
+        self.assertEqual(summarize(expected)["results"], saved["results"])
+        self.assertEqual((2, 2, 10), (
+            saved["workers"], saved["chunksize"], saved["base_seed"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,229 @@
+"""大量のゲームの並列実行
+操作方針 (policy.py) にプレイヤーを操作させたゲームを複数プロセスで大量に実行し，
+勝率とゲームの長さの分布を `result/<run_date>_<pid>` に出力する．
+
+    python tournament.py -g 10000 --policy greedy
+"""
+import argparse
+import json
+import logging
+import os
+import statistics
+import time
+from collections import Counter
+from collections.abc import Iterator
+from multiprocessing import Pool
+from config import Parameters
+from config import common_args
+from game import Game
+from game_random import GameRandom
+from policy import POLICIES
+from policy import make_policy
+from utils import dump_params
+from utils import make_result_dir
+from utils import set_logging
+from utils import setup_params
+
+
+logger = logging.getLogger(__name__)
+
+TIMEOUT = "Timeout"  # max_ticksで打ち切ったゲームの結果
+
+
+def play_games(
+        task: tuple[Parameters, str, list[int], int]
+        ) -> list[tuple[int, str, int, int]]:
+    """ワーカープロセスでシードごとにゲームを実行する関数
+
+    Args:
+        task (tuple[Parameters, str, list[int], int]):
+            (パラメータ, 操作方針の名前, シードのリスト, 打ち切るターン数)
+
+    Returns:
+        list[tuple[int, str, int, int]]: ゲームごとの (シード, 結果, ターン数, 食べた数)
+
+    Examples:
+        >>> params = Parameters(enemy_num=0)
+        >>> play_games((params, "greedy", [0, 1], 100))
+        [(0, 'Game Clear!', 13, 2), (1, 'Game Clear!', 14, 2)]
+    """
+    params, policy_name, seeds, max_ticks = task
+    # Gameは使い回し，シードごとにresetする
+    game = Game(params, headless=True)
+    outcomes = []
+    for seed in seeds:
+        game.reset(seed)
+        result = game.play(make_policy(policy_name, seed), max_ticks)
+        outcomes.append(
+            (seed, result or TIMEOUT, game.tick, game.food_eaten))
+    return outcomes
+
+
+def make_tasks(
+        params: Parameters,
+        policy_name: str,
+        seeds: list[int],
+        max_ticks: int,
+        chunksize: int) -> Iterator[tuple[Parameters, str, list[int], int]]:
+    """シードをchunksize個ずつに分けたタスクを作る関数
+
+    Args:
+        params (Parameters): パラメータ
+        policy_name (str): 操作方針の名前
+        seeds (list[int]): 全ゲームのシード
+        max_ticks (int): 打ち切るターン数
+        chunksize (int): 1タスクあたりのゲーム数
+
+    Yields:
+        tuple[Parameters, str, list[int], int]: `play_games` に渡すタスク
+    """
+    for i in range(0, len(seeds), chunksize):
+        yield params, policy_name, seeds[i:i + chunksize], max_ticks
+
+
+def summarize(outcomes: list[tuple[int, str, int, int]]) -> dict:
+    """ゲームの結果を集計する関数
+
+    Args:
+        outcomes (list[tuple[int, str, int, int]]): `play_games` の結果を連結したもの
+
+    Returns:
+        dict: ゲーム数，結果ごとの数，勝率，ターン数と食べた数の分布
+
+    Examples:
+        >>> s = summarize([(0, "Game Clear!", 10, 2), (1, "Game Over!", 4, 0)])
+        >>> s["games"], s["win_rate"], s["ticks"]["max"]
+        (2, 0.5, 10)
+    """
+    ticks = sorted(o[2] for o in outcomes)
+    results = Counter(o[1] for o in outcomes)
+    n = len(outcomes)
+    summary = {
+        "games": n,
+        "results": dict(results),
+        "win_rate": results["Game Clear!"] / n if n else 0.0,
+        "food_eaten_mean": (
+            statistics.fmean(o[3] for o in outcomes) if n else 0.0),
+        "ticks": {},
+    }
+    if n:
+        # 10%刻みの分位点とヒストグラム (2のべき乗の区間)
+        deciles = statistics.quantiles(ticks, n=10) if n > 1 else ticks * 9
+        histogram = Counter(max(t, 1).bit_length() for t in ticks)
+        summary["ticks"] = {
+            "min": ticks[0],
+            "max": ticks[-1],
+            "mean": statistics.fmean(ticks),
+            "deciles": deciles,
+            "histogram": {
+                f"{1 << (b - 1)}-{(1 << b) - 1}": histogram[b]
+                for b in sorted(histogram)},
+        }
+    return summary
+
+
+def run_tournament(
+        params: Parameters,
+        result_dir: str,
+        n_games: int,
+        policy_name: str,
+        max_ticks: int,
+        workers: int | None = None,
+        chunksize: int | None = None,
+        base_seed: int | None = None) -> dict:
+    """ゲームを複数プロセスで実行し，結果を出力する関数
+    各ゲームのシードは `base_seed + i` とするため，ワーカー数によらず同じ結果になる．
+    ゲームごとの結果は終わった順に `games.jsonl` に書き出し，
+    集計結果を `summary.json` に書き出す．
+
+    Args:
+        params (Parameters): パラメータ
+        result_dir (str): 結果出力ディレクトリ
+        n_games (int): ゲーム数
+        policy_name (str): 操作方針の名前
+        max_ticks (int): 打ち切るターン数
+        workers (int | None): プロセス数．Noneの場合はCPU数
+        chunksize (int | None): 1タスクあたりのゲーム数．Noneの場合は自動で決める
+        base_seed (int | None): 最初のゲームのシード．Noneの場合は `params.seed`
+
+    Returns:
+        dict: 集計結果 (`summarize` を参照)
+    """
+    workers = workers or os.cpu_count() or 1
+    if chunksize is None:
+        # 1プロセスあたり8タスク程度にしてプロセス間通信の回数を抑える
+        chunksize = max(1, n_games // (workers * 8))
+    if base_seed is None:
+        base_seed = params.seed
+    if base_seed is None:
+        base_seed = GameRandom().seed
+    seeds = [base_seed + i for i in range(n_games)]
+    tasks = make_tasks(params, policy_name, seeds, max_ticks, chunksize)
+
+    outcomes = []
+    start = time.perf_counter()
+    with Pool(workers) as pool, \
+            open(f"{result_dir}/games.jsonl", "w") as f:
+        for chunk in pool.imap_unordered(play_games, tasks):
+            for seed, result, tick, food_eaten in chunk:
+                f.write(json.dumps({
+                    "seed": seed, "result": result,
+                    "tick": tick, "food_eaten": food_eaten}) + "\n")
+            outcomes.extend(chunk)
+            logger.debug(f"{len(outcomes)}/{n_games} games finished")
+    elapsed = time.perf_counter() - start
+
+    summary = summarize(outcomes)
+    summary.update({
+        "policy": policy_name,
+        "base_seed": base_seed,
+        "max_ticks": max_ticks,
+        "workers": workers,
+        "chunksize": chunksize,
+        "elapsed_sec": elapsed,
+        "games_per_sec": n_games / elapsed if elapsed > 0 else 0.0,
+    })
+    with open(f"{result_dir}/summary.json", "w") as f:
+        json.dump(summary, f, indent=4)
+    return summary
+
+
+def main() -> None:
+    # コマンドライン引数の設定
+    parser = argparse.ArgumentParser()
+    parser = common_args(parser)  # コマンドライン引数引数を読み込み
+    parser.add_argument(
+        "-g", "--games", type=int, default=1000, help="実行するゲーム数")
+    parser.add_argument(
+        "--policy", choices=list(POLICIES), default="greedy",
+        help="プレイヤーの操作方針")
+    parser.add_argument(
+        "--max-ticks", type=int, default=1000, help="1ゲームを打ち切るターン数")
+    parser.add_argument(
+        "-w", "--workers", type=int, default=None,
+        help="プロセス数．デフォルトはCPU数")
+    parser.add_argument(
+        "--chunksize", type=int, default=None,
+        help="1タスクあたりのゲーム数．デフォルトは自動")
+    args = parser.parse_args()
+    params = Parameters(**setup_params(vars(args), args.parameters))
+
+    # 結果出力用ファイルの作成
+    # 実行日時とプロセスIDを名前とするディレクトリを作成
+    result_dir = make_result_dir(params.run_date)  # 結果出力ディレクトリ
+    dump_params(params, f'{result_dir}')  # パラメータを出力
+    set_logging(result_dir)  # ログを標準出力とファイルに出力するよう設定
+
+    logger.info('parameters: ')
+    logger.info(params)
+    summary = run_tournament(
+        params, result_dir, args.games, args.policy, args.max_ticks,
+        args.workers, args.chunksize)
+    logger.info(
+        f"{summary['games']} games, win rate {summary['win_rate']:.3f}, "
+        f"{summary['games_per_sec']:.0f} games/s")
+    logger.info(f"results: {summary['results']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,11 @@
 """便利な関数群"""
 from __future__ import annotations
-import subprocess
+import functools
 import logging
 import json
 from datetime import datetime
 import os
+import tempfile
 from dataclasses import asdict
 from typing import Any
 from typing import TYPE_CHECKING
@@ -12,15 +13,144 @@ if TYPE_CHECKING:
     from config import Parameters
 
 
-def get_git_revision() -> str:
+def _find_git_dir(path: str) -> str | None:
+    """pathから親のディレクトリへ順に.gitを探す
+
+    Args:
+        path (str): 探し始めるディレクトリ
+
+    Returns:
+        str | None: .gitディレクトリのパス．見つからなければNone
+    """
+    path = os.path.abspath(path)
+    while True:
+        git = os.path.join(path, ".git")
+        if os.path.isdir(git):
+            return git
+        if os.path.isfile(git):
+            # worktreeやsubmoduleでは.gitは "gitdir: <パス>" と書かれたファイル
+            with open(git) as f:
+                content = f.read().strip()
+            if content.startswith("gitdir:"):
+                return os.path.join(path, content[len("gitdir:"):].strip())
+        parent = os.path.dirname(path)
+        if parent == path:
+            return None
+        path = parent
+
+
+def _read_ref(git_dir: str, ref: str) -> str | None:
+    """参照 (refs/heads/mainなど) が指すコミットを.gitのファイルから読む
+
+    Args:
+        git_dir (str): .gitディレクトリのパス
+        ref (str): 参照の名前
+
+    Returns:
+        str | None: コミットのハッシュ．見つからなければNone
+    """
+    # worktreeでは共有の参照がcommondirに書かれたディレクトリにある
+    dirs = [git_dir]
+    common = os.path.join(git_dir, "commondir")
+    if os.path.isfile(common):
+        with open(common) as f:
+            dirs.append(os.path.join(git_dir, f.read().strip()))
+    for d in dirs:
+        loose = os.path.join(d, ref)
+        if os.path.isfile(loose):
+            with open(loose) as f:
+                return f.read().strip()
+        packed = os.path.join(d, "packed-refs")
+        if os.path.isfile(packed):
+            with open(packed) as f:
+                for line in f:
+                    if line.startswith(("#", "^")):
+                        continue
+                    sha, _, name = line.strip().partition(" ")
+                    if name == ref:
+                        return sha
+    return None
+
+
+@functools.lru_cache(maxsize=None)
+def get_git_revision(path: str = ".") -> str:
     """
     現在のGitのリビジョンを取得
+    .git/HEADと参照のファイルを直接読むため，gitのプロセスを起動しない．
+    読めない場合のみ `git rev-parse HEAD` を実行する．結果はプロセス内でキャッシュする．
+
+    Args:
+        path (str): リポジトリ内のディレクトリ
+
     Returns:
-         str: revision ID
+         str: revision ID．Gitのリポジトリでない場合は空文字列
+
+    Examples:
+        >>> import tempfile
+        >>> repo = tempfile.mkdtemp()
+        >>> os.makedirs(f"{repo}/.git/refs/heads")
+        >>> _ = open(f"{repo}/.git/HEAD", "w").write("ref: refs/heads/main\\n")
+        >>> with open(f"{repo}/.git/packed-refs", "w") as f:
+        ...     _ = f.write("abc123 refs/heads/main\\n")
+        >>> get_git_revision(repo)
+        'abc123'
+        >>> _ = open(f"{repo}/.git/refs/heads/main", "w").write("def456\\n")
+        >>> get_git_revision.cache_clear()
+        >>> get_git_revision(repo)
+        'def456'
     """
-    cmd = "git rev-parse HEAD"
-    revision = subprocess.check_output(cmd.split())  # 現在のコードのgitのリビジョンを取得
-    return revision.decode()
+    git_dir = _find_git_dir(path)
+    if git_dir is not None:
+        try:
+            with open(os.path.join(git_dir, "HEAD")) as f:
+                head = f.read().strip()
+            if not head.startswith("ref:"):
+                return head  # detached HEAD
+            revision = _read_ref(git_dir, head[len("ref:"):].strip())
+            if revision is not None:
+                return revision
+        except OSError:
+            pass
+    import subprocess  # 読めない形式 (reftableなど) の場合のみgitを実行する
+    try:
+        revision = subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], cwd=path, stderr=subprocess.DEVNULL)
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+    return revision.decode().strip()
+
+
+def make_result_dir(run_date: str, base: str = "result") -> str:
+    """実行ごとの結果出力ディレクトリを作る
+    名前は実行時刻とプロセスIDで，同時に起動した複数のプロセスでも重ならない．
+    `os.mkdir` で作るため，万一同じ名前があれば番号を付けて作り直す．
+
+    Args:
+        run_date (str): 実行時刻 (`setup_params` の run_date)
+        base (str): 親のディレクトリ (なければ作る)
+
+    Returns:
+        str: 作成したディレクトリのパス
+
+    Examples:
+        >>> import tempfile
+        >>> base = tempfile.mkdtemp()
+        >>> a = make_result_dir("20240101_000000_000000", base)
+        >>> b = make_result_dir("20240101_000000_000000", base)
+        >>> a != b, os.path.isdir(a), os.path.isdir(b)
+        (True, True, True)
+    """
+    os.makedirs(base, exist_ok=True)
+    name = f"{run_date}_{os.getpid()}"
+    path = os.path.join(base, name)
+    n = 0
+    while True:
+        try:
+            os.mkdir(path)
+            return path
+        except FileExistsError:
+            n += 1
+            path = os.path.join(base, f"{name}_{n}")
 
 
 def setup_params(
@@ -47,7 +177,7 @@ def setup_params(
     if path:
         param_dict = json.load(open(path, 'r'))  # jsonからパラメータを取得
     param_dict.update({'args': args_dict})  # コマンドライン引数を上書き
-    param_dict.update({'run_date': run_date.strftime('%Y%m%d_%H%M%S')})
+    param_dict.update({'run_date': run_date.strftime('%Y%m%d_%H%M%S_%f')})
     # 実行時刻を上書き
     param_dict.update({'git_revision': git_revision})  # Gitリビジョンを上書き
     return param_dict
@@ -59,20 +189,37 @@ def dump_params(
         partial: bool = False) -> None:
     """
     データクラスで定義されたパラメータをjson出力する関数
+    既にparameters.jsonがある場合は上書きする．一時ファイルに書いてから置き換えるため，
+    読み込み中のプロセスが書きかけのファイルを読むことはない．
     Args:
         params (:ogj: `Parameters`): パラメータを格納したデータクラス
         outdir (str): 出力先のディレクトリ
         partial (bool, optional): Trueの場合，args，run_date，git_revision を出力しない，
+
+    Examples:
+        >>> import tempfile
+        >>> from config import Parameters
+        >>> outdir = tempfile.mkdtemp()
+        >>> dump_params(Parameters(seed=1), outdir, partial=True)
+        >>> dump_params(Parameters(seed=2), outdir, partial=True)  # 上書きする
+        >>> with open(f"{outdir}/parameters.json") as f:
+        ...     json.load(f)["seed"], os.listdir(outdir)
+        (2, ['parameters.json'])
     """
     params_dict = asdict(params)  # デフォルトパラメータを取得
-    if os.path.exists(f'{outdir}/parameters.json'):
-        raise Exception('"parameters.json" is already exist. ')
     if partial:
         del params_dict['args']  # jsonからし指定しないキーを削除
         del params_dict['run_date']  # jsonからし指定しないキーを削
         del params_dict['git_revision']  # jsonからし指定しないキーを削
-    with open(f'{outdir}/parameters.json', 'w') as f:
-        json.dump(params_dict, f, indent=4)  # デフォルト設定をファイル出力
+    fd, tmp_path = tempfile.mkstemp(
+        prefix='.parameters.', suffix='.json', dir=outdir)
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(params_dict, f, indent=4)  # デフォルト設定をファイル出力
+        os.replace(tmp_path, f'{outdir}/parameters.json')  # まとめて置き換える
+    except BaseException:
+        os.remove(tmp_path)
+        raise
 
 
 def set_logging(result_dir: str) -> 'logging.Logger':